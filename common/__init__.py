@@ -1,6 +1,12 @@
-from luna.common.ar import AgedReceivablesReader_Format1, AgedReceivablesLoader_From_LunaHub
-from luna.common.tb import TBReader_ExcelFormat1, TBLoader_From_LunaHub
-from luna.common import misc
-from luna.common.gl import GLProcessor
-from luna.common.hyperlinks import DataHyperlink
+# The classes are only imported on first use, see common/lazyimport.py
+from luna.common.lazyimport import get_lazy_loaders
 
+__getattr__, __dir__ = get_lazy_loaders(__name__, {
+    "AgedReceivablesReader_Format1"         : "luna.common.ar",
+    "AgedReceivablesLoader_From_LunaHub"    : "luna.common.ar",
+    "TBReader_ExcelFormat1"                 : "luna.common.tb",
+    "TBLoader_From_LunaHub"                 : "luna.common.tb",
+    "GLProcessor"                           : "luna.common.gl",
+    "FuzzyNameMatcher"                      : "luna.common.fuzzymatch",
+    "DataHyperlink"                         : "luna.common.hyperlinks",
+    })
@@ -48,23 +48,19 @@ def convert_aged_ar_to_lunahub_format(df):
         err = f"Unable to find the following columns: f{cols_not_found}."
         raise Exception (err)
         
-    # Convert the interval column
-    df["LEFTBINVALUE"] = None
-    df["RIGHTBINVALUE"] = None
+    # Convert the interval column, once per unique interval.
+    # The bins are closed on different sides (e.g. 0 - 30 and 150+), so
+    # the left and right are taken from the unique pd.Interval.
+    codes, intervals = pd.factorize(df["Interval"])
+    lvals = np.array([i.left for i in intervals] + [np.nan], dtype=float)
+    rvals = np.array([i.right for i in intervals] + [np.nan], dtype=float)
     
-    for i in df.index:
-        
-        # Get the interval info
-        interval = df.at[i, "Interval"]
-        l, r, closed = interval.left, interval.right, interval.closed
-        
-        # If the right is inf, we will set it to 999999
-        if np.isinf(r):
-            r = 999999
-        
-        # Update
-        df.at[i, "LEFTBINVALUE"] = l
-        df.at[i, "RIGHTBINVALUE"] = r
+    # If the right is inf, we will set it to 999999
+    rvals[np.isinf(rvals)] = 999999
+    
+    # Broadcast back to the rows (missing interval -> code -1 -> nan)
+    df["LEFTBINVALUE"] = lvals[codes]
+    df["RIGHTBINVALUE"] = rvals[codes]
     
     # Convert to int
     df["LEFTBINVALUE"] = df["LEFTBINVALUE"].astype(int)
@@ -360,7 +356,7 @@ class AgedReceivablesUploader_To_LunaHub(LunaHubBaseUploader):
         df = df[cols]
         
         # Load to lunahub
-        self.lunahub_obj.insert_dataframe('ar_aged', df)
+        self.upload_stats = self.lunahub_obj.bulk_insert_dataframe('ar_aged', df)
         
     def upload_client(self):       
         
@@ -378,23 +374,36 @@ class AgedReceivablesUploader_To_LunaHub(LunaHubBaseUploader):
         
 class AgedReceivablesLoader_From_LunaHub:
     
+    TABLENAME = "ar_aged"
+    
+    # Only these columns are read from lunahub
+    COLUMNS = ["NAME", "LEFTBINVALUE", "RIGHTBINVALUE",
+               "CURRENCY", "CONVERSIONFACTOR", "VALUEFCY", "VALUELCY",
+               "DATE", "FY", "CLIENTNUMBER", "UPLOADDATETIME"]
+    
     def __init__(self, 
                  client_number,
                  fy,
                  uploaddatetime = None,
-                 lunahub_obj = None):
+                 lunahub_obj = None,
+                 latest_only = True):
         '''
         specify uploaddatetime (in str) when there are multiple versions of the same data.
+        
+        latest_only = True to only download the latest version from lunahub.
+                      False to download all versions for the client and fy 
+                      (the latest will still be used).
         '''
         
         self.client_number  = int(client_number)
         self.fy             = int(fy)
         self.uploaddatetime = uploaddatetime
         self.lunahub_obj    = lunahub_obj
+        self.latest_only    = latest_only
         
         # Initialise lunahub obj if None
         if self.lunahub_obj is None:
-            self.lunahub_obj = lunahub.LunaHubConnector(**lunahub.LUNAHUB_CONFIG)
+            self.lunahub_obj = lunahub.get_lunahub_obj()
             
         # Main
         self.main()
@@ -408,31 +417,80 @@ class AgedReceivablesLoader_From_LunaHub:
         query_class = AgedReceivables_QueryClass(self.df_processed_long_lcy)
         self.get_AR_by_new_groups = query_class.get_AR_by_new_groups        
 
-    def read_data(self):
+    def _get_query(self):
+        '''
+        Query for the client and fy only, with the version filter done by
+        the server where possible.
+        
+        Returns (query, params), with the values passed as ? parameters.
+        '''
+        
+        where_clause = "([CLIENTNUMBER] = ?) AND ([FY] = ?)"
+        params = [self.client_number, self.fy]
         
-        df0 = self.lunahub_obj.read_table("ar_aged")
+        if self.uploaddatetime is not None:
+            
+            # As a datetime, so that the microseconds are kept
+            dt = pd.to_datetime(self.uploaddatetime).to_pydatetime()
+            version_clause = " AND ([UPLOADDATETIME] = ?)"
+            params = params + [dt]
+        
+        elif self.latest_only:
+            
+            version_clause = (
+                " AND ([UPLOADDATETIME] = ("
+                f"SELECT MAX([UPLOADDATETIME]) FROM {self.TABLENAME} "
+                f"WHERE {where_clause}))"
+                )
+            params = params + [self.client_number, self.fy]
+            
+        else:
+            
+            version_clause = ""
+        
+        columns = ", ".join(f"[{c}]" for c in self.COLUMNS)
+        
+        query = (
+            f"SELECT {columns} FROM {self.TABLENAME} "
+            f"WHERE {where_clause}{version_clause}"
+            )
+        
+        return query, params
+    
+    def _raise_data_not_found(self):
+        
+        # Check which part of the filter is not found
+        query = (
+            f"SELECT DISTINCT [FY] FROM {self.TABLENAME} "
+            "WHERE ([CLIENTNUMBER] = ?)"
+            )
+        df_fy = self.lunahub_obj.read_table_with_params(query, [self.client_number])
         
         # Check client
-        is_client = df0["CLIENTNUMBER"] == self.client_number
-        if not is_client.any():
+        if df_fy.shape[0] == 0:
             raise Exception (f"Data not found for client_number={self.client_number}.")
         
         # Check FY
-        is_fy = df0["FY"] == self.fy
-        if not is_fy.any():
+        if not (df_fy["FY"] == self.fy).any():
             raise Exception (f"Data found for client={self.client_number}, but not for fy={self.fy}.")
+        
+        # Then it's the uploaddatetime
+        raise Exception ("No data found.")
     
-        # Filter
-        df = df0[is_client & is_fy]
+    def read_data(self):
         
-        # Filter by uploaddatettime
-        if self.uploaddatetime is not None:
-            
-            dt = pd.to_datetime(self.uploaddatetime)
-            df = df[df["UPLOADDATETIME"] == dt]
-            
-            if df.shape[0] == 0:
-                raise Exception ("No data found.")        
+        query, params = self._get_query()
+        df0 = self.lunahub_obj.read_table_with_params(query, params)
+        
+        if df0.shape[0] == 0:
+            self._raise_data_not_found()
+        
+        # Same dtypes as read_table
+        for c in ["DATE", "UPLOADDATETIME"]:
+            df0[c] = pd.to_datetime(df0[c])
+        
+        # Already filtered by client, fy and uploaddatetime
+        df = df0
         
         # Check if there are multiple upload dates
         upload_info = df[["UPLOADDATETIME"]].drop_duplicates()
@@ -473,25 +531,24 @@ class AgedReceivablesLoader_From_LunaHub:
         # Get
         df = self.df
         
-        # Create the interval col
-        df["Interval (str)"] = None
-        df["Interval"]       = None
+        # Create the interval col, once per unique (left, right) bin
+        codes, bins = pd.factorize(pd.MultiIndex.from_arrays(
+            [df["LEFTBINVALUE"], df["RIGHTBINVALUE"]]))
         
-        for i in df.index:
-            
-            lval = df.at[i, "LEFTBINVALUE"]
-            rval = df.at[i, "RIGHTBINVALUE"]
+        intervalstrs = []
+        intervals    = []
+        for lval, rval in bins:
             
             if rval == 999999:
-                intervalstr = f"{lval}+"
-                interval = pd.Interval(lval, np.inf, closed='left')
+                intervalstrs.append(f"{lval}+")
+                intervals.append(pd.Interval(lval, np.inf, closed='left'))
             else:
-                intervalstr = f"{lval} - {rval}"
-                interval = pd.Interval(lval, rval, closed='both')
-            
-            # Update
-            df.at[i, "Interval (str)"] = intervalstr
-            df.at[i, "Interval"] = interval
+                intervalstrs.append(f"{lval} - {rval}")
+                intervals.append(pd.Interval(lval, rval, closed='both'))
+        
+        # Broadcast back to the rows
+        df["Interval (str)"] = np.array(intervalstrs, dtype=object)[codes]
+        df["Interval"]       = np.array(intervals, dtype=object)[codes]
             
         #
         mapper = {v: k for k, v in AGED_AR_TO_LUNAHUB_MAPPER.items()}
@@ -521,6 +578,13 @@ class AgedReceivablesLoader_From_LunaHub:
 class AgedReceivables_QueryClass:
     
     def __init__(self, df_processed_long_lcy):
+        '''
+        The AR (LCY) is summed by Name x Month x bin once, into self.cube
+        (numpy array of rows x bins). Any regrouping of the bins is then
+        a sum over the bin axis, i.e. cube @ (bin x group indicator).
+        
+        Results are cached by group_dict.
+        '''
         
         self.df_processed_long_lcy = df_processed_long_lcy.copy()
         
@@ -529,21 +593,29 @@ class AgedReceivables_QueryClass:
             self.df_processed_long_lcy["Interval (str)"]
             )
         
-
-    def _split_AR_to_new_groups(self, group_dict):
-        '''
-        cutoff must lie exactly on one of the interval, as otherwise
-        we won't know where to cutoff
+        # Build the cube
+        self._create_cube()
         
-        for e.g. if there is a $100 at bin 0-30, if the cutoff is 15,
-        we won't be able to stratify it.
+    def _create_cube(self):
         
-        group_dict = dict of new group name: list of the original bins (str)
-        '''
+        df = self.df_processed_long_lcy
+        
+        # Month is only available in the data from lunahub
+        index_columns = [c for c in ["Name", "Month"] if c in df.columns]
+        
+        # Name x Month (rows) x bin (columns)
+        cube_df = df.groupby(index_columns + ["Interval (str)"])["Value (LCY)"].sum()
+        cube_df = cube_df.unstack("Interval (str)", fill_value = 0)
+        
+        self.cube       = cube_df.to_numpy()
+        self.cube_index = cube_df.index
+        self.cube_bins  = cube_df.columns
+        
+        self._ar_by_group_dict = {}
 
-        # Get attr
-        df_processed_long_lcy = self.df_processed_long_lcy.copy()
-        bin_df = self.bin_df.copy()
+    def _validate_group_dict(self, group_dict):
+        
+        bin_df = self.bin_df
         
         # Verify that there is no duplicates
         specified_bins = [b for n in group_dict for b in group_dict[n]]
@@ -557,22 +629,43 @@ class AgedReceivables_QueryClass:
                 f"Please include the bin(s) into the groups correctly: "
                 f"{list(group_dict.keys())}.")
         
-        # create a mapper and add a new group column
-        mapper_series = pd.Series([n for n in group_dict for b in group_dict[n]],
-                                  index = specified_bins)
-        df_processed_long_lcy["Group"] = mapper_series.reindex(
-            df_processed_long_lcy["Interval (str)"]).values
-            
-        return df_processed_long_lcy
+        return specified_bins
 
     def get_AR_by_new_groups(self, group_dict):
+        '''
+        Returns the AR (LCY) by Name and Month (index) and the new group
+        (columns).
         
-        df = self._split_AR_to_new_groups(group_dict)
+        The new groups must be made of whole bins, e.g. $100 in the bin
+        0-30 cannot be split at 15.
+        
+        group_dict = dict of new group name: list of the original bins (str)
+        '''
+        
+        key = tuple((n, tuple(group_dict[n])) for n in group_dict)
+        
+        if key not in self._ar_by_group_dict:
+            
+            self._validate_group_dict(group_dict)
+            
+            # Only the groups with data, sorted (same as pivot_table)
+            bin_to_group = {b: n for n in group_dict for b in group_dict[n]}
+            bin_groups = [bin_to_group[b] for b in self.cube_bins]
+            groups = sorted(set(bin_groups))
+            
+            # bin x group indicator
+            indicator = np.zeros((len(self.cube_bins), len(groups)), 
+                                 dtype = self.cube.dtype)
+            indicator[np.arange(len(bin_groups)), 
+                      [groups.index(g) for g in bin_groups]] = 1
+            
+            # Value is in foreign currency. only make sense if it's lcy
+            self._ar_by_group_dict[key] = pd.DataFrame(
+                self.cube @ indicator,
+                index = self.cube_index,
+                columns = pd.Index(groups, name = "Group"))
         
-        # Value is in foreign currency. only make sense if it's lcy
-        return df.pivot_table(
-            "Value (LCY)", index=["Name", "Month"], columns="Group", aggfunc="sum",
-            fill_value = 0)
+        return self._ar_by_group_dict[key].copy()
     
         
 if __name__ == "__main__":
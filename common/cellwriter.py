@@ -0,0 +1,362 @@
+# Import standard libraries
+from copy import copy
+import numpy as np
+import pandas as pd
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle, Font, PatternFill, Border, Side, Alignment
+from openpyxl.styles.cell_style import StyleArray
+
+THIN_BORDER = Border(left   = Side(style = "thin"),
+                     right  = Side(style = "thin"),
+                     top    = Side(style = "thin"),
+                     bottom = Side(style = "thin")
+                     )
+
+# Style name -> the formats to apply.
+# Only these formats are applied to the cell, the rest (e.g. the borders
+# of the template) are kept.
+REPORT_STYLES = {
+    "luna_title"            : {"font"   : Font(size = "16", bold = True),
+                               "fill"   : PatternFill("solid", fgColor = "00C0C0C0"),
+                               "border" : THIN_BORDER},
+    "luna_field_title"      : {"font"   : Font(bold = True),
+                               "fill"   : PatternFill("solid", fgColor = "00C0C0C0"),
+                               "border" : THIN_BORDER},
+    "luna_field_value"      : {"fill"       : PatternFill("solid", fgColor = "00FFFFFF"),
+                               "alignment"  : Alignment(horizontal = "left"),
+                               "border"     : THIN_BORDER},
+    "luna_header"           : {"font"   : Font(bold = True, color = "00FFFFFF"),
+                               "fill"   : PatternFill("solid", fgColor = "1F497D"),
+                               "border" : THIN_BORDER},
+    "luna_header_grey"      : {"font"   : Font(bold = True, color = "00000000"),
+                               "fill"   : PatternFill("solid", fgColor = "00C0C0C0"),
+                               "border" : THIN_BORDER},
+    "luna_header_lightblue" : {"font"   : Font(bold = True, color = "00000000"),
+                               "fill"   : PatternFill("solid", fgColor = "C5D9F1"),
+                               "border" : THIN_BORDER},
+    "luna_bold"             : {"font"   : Font(bold = True)},
+    "luna_bold_center"      : {"font"       : Font(bold = True),
+                               "alignment"  : Alignment(horizontal = "center")},
+    "luna_data"             : {"font"       : Font(size = "10", name = "Arial"),
+                               "alignment"  : Alignment(horizontal = "center")},
+    "luna_number"           : {"number_format" : "#,##0.00"},
+    "luna_date"             : {"number_format" : "DD/MM/YYYY"},
+    "luna_fill_recalculated": {"fill" : PatternFill("solid", fgColor = "00CCFFFF")},
+    "luna_fill_ocr"         : {"fill" : PatternFill("solid", fgColor = "00CCCCFF")},
+    "luna_fill_var"         : {"fill" : PatternFill("solid", fgColor = "00CCFFCC")},
+    }
+
+# Format -> field of the openpyxl StyleArray
+_STYLE_ARRAY_FIELDS = {"font"           : "fontId",
+                       "fill"           : "fillId",
+                       "border"         : "borderId",
+                       "alignment"      : "alignmentId",
+                       "number_format"  : "numFmtId",
+                       "protection"     : "protectionId"}
+
+
+def get_column_widths(df, header = True, sample_size = 10000,
+                      min_width = 8, max_width = 60, padding = 2):
+    '''
+    Returns list of the excel column widths, in the order of the columns
+    of the df, from the length of the longest value (as str) of each column.
+    A list rather than a dict, so that duplicated column names are kept.
+
+    The lengths are computed per column with pandas, so the cost does not
+    depend on the size of the worksheet. For huge frames, only a random
+    sample of sample_size rows is measured. None to measure all the rows.
+
+    header      = True to also fit the column name.
+    min_width   = width of the empty columns, and the minimum width.
+    max_width   = maximum width, so that long texts are not fully shown.
+    padding     = added to the length of the longest value.
+    '''
+
+    if (sample_size is not None) and (len(df) > sample_size):
+        df = df.sample(n = sample_size, random_state = 0)
+
+    widths = []
+    for c_idx, colname in enumerate(df.columns):
+
+        # By position, in case of duplicated column names
+        series = df.iloc[:, c_idx]
+        lengths = series.astype(str).str.len().where(series.notna(), 0)
+        max_length = lengths.max() if len(lengths) > 0 else 0
+
+        if header:
+            max_length = max(max_length, len(str(colname)))
+
+        widths.append(float(np.clip(max_length + padding, min_width, max_width)))
+
+    return widths
+
+
+class StyledCellWriter:
+
+    def __init__(self, wb, styles = REPORT_STYLES):
+        '''
+        Writes values and formats to the cells of an openpyxl workbook,
+        without creating Font / PatternFill / Border objects for each cell.
+
+        The styles are registered once in the workbook as NamedStyles.
+        Applying a style to a cell then only copies the style ids, cached
+        by (current style of the cell, style name). So formatting a large
+        sheet costs about the same as writing the values.
+
+        wb      = openpyxl workbook
+        styles  = dict of style name -> dict of the formats to apply
+                  (font, fill, border, alignment, number_format, protection)
+
+        Main methods:
+            - apply
+            - apply_to_range
+            - write_df
+            - stream_df
+            - get_column_styles
+            - autosize_columns
+        '''
+
+        self.wb     = wb
+        self.styles = styles
+
+        self._style_array_cache = {}
+
+        self._register_styles()
+
+    def _register_styles(self):
+
+        for name, formats in self.styles.items():
+            if name not in self.wb.named_styles:
+                self.wb.add_named_style(NamedStyle(name = name, **formats))
+
+    def _get_style_array(self, current, name):
+
+        # New cells have no style yet
+        if current is None:
+            current = StyleArray()
+
+        key = (name, *current)
+        style_array = self._style_array_cache.get(key)
+
+        if style_array is None:
+
+            if name not in self.styles:
+                raise Exception (f"Style {name} is not registered.")
+
+            named_style_array = self.wb._named_styles[name].as_tuple()
+
+            # Only replace the formats defined in the style
+            style_array = copy(current)
+            for fmt in self.styles[name]:
+                field = _STYLE_ARRAY_FIELDS[fmt]
+                setattr(style_array, field, getattr(named_style_array, field))
+            style_array.xfId = named_style_array.xfId
+
+            self._style_array_cache[key] = style_array
+
+        return style_array
+
+    def apply(self, cell, name):
+        '''
+        Applies the style to an openpyxl cell.
+        '''
+
+        cell._style = StyleArray(self._get_style_array(cell._style, name))
+
+    def apply_to_range(self, ws, cell_range, name):
+        '''
+        Applies the style to all the cells of a range, e.g. "A1:C10".
+        '''
+
+        for row in ws[cell_range]:
+            for cell in row:
+                self.apply(cell, name)
+
+    def apply_to_cols(self, ws, excelcols, min_row, max_row, name):
+        '''
+        Applies the style to the rows min_row to max_row (inclusive) of a
+        list of excel columns.
+        '''
+
+        for excelcol in excelcols:
+            col_idx = openpyxl.utils.column_index_from_string(excelcol)
+            for row in range(min_row, max_row + 1):
+                self.apply(ws.cell(row = row, column = col_idx), name)
+
+    def get_column_styles(self, df,
+                          number_style = "luna_number",
+                          date_style = "luna_date"):
+        '''
+        Returns dict of column name -> style name, by the dtype of the
+        columns. None to not format the numbers or the dates.
+        '''
+
+        column_styles = {}
+        for col, dtype in df.dtypes.items():
+            if (number_style is not None) and pd.api.types.is_float_dtype(dtype):
+                column_styles[col] = number_style
+            elif (date_style is not None) and pd.api.types.is_datetime64_any_dtype(dtype):
+                column_styles[col] = date_style
+
+        return column_styles
+
+    def write_df(self, ws, df, startrow = 1, startcol = 1, header = True,
+                 header_style = "luna_header", column_styles = None):
+        '''
+        Writes the df (without the index) to the worksheet in one pass.
+
+        header_style    = style name for the header, or dict of column name
+                          -> style name. None for no formatting.
+        column_styles   = dict of column name -> style name for the data.
+                          Default is by dtype, see get_column_styles.
+
+        Returns the last row written.
+        '''
+
+        if column_styles is None:
+            column_styles = self.get_column_styles(df)
+
+        row = startrow
+
+        # Header
+        if header:
+            for c_idx, colname in enumerate(df.columns, startcol):
+                cell = ws.cell(row = row, column = c_idx, value = colname)
+                if isinstance(header_style, dict):
+                    name = header_style.get(colname)
+                else:
+                    name = header_style
+                if name is not None:
+                    self.apply(cell, name)
+            row += 1
+
+        # Data; look up the style arrays of new cells by column once
+        styles = [column_styles.get(colname) for colname in df.columns]
+        new_cell_style_arrays = [None if name is None else self._get_style_array(None, name)
+                                 for name in styles]
+        for r_idx, values in enumerate(df.itertuples(index = False, name = None), row):
+            for c_idx, value, name, style_array in zip(
+                    range(startcol, startcol + len(styles)), values, styles, new_cell_style_arrays):
+                cell = ws.cell(row = r_idx, column = c_idx, value = value)
+                if name is None:
+                    continue
+                if cell._style is None:
+                    cell._style = StyleArray(style_array)
+                else:
+                    # e.g. template cells
+                    self.apply(cell, name)
+
+        return row + len(df) - 1
+
+    def stream_df(self, ws, df, startrow = None, header = True,
+                  header_style = "luna_header", column_styles = None):
+        '''
+        Same as write_df, for an openpyxl write-only worksheet (see
+        common.workbk.to_write_only_sheet). The rows are appended to the
+        worksheet, so that they are streamed to disk as they are written.
+
+        startrow    = row of the header (or of the first row of data).
+                      Must be after the rows already written. Default is
+                      the next row.
+
+        Returns the last row written.
+        '''
+
+        if column_styles is None:
+            column_styles = self.get_column_styles(df)
+
+        # Rows already written, e.g. the rows kept from the template
+        current_row = getattr(ws, "num_rows", 0)
+        if startrow is None:
+            startrow = current_row + 1
+        elif startrow <= current_row:
+            raise Exception (f"Row {startrow} is already written. "
+                             f"Write-only sheets can only be appended to.")
+
+        # Empty rows in between
+        for _ in range(startrow - current_row - 1):
+            ws.append([])
+
+        # Header
+        if header:
+            values = []
+            for colname in df.columns:
+                if isinstance(header_style, dict):
+                    name = header_style.get(colname)
+                else:
+                    name = header_style
+                cell = WriteOnlyCell(ws, colname)
+                if name is not None:
+                    cell._style = StyleArray(self._get_style_array(None, name))
+                values.append(cell)
+            ws.append(values)
+
+        # Data; the cells are all new, so the style arrays are by column
+        style_arrays = [None if column_styles.get(colname) is None
+                        else self._get_style_array(None, column_styles[colname])
+                        for colname in df.columns]
+        for values in df.itertuples(index = False, name = None):
+            row = []
+            for value, style_array in zip(values, style_arrays):
+                if style_array is None:
+                    row.append(value)
+                else:
+                    cell = WriteOnlyCell(ws, value)
+                    cell._style = StyleArray(style_array)
+                    row.append(cell)
+            ws.append(row)
+
+        return startrow + int(header) + len(df) - 1
+
+    def autosize_columns(self, ws, df, startcol = 1, header = True,
+                         colname_to_excelcol = None, **kwargs):
+        '''
+        Sets the widths of the worksheet columns from the df written to
+        them, instead of reading back every cell of the worksheet.
+
+        startcol            = first column of the df in the worksheet.
+        colname_to_excelcol = dict of column name -> excel column, if the
+                              columns are not written next to each other.
+                              The columns not in the dict are skipped.
+        kwargs              = passed to get_column_widths.
+        '''
+
+        widths = get_column_widths(df, header = header, **kwargs)
+
+        # By position, in case of duplicated column names
+        for c_idx, (colname, width) in enumerate(zip(df.columns, widths), startcol):
+            if colname_to_excelcol is None:
+                excelcol = openpyxl.utils.get_column_letter(c_idx)
+            elif colname in colname_to_excelcol:
+                excelcol = colname_to_excelcol[colname]
+            else:
+                continue
+            ws.column_dimensions[excelcol].width = width
+
+
+if __name__ == "__main__":
+
+    # Tester
+    if True:
+
+        import numpy as np
+        import time
+
+        num_rows = 50000
+        df = pd.DataFrame(
+            {"Name"     : [f"Security {i}" for i in range(num_rows)],
+             "Date"     : pd.date_range("2023-01-01", periods = num_rows, freq = "min"),
+             "Quantity" : np.arange(num_rows, dtype = float),
+             "Price"    : np.random.default_rng(0).random(num_rows)})
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+
+        start = time.perf_counter()
+        self = StyledCellWriter(wb)
+        self.write_df(ws, df)
+        self.autosize_columns(ws, df)
+        print (f"Wrote {df.size:,} cells in {time.perf_counter() - start:.2f}s.")
+        print (get_column_widths(df))
@@ -1,3 +1,5 @@
+import functools
+import numpy as np
 import pandas as pd
 import datetime as datetime
 from dateutil.relativedelta import relativedelta
@@ -64,6 +66,7 @@ class FYGenerator:
 
     The class also provides quick methods such as:
       - get_date_fy : that takes in a date and classify the FY
+      - get_dates_fy: same as get_date_fy, but for an array of dates
       - get_fy_dates: that takes in an offset and returns the FY start/end date
     '''
 
@@ -150,6 +153,7 @@ class FYGenerator:
         # Add the key methods
         repr_str += "\n\nMethods:\n"
         repr_str += "  - get_date_fy(date)\n"
+        repr_str += "  - get_dates_fy(dates)\n"
         repr_str += "  - get_fy_dates(offset)"
 
         return repr_str
@@ -308,6 +312,10 @@ class FYGenerator:
         '''
         Create a dataframe that contains the FY info of the given period.
 
+        The FY dates are held as arrays (see _build_fy_table), indexed by
+        fy_offset - offset of the first row. fy_df is a view of the same
+        data for display.
+
         Output
         ------
         self.fy_df : dataframe
@@ -321,77 +329,111 @@ class FYGenerator:
             # Validate the input parameters
             self._validate_parameters()
 
-            # Create dataframe that contains FY start date and end date info
-            #   for (prev_fy_n~future_fy_n) years
-            num_prior_periods = self.num_prior_periods
-            num_post_periods = self.num_post_periods
-
-            self.fy_df = pd.DataFrame(
-                index=pd.Index([], name='fy_offset'),
-                columns=['start', 'end', 'fy', 'num_days']
-            )
-
-            # Define the range of periods
-            fy_offsets = range(-self.num_prior_periods,
-                               self.num_post_periods+1)
+            # The baseline fy, i.e. fy_offset = 0
+            self._base_fy = self.fy_end_date.year
 
-            # Calculate
-            for fy_offset in fy_offsets:
-
-                # Calculate the dates for the required offset
-                self._calculate_fy_dates_by_offset_from_baseline(fy_offset)
+            # Calculate for (prev_fy_n~future_fy_n) years in one pass
+            self._build_fy_table(-self.num_prior_periods,
+                                 self.num_post_periods)
 
         return self.fy_df
 
-    def _calculate_fy_dates_by_offset_from_baseline(self, fy_offset):
+    def _add_years(self, date, offsets):
         '''
-        An internal method to calculate the fy dates for a given offset.
+        Same as date + relativedelta(years=offset) for an array of offsets,
+        i.e. 29 feb goes to 28 feb in a non-leap year.
 
-        Dates are calculated from baseline dates, i.e. fy_offset = 0.
-
-        self.fy_df to be modified in-place.
+        Returns np.ndarray of datetime64[D].
         '''
 
-        # Create the fy_df first, but i will assign to _ as we don't
-        #   need the variable. we will just ref from self.
-        _ = self._create_fy_df()
+        # Month of each offset
+        months = (date.year + offsets - 1970) * 12 + (date.month - 1)
+        month_start = months.astype('datetime64[M]').astype('datetime64[D]')
+        next_month_start = (months + 1).astype('datetime64[M]').astype('datetime64[D]')
+
+        # Cap the day at the last day of the month
+        last_day = (next_month_start - month_start).astype(int)
+        day = np.minimum(date.day, last_day)
 
-        # Calculate for fy_offset if it is not yet present in fy_df
-        if fy_offset not in self.fy_df.index:
+        return month_start + (day - 1).astype('timedelta64[D]')
 
-            # Calculate delta
-            delta = relativedelta(years=fy_offset)
+    def _build_fy_table(self, offset_min, offset_max):
+        '''
+        An internal method to calculate the fy dates for all the offsets
+        from offset_min to offset_max in one pass.
+
+        Dates are calculated from baseline dates, i.e. fy_offset = 0.
+        '''
 
-            # Calculate dates and save to df
-            start = self.fy_start_date + delta
-            end = self.fy_end_date + delta
+        offsets = np.arange(offset_min, offset_max + 1)
+
+        # Calculate dates
+        starts = self._add_years(self.fy_start_date, offsets)
+        ends = self._add_years(self.fy_end_date, offsets)
+
+        # for end date, adjust 28 feb to 29 feb whenever possible (leap year)
+        end_years = ends.astype('datetime64[Y]').astype(int) + 1970
+        end_months = ends.astype('datetime64[M]').astype(int) % 12 + 1
+        end_month_start = ends.astype('datetime64[M]').astype('datetime64[D]')
+        end_days = (ends - end_month_start).astype(int) + 1
+        is_leap_end = (end_years % 4 == 0) & (end_months == 2) & (end_days == 28)
+        ends = np.where(is_leap_end, ends + np.timedelta64(1, 'D'), ends)
+
+        # if input fy_start_date is a 29 feb of a leap year,
+        # without this block, the fy end for all the years including
+        # leap years will be 27 feb.
+        # Therefore, there will be a gap of one day to the next fy which
+        # is a leap year.
+        # For those affected years (one year before the leap year), will
+        # adjust 27 feb to 28 feb.
+        if self._is_29feb_on_leap_year(self.fy_start_date):
+            ends = np.where(offsets % 4 == 3,
+                            end_month_start + np.timedelta64(27, 'D'), ends)
+
+        # Save the arrays
+        self._fy_offset_min = offset_min
+        self._fy_starts     = starts
+        self._fy_ends       = ends
+        self._fy_years      = end_years
+        self._fy_num_days   = (ends - starts).astype(int) + 1
+
+        # As datetime.date
+        self._fy_start_dates = starts.astype(object)
+        self._fy_end_dates   = ends.astype(object)
+
+        self.fy_df = pd.DataFrame(
+            {'start'    : self._fy_start_dates,
+             'end'      : self._fy_end_dates,
+             'fy'       : self._fy_years,
+             'num_days' : self._fy_num_days},
+            index=pd.Index(offsets, name='fy_offset')
+            )
 
-            # for end date, adjust 28 feb to 29 feb whenever possible (leap year)
-            end = self._adjust_for_leap_end(end)
+    def _get_fy_position(self, fy_offset):
+        '''
+        An internal method to get the position of fy_offset in the
+        fy table. The table is extended if fy_offset is out of range.
+        '''
 
-            # if input fy_start_date is a 29 feb of a leap year,
-            # without this block, the fy end for all the years including
-            # leap years will be 27 feb.
-            # Therefore, there will be a gap of one day to the next fy which
-            # is a leap year.
-            # For those affected years, will adjust 27 feb to 28 feb.
-            # for start date (leap year), adjust previous years end date to 28 feb whenever possible
-            if self._is_29feb_on_leap_year(self.fy_start_date):
+        _ = self._create_fy_df()
 
-                # One year before the leap year
-                if (fy_offset % 4 == 3):
+        # Extend the table to include the offset
+        offset_min = self._fy_offset_min
+        offset_max = offset_min + len(self._fy_starts) - 1
+        if not (offset_min <= fy_offset <= offset_max):
+            self._build_fy_table(min(offset_min, fy_offset),
+                                 max(offset_max, fy_offset))
 
-                    # Adjust end date from 27 feb to 28 feb
-                    end = datetime.date(end.year, end.month, 28)
+        return int(fy_offset - self._fy_offset_min)
 
-            # Calculate number of days in the fy
-            num_days = (end - start).days + 1
+    def _calculate_fy_dates_by_offset_from_baseline(self, fy_offset):
+        '''
+        An internal method to get the fy dates for a given offset.
+        '''
 
-            # Update the df
-            self.fy_df.loc[fy_offset, ['start', 'end', 'fy', "num_days"]] = \
-                [start, end, end.year, num_days]
+        pos = self._get_fy_position(fy_offset)
 
-        return self.fy_df.loc[fy_offset]
+        return self.fy_df.iloc[pos]
 
     def _is_29feb_on_leap_year(self, date):
 
@@ -421,20 +463,18 @@ class FYGenerator:
         An internal method to convert fy to offset.
         '''
 
-        # Get the base fy
-        base_fy = self._create_fy_df().at[0, 'fy']
+        _ = self._create_fy_df()
 
-        return fy - base_fy
+        return fy - self._base_fy
 
     def _offset_to_fy(self, offset):
         '''
         An internal method to convert offset to fy.
         '''
 
-        # Get the base fy
-        base_fy = self._create_fy_df().at[0, 'fy']
+        _ = self._create_fy_df()
 
-        return base_fy + offset
+        return self._base_fy + offset
 
     def _verify_fy_offset(self, fy=None, fy_offset=None):
         '''
@@ -522,18 +562,22 @@ class FYGenerator:
            (datetime.date(2025, 4, 1, 0, 0), datetime.date(2026, 3, 31, 0, 0))
         '''
 
-        # Get verified fy_offset
-        fy_offset_verified = self._verify_fy_offset(fy=fy, fy_offset=fy_offset)
+        # Cache the results by input
+        if not hasattr(self, '_get_fy_dates_cached'):
+            self._get_fy_dates_cached = \
+                functools.lru_cache(maxsize=1024)(self._get_fy_dates)
 
-        # Create or get fy_df
-        fy_df = self._create_fy_df()
+        return self._get_fy_dates_cached(fy, fy_offset, which)
 
-        # Calculate dates for this offset from baseline dates
-        data = self._calculate_fy_dates_by_offset_from_baseline(
-            fy_offset_verified)
+    def _get_fy_dates(self, fy, fy_offset, which):
+
+        # Get verified fy_offset
+        fy_offset_verified = self._verify_fy_offset(fy=fy, fy_offset=fy_offset)
 
         # Get the start and end date
-        start_date, end_date = data.loc[['start', 'end']]
+        pos = self._get_fy_position(fy_offset_verified)
+        start_date = self._fy_start_dates[pos]
+        end_date = self._fy_end_dates[pos]
 
         # If invalid parameter name is given for 'which'
         which_options = ['both', 'start', 'end']
@@ -601,6 +645,71 @@ class FYGenerator:
         else:
             return date_fy
 
+    def get_dates_fy(self, dates):
+        '''
+        Get the FY of each date in an array, in one vectorised pass.
+
+        The dates are located in the sorted FY start dates with
+        np.searchsorted, so the result is the same as get_date_fy
+        (including the leap year adjustments) without a python call
+        per date.
+
+        Parameter
+        ---------
+        dates: array-like of dates, e.g. pd.Series, np.ndarray of
+               datetime64, list of datetime.date
+
+        Returns
+        -------
+        pd.Series named FY, with the same index if dates is a pd.Series.
+        Dtype is int, or Int64 (with <NA>) if there are missing dates.
+
+        Example
+        -------
+        >>> FY = FYGenerator(fy_end_date=pd.to_datetime('2020-03-31'))
+        >>> FY.get_dates_fy(pd.to_datetime(['2019-03-31', '2019-04-01']))
+            0    2019
+            1    2020
+            Name: FY, dtype: int64
+        '''
+
+        # Convert to dates (time is dropped, same as get_date_fy)
+        index = dates.index if isinstance(dates, pd.Series) else None
+        days = pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]')
+        is_missing = np.isnat(days)
+
+        # Empty or all missing
+        if is_missing.all():
+            return pd.Series(pd.array([pd.NA] * len(days), dtype='Int64'),
+                             index=index, name='FY')
+
+        # Make sure the FY table covers the range of dates
+        years = days[~is_missing].astype('datetime64[Y]').astype(int) + 1970
+        self._get_fy_position(self._fy_to_offset(years.min()))
+        self._get_fy_position(self._fy_to_offset(years.max() + 1))
+
+        # FY boundaries, in order of start date
+        starts = self._fy_starts
+        ends = self._fy_ends
+        fys = self._fy_years
+
+        # Locate the FY that starts on or before each date
+        pos = np.searchsorted(starts, days, side='right') - 1
+        pos_valid = np.clip(pos, 0, None)
+        is_found = (pos >= 0) & (days <= ends[pos_valid])
+
+        if not (is_found | is_missing).all():
+            raise NotImplementedError("Unexpected error.")
+
+        # Output
+        if is_missing.any():
+            date_fy = pd.array(fys[pos_valid], dtype='Int64')
+            date_fy[is_missing] = pd.NA
+        else:
+            date_fy = fys[pos_valid]
+
+        return pd.Series(date_fy, index=index, name='FY')
+
 if __name__ == "__main__":
     
     # Tester for FYGenerator
@@ -0,0 +1,127 @@
+# Import standard libraries
+import numpy as np
+import pandas as pd
+
+# rapidfuzz scores the whole names x choices matrix natively, in threads.
+# Fall back to fuzzywuzzy (one python call per name) if it is not installed.
+try:
+    from rapidfuzz import process as rf_process
+    from rapidfuzz import fuzz as rf_fuzz
+    from rapidfuzz import utils as rf_utils
+    FUZZY_ENGINE = "rapidfuzz"
+except ImportError:
+    from fuzzywuzzy import fuzz, process
+    from fuzzywuzzy import utils as fw_utils
+    FUZZY_ENGINE = "fuzzywuzzy"
+
+
+class FuzzyNameMatcher:
+
+    def __init__(self, choices, workers = -1):
+        '''
+        Matches names (e.g. AR debtor names) to a list of choices (e.g.
+        the fund management companies provided by the auditor), with the
+        token sort ratio, same as:
+            process.extractOne(name, choices, scorer=fuzz.token_sort_ratio)
+
+        All the names are scored against all the choices in one batched
+        call (rapidfuzz cdist). The best match is cached by normalised
+        name, so repeated names are only scored once.
+
+        choices = list of str
+        workers = number of threads for rapidfuzz. -1 to use all cores.
+
+        Main methods:
+            - get_best_matches
+            - get_is_matched
+        '''
+
+        self.choices = list(choices)
+        self.workers = workers
+
+        self._normalised_to_match = {}
+
+    def _normalise(self, name):
+
+        if pd.isnull(name):
+            return ""
+
+        if FUZZY_ENGINE == "rapidfuzz":
+            return rf_utils.default_process(str(name))
+        else:
+            return fw_utils.full_process(str(name))
+
+    def _score(self, normalised_names):
+        '''
+        Returns (best choice, score) for each normalised name.
+        '''
+
+        choices = self.choices
+
+        if (len(normalised_names) == 0) or (len(choices) == 0):
+            return [(None, 0)] * len(normalised_names)
+
+        if FUZZY_ENGINE == "rapidfuzz":
+
+            # names x choices
+            scores = rf_process.cdist(
+                normalised_names, choices,
+                scorer = rf_fuzz.token_sort_ratio,
+                processor = rf_utils.default_process,
+                workers = self.workers)
+
+            # fuzzywuzzy rounds the score to int
+            best = scores.argmax(axis = 1)
+            best_scores = np.round(scores[np.arange(len(best)), best]).astype(int)
+
+            return [(choices[b], s) for b, s in zip(best, best_scores)]
+
+        else:
+
+            return [process.extractOne(n, choices, scorer = fuzz.token_sort_ratio)[:2]
+                    if n != "" else (None, 0)
+                    for n in normalised_names]
+
+    def get_best_matches(self, names):
+        '''
+        Returns a pd.DataFrame with the same index as names, and columns:
+            - Match : the best matching choice
+            - Score : 0 to 100
+        '''
+
+        names = pd.Series(names)
+        normalised = names.map(self._normalise)
+
+        # Only score the names not matched before
+        new_names = [n for n in normalised.unique()
+                     if n not in self._normalised_to_match]
+        for n, match in zip(new_names, self._score(new_names)):
+            self._normalised_to_match[n] = match
+
+        matches = normalised.map(self._normalised_to_match)
+
+        return pd.DataFrame(
+            {"Match": [m[0] for m in matches],
+             "Score": [m[1] for m in matches]},
+            index = names.index)
+
+    def get_is_matched(self, names, threshold):
+        '''
+        Returns a bool pd.Series, True if the score is >= threshold.
+        '''
+
+        return self.get_best_matches(names)["Score"] >= threshold
+
+
+if __name__ == "__main__":
+
+    # Tester
+    if True:
+
+        choices = ["ABC Asset Management Pte Ltd", "XYZ Capital"]
+        names   = ["abc asset mgmt pte ltd", "Xyz Capital Pte Ltd",
+                   "Others Pte Ltd", "abc asset mgmt pte ltd"]
+
+        self = FuzzyNameMatcher(choices)
+        print(self.get_best_matches(names))
+        print(self.get_is_matched(names, 80))
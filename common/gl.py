@@ -5,6 +5,7 @@ import numpy as np
 import datetime
 import logging
 import re
+import openpyxl
 
 # Import other libraries
 import pyeasylib
@@ -22,12 +23,28 @@ logger.setLevel(logging.DEBUG)
 
 
 class GLProcessor:        
-    def __init__(self, file_path):
+    def __init__(self, file_path, streaming = False):
+        '''
+        Processes the raw GL export (excel) into a long table of
+        GL Account No, GL Account Name, Document No, Posting Date, etc.
+
+        All the steps work on a single frame (self.gl) in place, and are
+        vectorised over the rows.
+
+        streaming = True to read the file row by row with GLStreamReader,
+                    for very large exports. Only the processed rows are
+                    kept in memory.
+        '''
         self.file_path = file_path
+        self.streaming = streaming
 
         self.main()
 
     def main(self):
+        if self.streaming:
+            self.gl = GLStreamReader(self.file_path).read()
+            return
+
         self.promote_row_to_headers()
         self.extract_gl_account_info()
         self.regex_gl_account_no()
@@ -39,93 +56,78 @@ class GLProcessor:
 
         self.reorder_columns()
 
+    def read_raw_data(self):
+        
+        return pd.read_excel(self.file_path)
 
     def promote_row_to_headers(self):
-        gl = pd.read_excel(self.file_path)
+        gl = self.read_raw_data()
         digit = gl[gl.iloc[:,2].notna()].index[0]
         gl    = gl.iloc[digit:,:]
         gl = gl.reset_index(drop = True)
         gl.columns = gl.iloc[0]
         gl = gl[1:]
         nan_columns = gl.columns[gl.columns.isna()]
-        gl = gl.drop(columns=nan_columns)
 
-        self.gl = gl.copy()
+        # drop returns a new frame, so it is safe to modify from here on
+        self.gl = gl.drop(columns=nan_columns)
 
     def extract_gl_account_info(self):
-        gl = self.gl.copy()
+        gl = self.gl
 
         gl['GL Account No'] = gl.iloc[:,0].replace('', np.nan).ffill()
-        # self.gl['GL Account Name'] = self.gl['Src'].replace('', np.nan).ffill()
-        self.gl = gl
 
     def regex_gl_account_no(self):
-        gl = self.gl.copy()
+        gl = self.gl
 
         regex = r'\d{1}-\d{4}'
         mask = gl['GL Account No'].str.contains(regex, na=False)
-        gl['GL Account No'] = gl['GL Account No'].where(mask).fillna(method='ffill')
-
-        self.gl = gl
+        gl['GL Account No'] = gl['GL Account No'].where(mask).ffill()
 
     def forward_fill_gl_account_name(self):
-        gl = self.gl.copy()
-
-        for i in gl.index: 
-            if gl.at[i,"ID#"] == gl.at[i,"GL Account No"]:
-                gl.at[i,"GL Account Name"] = gl.at[i,"Src"]
+        gl = self.gl
 
-        gl["GL Account Name"] = gl["GL Account Name"].ffill()
-        # pattern = r'^[A-Z]+\sBank-SGD\s\(\d{3}-\d{6}-\d{1}\)$'
-        # self.gl['GL Account Name'] = self.gl['GL Account Name'].astype('str')
-        # self.gl['GL Account Name'] = self.gl['GL Account Name'].apply(lambda x: x if re.match(pattern, x) else pd.NA).fillna(method='ffill')
-
-        self.gl = gl 
+        # The account name is in Src, on the row where ID# is the account no
+        is_account_row = (gl["ID#"] == gl["GL Account No"]).to_numpy(dtype = bool)
+        gl["GL Account Name"] = gl["Src"].where(is_account_row).ffill()
 
     def create_opening_balance_column(self):
-
-        gl = self.gl.copy()
+        gl = self.gl
 
         # Extract opening balance
         regex = r'(?i)(\d{0,3},?\d{0,3},?\d+\.?\d{0,2}[c]?)'
-        gl['Opening Balance'] = gl['Src'].str.extract(regex)
+        opening_balance = gl['Src'].str.extract(regex)[0]
 
-        for i in gl.index:
-            if re.search("(?i)[c]", str(gl.at[i,'Opening Balance'])):
-                gl.at[i,'Opening Balance'] = "-" \
-                    + gl.at[i,'Opening Balance'][:-1]
+        # Credit balances end with "c" e.g. 1,234.56c -> -1,234.56
+        is_credit = opening_balance.str.contains("(?i)[c]", na=False).to_numpy()
+        opening_balance = pd.Series(
+            np.where(is_credit, "-" + opening_balance.str[:-1], opening_balance),
+            index = opening_balance.index, dtype = object)
 
-        mask = gl['Opening Balance'].notna()
-        gl['Opening Balance'] = gl['Opening Balance'].where(mask).ffill()
         gl['Opening Balance'] = pd.to_numeric(
-            gl['Opening Balance'].str.replace(',',''), errors='coerce')
-        
-        self.gl = gl
+            opening_balance.ffill().str.replace(',',''), errors='coerce')
 
     def filter_rows(self):
-        gl = self.gl.copy()
-        gl = gl[gl['ID#'] != 'Beginning Balance:']
+        gl = self.gl
 
-        self.gl = gl
+        is_beginning_balance = gl['ID#'] == 'Beginning Balance:'
+        gl.drop(index = gl.index[is_beginning_balance.to_numpy(dtype = bool)],
+                inplace = True)
 
     def clean_and_rename_columns(self):
-        gl = self.gl.copy()
+        gl = self.gl
 
-        gl = gl.drop(gl[gl['Date'].isnull()].index)
-        gl = gl.rename(columns={'Date': 'Posting Date', 'ID#': 'Document No', 'Memo': 'Description'})
-        gl = gl.drop('Net Activity', axis=1)
-        
-        self.gl = gl
+        gl.drop(index = gl.index[gl['Date'].isnull().to_numpy()], inplace = True)
+        gl.rename(columns={'Date': 'Posting Date', 'ID#': 'Document No', 'Memo': 'Description'},
+                  inplace = True)
+        gl.drop('Net Activity', axis=1, inplace = True)
 
     def calculate_amount_column(self):
-        gl = self.gl.copy()
+        gl = self.gl
 
         gl['Debit'] = pd.to_numeric(gl['Debit'].replace('', np.nan).fillna(0), errors='coerce')
         gl['Credit'] = pd.to_numeric(gl['Credit'].replace('', np.nan).fillna(0), errors='coerce')
         gl['Amount'] = gl['Debit'] - gl['Credit']
-        # self.gl['Amount'].fillna("NA", inplace=True)
-
-        self.gl = gl
 
     def reorder_columns(self):
         column_order = [
@@ -139,12 +141,191 @@ class GLProcessor:
             "Amount",
             "Opening Balance"
         ]
-        gl = self.gl.copy()
-        gl = gl[column_order]
-        self.gl = gl
+        self.gl = self.gl[column_order]
 
         return self.gl
 
+class GLStreamReader:
+
+    COLUMN_ORDER = [
+        "GL Account No",
+        "GL Account Name",
+        "Document No",
+        "Posting Date",
+        "Description",
+        "Debit",
+        "Credit",
+        "Amount",
+        "Opening Balance"
+        ]
+
+    ACCOUNT_NO_REGEX        = re.compile(r'\d{1}-\d{4}')
+    OPENING_BALANCE_REGEX   = re.compile(r'(?i)(\d{0,3},?\d{0,3},?\d+\.?\d{0,2}[c]?)')
+
+    def __init__(self, file_path, chunksize = 50000, sheet_name = None):
+        '''
+        Reads the raw GL export row by row (openpyxl read_only), and gives
+        the processed rows of GLProcessor in chunks: same columns, index
+        and values. Posting Date is left as read from the file (as in
+        GLProcessor); the callers parse it with pd.to_datetime(dayfirst).
+        The dtypes can differ where pd.read_excel infers them differently,
+        e.g. Debit and Credit are always float.
+
+        The account block headers ("1-2345 | <name>") and the opening
+        balances are tracked as the rows are read, so the raw sheet is
+        never loaded into memory. Peak memory is bounded by the chunksize.
+
+        chunksize   = number of processed rows per chunk.
+        sheet_name  = default is the first sheet (same as pd.read_excel).
+
+        Usage:
+            > for chunk in GLStreamReader(fp).iter_chunks():
+            >     ...
+            > gl = GLStreamReader(fp).read()
+        '''
+
+        self.file_path  = file_path
+        self.chunksize  = chunksize
+        self.sheet_name = sheet_name
+
+    def _iter_rows(self):
+
+        wb = openpyxl.load_workbook(self.file_path, read_only = True,
+                                    data_only = True)
+        try:
+            if self.sheet_name is None:
+                ws = wb.worksheets[0]
+            else:
+                ws = wb[self.sheet_name]
+
+            for row in ws.iter_rows(values_only = True):
+                yield row
+        finally:
+            wb.close()
+
+    def _find_header(self, rows):
+        '''
+        Same as GLProcessor.promote_row_to_headers: the first row (after
+        the first row of the sheet) with a value in the 3rd column.
+        '''
+
+        next(rows, None)
+        for row in rows:
+            if (len(row) > 2) and not pd.isnull(row[2]):
+                return row
+
+        raise Exception (f"Header row not found in {self.file_path}.")
+
+    def _convert_balance(self, value):
+        '''
+        Extracts the balance from Src e.g. "$1,234.56c" -> "-1,234.56".
+        '''
+
+        if not isinstance(value, str):
+            return None
+
+        match = self.OPENING_BALANCE_REGEX.search(value)
+        if match is None:
+            return None
+
+        balance = match.group(1)
+        if balance[-1:] in ("c", "C"):
+            balance = "-" + balance[:-1]
+
+        return balance
+
+    def _to_frame(self, records, index):
+
+        chunk = pd.DataFrame.from_records(
+            records, index = index,
+            columns = ["GL Account No", "GL Account Name", "Document No",
+                       "Posting Date", "Description", "Debit", "Credit",
+                       "Opening Balance"])
+
+        # Types
+        for col in ["Debit", "Credit"]:
+            chunk[col] = pd.to_numeric(
+                chunk[col].replace('', np.nan).fillna(0),
+                errors = 'coerce').astype(float)
+        chunk["Amount"] = chunk["Debit"] - chunk["Credit"]
+        chunk["Opening Balance"] = pd.to_numeric(
+            chunk["Opening Balance"].str.replace(',', ''),
+            errors = 'coerce').astype(float)
+
+        chunk = chunk[self.COLUMN_ORDER]
+
+        # Same as GLProcessor, where the columns are from the header row (0)
+        chunk.columns.name = 0
+
+        return chunk
+
+    def iter_chunks(self):
+
+        rows = self._iter_rows()
+
+        # Position of each column
+        header = self._find_header(rows)
+        col_idx = {name: i for i, name in reversed(list(enumerate(header)))
+                   if not pd.isnull(name)}
+        for col in ["ID#", "Src", "Date", "Memo", "Debit", "Credit"]:
+            if col not in col_idx:
+                raise Exception (f"Column {col} not found in {self.file_path}.")
+        i_id, i_src, i_date, i_memo, i_debit, i_credit = [
+            col_idx[col] for col in ["ID#", "Src", "Date", "Memo", "Debit", "Credit"]]
+        i_first = min(col_idx.values())     # account no is in the 1st column
+        num_cols = len(header)
+
+        # State of the current account block
+        account_no      = None
+        account_name    = None
+        opening_balance = None
+
+        records = []
+        index   = []
+        for i, row in enumerate(rows, start = 1):
+
+            if len(row) < num_cols:
+                row = tuple(row) + (None,) * (num_cols - len(row))
+
+            first   = row[i_first]
+            doc_no  = row[i_id]
+            src     = row[i_src]
+
+            # Account block header e.g. 1-2345 | Cash at bank
+            if isinstance(first, str) and self.ACCOUNT_NO_REGEX.search(first):
+                account_no = first
+            if (account_no is not None) and (doc_no == account_no) and not pd.isnull(src):
+                account_name = src
+
+            balance = self._convert_balance(src)
+            if balance is not None:
+                opening_balance = balance
+
+            # Only keep the transactions
+            if (doc_no == 'Beginning Balance:') or pd.isnull(row[i_date]):
+                continue
+
+            records.append((account_no, account_name, doc_no, row[i_date],
+                            row[i_memo], row[i_debit], row[i_credit],
+                            opening_balance))
+            index.append(i)
+
+            if len(records) >= self.chunksize:
+                yield self._to_frame(records, index)
+                records = []
+                index   = []
+
+        if len(records) > 0:
+            yield self._to_frame(records, index)
+
+    def read(self):
+
+        chunks = list(self.iter_chunks())
+        if len(chunks) == 0:
+            return self._to_frame([], [])
+
+        return pd.concat(chunks)
+
 class GLLoader_From_LunaHub:
 
     def __init__(self, client_number, fy, uploaddatetime=None):
@@ -179,7 +360,7 @@ class GLLoader_From_LunaHub:
     def _connect_to_lunahub(self):
         
         if not hasattr(self, 'lunahub_obj'):            
-            self.lunahub_obj = lunahub.LunaHubConnector(**lunahub.LUNAHUB_CONFIG)
+            self.lunahub_obj = lunahub.get_lunahub_obj()
             
         return self.lunahub_obj
 
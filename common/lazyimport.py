@@ -0,0 +1,58 @@
+'''
+Lazy loading of the classes and submodules of a package (PEP 562).
+
+The __init__.py of a package only lists where each name is defined, and
+the module is imported when the name is first used. So importing e.g.
+luna.common does not import pandas, openpyxl, fuzzywuzzy etc. until they
+are needed.
+
+Usage, in the __init__.py of the package:
+    > from luna.common.lazyimport import get_lazy_loaders
+    > __getattr__, __dir__ = get_lazy_loaders(__name__, {
+    >     "TBLoader_From_LunaHub" : "luna.common.tb",
+    >     })
+
+The submodules (e.g. common.misc) are also loaded on first use.
+'''
+
+# Import standard libraries
+import sys
+import importlib
+
+
+def get_lazy_loaders(package_name, name_to_module):
+    '''
+    Returns the module-level (__getattr__, __dir__) for the package.
+
+    package_name    = __name__ of the package
+    name_to_module  = dict of attribute name -> module where it is defined
+    '''
+
+    def __getattr__(name):
+
+        if name.startswith("__"):
+            raise AttributeError(f"module {package_name!r} has no attribute {name!r}")
+
+        if name in name_to_module:
+            value = getattr(importlib.import_module(name_to_module[name]), name)
+
+        else:
+            # Submodule, e.g. common.misc
+            module_name = f"{package_name}.{name}"
+            try:
+                value = importlib.import_module(module_name)
+            except ModuleNotFoundError as e:
+                if e.name != module_name:
+                    raise
+                raise AttributeError(f"module {package_name!r} has no attribute {name!r}") from None
+
+        # Save, so that __getattr__ is only called once per name
+        setattr(sys.modules[package_name], name, value)
+
+        return value
+
+    def __dir__():
+
+        return sorted(set(vars(sys.modules[package_name])) | set(name_to_module))
+
+    return __getattr__, __dir__
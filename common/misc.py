@@ -1,10 +1,15 @@
 import pandas as pd
 import inspect
 import numpy as np
+import functools
 
-def convert_string_to_interval(s):
+@functools.lru_cache(maxsize=4096)
+def _convert_string_to_bounds(s):
     '''
     s = '4900.2' or '2000-3000'
+    
+    Returns the (left, right) bounds. Memoised as TBs repeat a small set
+    of L/S codes.
     '''
     try:
         if "-" in s:
@@ -14,10 +19,20 @@ def convert_string_to_interval(s):
         else:
             l = float(s)
             r = l
-        interval = pd.Interval(l, r, closed='both')
+        if not l <= r:
+            raise ValueError ("left side of interval must be <= right side")
     except Exception as e:
         raise Exception (f"Unable to convert to interval for: {s}.\n{str(e)}")
     
+    return l, r
+
+def convert_string_to_interval(s):
+    '''
+    s = '4900.2' or '2000-3000'
+    '''
+    l, r = _convert_string_to_bounds(s)
+    interval = pd.Interval(l, r, closed='both')
+    
     return interval
 
 def convert_list_of_string_to_interval(string_list):
@@ -26,6 +41,27 @@ def convert_list_of_string_to_interval(string_list):
     
     return interval_list
 
+def convert_strings_to_interval_array(strings):
+    '''
+    Vectorised convert_string_to_interval for a whole column of strings,
+    e.g. the L/S column of a TB.
+    
+    Each unique string is parsed only once and the bounds are broadcast
+    back to the rows, so no pd.Interval object is created per row.
+    
+    Returns a pd.arrays.IntervalArray (closed='both').
+    '''
+    
+    codes, uniques = pd.factorize(np.asarray(strings, dtype=str))
+    
+    bounds = np.array([_convert_string_to_bounds(str(s)) for s in uniques],
+                      dtype=float).reshape(-1, 2)
+    
+    interval_array = pd.arrays.IntervalArray.from_arrays(
+        bounds[codes, 0], bounds[codes, 1], closed='both')
+    
+    return interval_array
+
 
 def convert_binstrs_to_bin_df(binstr_list):
     '''
@@ -68,6 +104,18 @@ def convert_binstrs_to_bin_df(binstr_list):
     return bin_df
 
 
+def convert_datetime_to_sql_str(dt):
+    '''
+    Converts a datetime (or str) to an unambiguous SQL Server literal,
+    e.g. '2023-12-08T18:39:03.533123'. The microseconds are kept, so that
+    it matches the UPLOADDATETIME (datetime2) exactly.
+    '''
+    
+    dt = pd.to_datetime(dt)
+    
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.%f')
+
+
 def get_my_name():
     '''
     Returns the name of the method when this method is called.
@@ -82,3 +130,5 @@ def get_my_name():
 if __name__ == "__main__":
     
     convert_string_to_interval('24.3-  33')
+    
+    convert_strings_to_interval_array(['24.3-  33', '3000.1', '24.3-  33'])
@@ -77,6 +77,7 @@ class TBReader_ExcelFormat1:
         # Unpack the methods to self
         self.get_data_by_fy = tb_query_class.get_data_by_fy
         self.filter_tb_by_fy_and_ls_codes = tb_query_class.filter_tb_by_fy_and_ls_codes
+        self.filter_tb_by_fy_and_varnames = tb_query_class.filter_tb_by_fy_and_varnames
         ##################################################################
         
     def read_data_from_file(self):
@@ -136,8 +137,8 @@ class TBReader_ExcelFormat1:
                 df_processed[c] = df_processed[c].astype(float)
             
             # Convert the ls code to interval
-            df_processed["L/S (interval)"] = df_processed["L/S"].apply(
-                misc.convert_string_to_interval)
+            df_processed["L/S (interval)"] = misc.convert_strings_to_interval_array(
+                df_processed["L/S"])
             
             # Convert to long
             df_processed_long = self._convert_to_long_format(df_processed, dates_converted)
@@ -198,22 +199,17 @@ class TBReader_ExcelFormat1:
         fy_class = dates.FYGenerator(fy_end_date = self.fy_end_date)
         
         ##### ADD THE FY ########
-        # note: slower if we do it in one line as there are many duplicate dates
-        #    df_processed_long["FY"] =  df_processed_long["Date"].apply(fy_class.get_date_fy)
-
-        # Extract all the dates
-        date_values = df_processed_long["Date"].unique()
-        date_val_to_fy = {d: fy_class.get_date_fy(d) for d in date_values}
-
-        # Add back to the df
-        df_processed_long["FY"] = df_processed_long["Date"].map(date_val_to_fy)
+        df_processed_long["FY"] = fy_class.get_dates_fy(df_processed_long["Date"])
         
         ##### Check if it's full year of data #######
-        date_val_to_completeness = {
-            d: d == fy_class.get_fy_dates(date_val_to_fy[d], which='end')
-            for d in date_values
+        fy_to_end = {
+            fy: fy_class.get_fy_dates(fy, which='end')
+            for fy in df_processed_long["FY"].unique()
             }
-        df_processed_long["Completed FY?"] = df_processed_long["Date"].map(date_val_to_completeness)
+        df_processed_long["Completed FY?"] = (
+            pd.to_datetime(df_processed_long["Date"]) 
+            == pd.to_datetime(df_processed_long["FY"].map(fy_to_end))
+            )
         
         return df_processed_long.copy(), fy_class
        
@@ -320,22 +316,41 @@ class TBUploader_To_LunaHub(LunaHubBaseUploader):
                
         # --------------------------------------------------
         # load tb table
-        self.lunahub_obj.insert_dataframe('tb', df)
+        self.upload_stats = self.lunahub_obj.bulk_insert_dataframe('tb', df)
         #-------------------------------------------------------
         
 
 
 class TBLoader_From_LunaHub:
     
-    def __init__(self, client_number, fy, uploaddatetime=None):
+    # LunaHub column -> TB column
+    COLUMN_MAPPER = {
+        'ACCOUNTNUMBER'     : 'Account No',
+        'ACCOUNTNAME'       : 'Name',
+        'LSCODE'            : 'L/S',
+        'CLASS'             : 'Class',
+        'DATE'              : 'Date',
+        'VALUE'             : 'Value',
+        "FY"                : "FY",
+        "COMPLETEDFY"       : "Completed FY?"}
+    
+    def __init__(self, client_number, fy, uploaddatetime=None,
+                 server_side_filter=True):
         '''
         specify uploaddatetime (in str) when there are multiple versions of the same data.
+        
+        server_side_filter = True to let the SQL server pick the version 
+                             (latest or uploaddatetime) and return only 
+                             the mapped columns. 
+                             False to download all the versions and 
+                             filter in pandas.
         '''
         
         
         self.client_number  = int(client_number)
         self.fy             = int(fy)
         self.uploaddatetime = uploaddatetime
+        self.server_side_filter = server_side_filter
         
         self.main()
     
@@ -352,90 +367,271 @@ class TBLoader_From_LunaHub:
         # Unpack the methods to self
         self.get_data_by_fy = tb_query_class.get_data_by_fy
         self.filter_tb_by_fy_and_ls_codes = tb_query_class.filter_tb_by_fy_and_ls_codes
+        self.filter_tb_by_fy_and_varnames = tb_query_class.filter_tb_by_fy_and_varnames
         ##################################################################
         
     def _connect_to_lunahub(self):
         
         if not hasattr(self, 'lunahub_obj'):            
-            self.lunahub_obj = lunahub.LunaHubConnector(**lunahub.LUNAHUB_CONFIG)
+            self.lunahub_obj = lunahub.get_lunahub_obj()
             
         return self.lunahub_obj
 
+    def _get_where_clause(self):
+        '''
+        Filter by client and by a date range for the fy. 
+        
+        Equivalent to YEAR([DATE]) = fy, but sargable so that an index on 
+        (CLIENTNUMBER, DATE, UPLOADDATETIME) can be used.
+        '''
+        
+        where_clause = (
+            f"([CLIENTNUMBER] = {self.client_number}) "
+            f"AND ([DATE] >= '{self.fy:04d}0101') "
+            f"AND ([DATE] < '{self.fy + 1:04d}0101')"
+            )
+        
+        return where_clause
     
-    def load_from_tb(self):
+    def _select_version(self, version_df):
+        '''
+        Returns the UPLOADDATETIME to take, or None to take all the data.
+        Used by both _read_from_lunahub and _read_from_lunahub_server_side.
+        
+        version_df = one row per (DATE, UPLOADER, UPLOADDATETIME).
+            - one row: all the data (uploaddatetime is not used)
+            - multiple rows: the latest, or the exact uploaddatetime
+              if specified (no data if it does not match).
+        '''
+        
+        if version_df.shape[0] <= 1:
+            return None
+        
+        if self.uploaddatetime is None:
+            
+            latest_version = pd.to_datetime(version_df["UPLOADDATETIME"]).max()
+            
+            msg = (
+                f"Multiple versions for client={self.client_number} "
+                f"Took the latest = {latest_version}."
+                )
+            self.status = msg
+            logger.debug(msg)
+            
+            return latest_version
+        
+        if isinstance(self.uploaddatetime, str):
+            self.uploaddatetime = pd.to_datetime(self.uploaddatetime)
+        
+        return self.uploaddatetime
+    
+    def _get_versions_server_side(self, where_clause):
+        '''
+        Returns the versions of the fy, one row per 
+        (DATE, UPLOADER, UPLOADDATETIME), with the number of rows.
+        '''
+        
+        query = (
+            "SELECT [DATE], [UPLOADER], [UPLOADDATETIME], COUNT(*) AS [NUMROWS] "
+            f"FROM tb WHERE {where_clause} "
+            "GROUP BY [DATE], [UPLOADER], [UPLOADDATETIME]"
+            )
+        df = self._connect_to_lunahub().read_table(query = query)
+        
+        df["UPLOADDATETIME"] = pd.to_datetime(df["UPLOADDATETIME"])
+        
+        return df
+    
+    def _read_from_lunahub_server_side(self):
+        '''
+        Only the required version and the mapped columns are transferred.
+        
+        The versions are probed once, and the version to take is written
+        into the data query, see _select_version.
+        '''
         
         lunahub_obj = self._connect_to_lunahub()
         
+        where_clause = self._get_where_clause()
+        
+        # Version to take
+        version_df = self._get_versions_server_side(where_clause)
+        version = self._select_version(version_df)
+        
+        if version is None:
+            version_clause = "1 = 1"
+            latest_version = version_df["UPLOADDATETIME"].max()
+            num_rows = int(version_df["NUMROWS"].sum())
+        else:
+            uploaddatetime_str = misc.convert_datetime_to_sql_str(version)
+            version_clause = f"[UPLOADDATETIME] = '{uploaddatetime_str}'"
+            latest_version = version
+            is_version = version_df["UPLOADDATETIME"] == version
+            num_rows = int(version_df.loc[is_version, "NUMROWS"].sum())
+        
+        columns = ", ".join(f"[{c}]" for c in self.COLUMN_MAPPER.keys())
+        
         query = (
-            "SELECT * FROM tb "
+            f"SELECT {columns} FROM tb "
             "WHERE "
+            f"{where_clause} AND ({version_clause})"
+            )
+        
+        # The cache key is known from the probe above
+        df = lunahub.LUNAHUB_CACHE.read_table(
+            lunahub_obj, "tb", query, where_clause,
+            self.client_number, self.fy,
+            version = (latest_version, num_rows))
+        
+        return df
+    
+    def _read_from_lunahub(self):
+        '''
+        All versions are downloaded, and the version is selected in pandas.
+        '''
+        
+        lunahub_obj = self._connect_to_lunahub()
+        
+        where_clause = (
             f"([CLIENTNUMBER] = {self.client_number}) AND (YEAR([DATE]) = {self.fy})"
             )
+        query = f"SELECT * FROM tb WHERE {where_clause}"
                 
-        df = lunahub_obj.read_table(query = query)
+        df = lunahub.LUNAHUB_CACHE.read_table(
+            lunahub_obj, "tb", query, where_clause,
+            self.client_number, self.fy)
         
         # Check if there are multiple records for this run
         version_df = df[["DATE", "UPLOADER", "UPLOADDATETIME"]].drop_duplicates()
+        version = self._select_version(version_df)
         
-        if (version_df.shape[0] > 1):
-            
-            if self.uploaddatetime is None:
-
-                if True:
-                    versions = version_df["UPLOADDATETIME"]
-                    latest_version = versions.max()
-
-                    # Filter by latest
-                    df = df.copy()
-                    df_latest = df[df["UPLOADDATETIME"] == latest_version]
-                    df = df_latest
-
-                    if len(versions) > 1:
-                        msg = (
-                            f"Multiple versions for client={self.client_number} "
-                            #f"and fy={self.fy}: {versions}. "
-                            f"Took the latest = {latest_version}."
-                            )
-                        self.status = msg
-                        logger.debug(msg)
-
-                    
-                if False:
-                    msg = f"Multiple records exist.\n\n{version_df.__repr__()}."
-                    msg += "\n\nPlease set uploaddatetime."
-                    
-                    raise Exception (msg)
-                
-            else:
-                
-                if isinstance(self.uploaddatetime, str):
-                    self.uploaddatetime = pd.to_datetime(self.uploaddatetime)
-                
-                # Filter
-                df = df[df["UPLOADDATETIME"] == self.uploaddatetime]
+        if version is not None:
+            df = df[df["UPLOADDATETIME"] == version]
+        
+        return df
+    
+    def load_from_tb(self):
+        
+        if self.server_side_filter:
+            df = self._read_from_lunahub_server_side()
+        else:
+            df = self._read_from_lunahub()
 
         # Map column names
-        column_mapper = {
-            'ACCOUNTNUMBER'     : 'Account No',
-            'ACCOUNTNAME'       : 'Name',
-            'LSCODE'            : 'L/S',
-            'CLASS'             : 'Class',
-            'DATE'              : 'Date',
-            'VALUE'             : 'Value',
-            "FY"                : "FY",
-            "COMPLETEDFY"       : "Completed FY?"}
+        column_mapper = self.COLUMN_MAPPER
         
         df = df.rename(columns = column_mapper)[list(column_mapper.values())]
         
         # Convert L/S code to intervals
-        df["L/S (interval)"] = df["L/S"].astype(str).apply(
-            misc.convert_string_to_interval)
+        df["L/S (interval)"] = misc.convert_strings_to_interval_array(
+            df["L/S"].astype(str))
             
         self.df_processed_long = df.copy()
         
         return self.df_processed_long
           
 
+class LSIntervalEngine:
+    
+    def __init__(self, ls_intervals):
+        '''
+        Vectorised overlap queries against a column of L/S intervals.
+        
+        ls_intervals = a pd.Series (or array-like) of pd.Interval, e.g. 
+                       the "L/S (interval)" column of a TB.
+        
+        The interval bounds are stored once as numpy arrays so that any 
+        number of query intervals can be checked with broadcast 
+        comparisons instead of one python-level overlaps() per row.
+        
+        Main methods:
+            - get_overlap_matrix
+            - get_overlap
+        '''
+        
+        ls_arr = pd.arrays.IntervalArray(ls_intervals)
+        
+        self.index          = getattr(ls_intervals, "index", None)
+        self.left           = np.asarray(ls_arr.left, dtype=float)
+        self.right          = np.asarray(ls_arr.right, dtype=float)
+        self.closed_left    = ls_arr.closed in ("left", "both")
+        self.closed_right   = ls_arr.closed in ("right", "both")
+        
+    def __len__(self):
+        
+        return self.left.shape[0]
+        
+    @staticmethod
+    def convert_interval_list(interval_list):
+        '''
+        Validates interval_list and converts the strings to pd.Interval.
+        '''
+        
+        if not isinstance(interval_list, list):
+            err = "Input interval_list must be a list of intervals."
+            raise Exception (err)
+        
+        # Convert to interval type, if string is provided
+        intervals = [
+            misc.convert_string_to_interval(interval)
+            if type(interval) in [str] else interval
+            for interval in interval_list
+            ]
+        
+        for interval in intervals:
+            if not isinstance(interval, pd.Interval):
+                raise TypeError (f"Unexpected interval: {interval} "
+                                 f"({type(interval).__name__}).")
+        
+        return intervals
+        
+    def _prepare_query(self, interval_list):
+        
+        intervals = self.convert_interval_list(interval_list)
+        
+        q_left          = np.array([i.left for i in intervals], dtype=float)
+        q_right         = np.array([i.right for i in intervals], dtype=float)
+        q_closed_left   = np.array([i.closed_left for i in intervals], dtype=bool)
+        q_closed_right  = np.array([i.closed_right for i in intervals], dtype=bool)
+        
+        return q_left, q_right, q_closed_left, q_closed_right
+
+    def get_overlap_matrix(self, interval_list):
+        '''
+        Returns a boolean np.array of shape (rows, len(interval_list)) where
+        cell (i, j) is True if row i overlaps interval_list[j].
+        
+        Same rule as pd.Interval.overlaps: touching endpoints only count
+        when both sides are closed at that endpoint.
+        '''
+        
+        q_left, q_right, q_closed_left, q_closed_right = \
+            self._prepare_query(interval_list)
+        
+        left    = self.left[:, None]
+        right   = self.right[:, None]
+        
+        # row.left vs query.right
+        inclusive1  = self.closed_left & q_closed_right
+        cond1       = np.where(inclusive1, left <= q_right, left < q_right)
+        
+        # query.left vs row.right
+        inclusive2  = q_closed_left & self.closed_right
+        cond2       = np.where(inclusive2, q_left <= right, q_left < right)
+        
+        return cond1 & cond2
+
+    def get_overlap(self, interval_list):
+        '''
+        Returns a boolean pd.Series that is True when the row overlaps any
+        of the intervals in interval_list.
+        '''
+        
+        is_overlap = self.get_overlap_matrix(interval_list).any(axis=1)
+        
+        return pd.Series(is_overlap, index=self.index)
+    
+
 class TBQueryClass:
     
     def __init__(self, df_processed_long):
@@ -455,8 +651,24 @@ class TBQueryClass:
             raise KeyError (f"FY={fy} not found. Valid FYs: {list(valid_fys)}")
             
         return self.gb_fy.get_group(fy)
-        
     
+    def get_ls_engine_by_fy(self, fy):
+        '''
+        Returns the LSIntervalEngine for the fy. Built once per fy.
+        '''
+        
+        if not hasattr(self, 'ls_engines'):
+            
+            self.ls_engines = {}
+        
+        fy = int(fy)
+        if fy not in self.ls_engines:
+            
+            df = self.get_data_by_fy(fy)
+            self.ls_engines[fy] = LSIntervalEngine(df["L/S (interval)"])
+            
+        return self.ls_engines[fy]
+        
     def filter_tb_by_fy_and_ls_codes(self, fy, interval_list):
         '''
         interval_list = a list of pd.Interval
@@ -469,30 +681,77 @@ class TBQueryClass:
             
         df = self.get_data_by_fy(fy)
         
-        # Loop through all the intervals
-        temp = []
-        for interval in interval_list:
-            
-            # Convert to interval type, if string is provided
-            if type(interval) in [str]:
-                interval = misc.convert_string_to_interval(interval)
-            
-            # Check overlap
-            is_overlap = df["L/S (interval)"].apply(lambda i: i.overlaps(interval))
-            is_overlap.name = interval
-            temp.append(is_overlap)
-            
-        # Concat
-        temp_df = pd.concat(temp, axis=1, names = interval_list)
-        
         # final is overlap
-        is_overlap = temp_df.any(axis=1)
+        is_overlap = self.get_ls_engine_by_fy(fy).get_overlap(interval_list)
         
         # get hits
         true_match = df[is_overlap]
         false_match = df[~is_overlap]
         
         return is_overlap, true_match, false_match
+    
+    def filter_tb_by_fy_and_varnames(self, fy, varname_to_intervals,
+                                     errors = 'raise'):
+        '''
+        Batched version of filter_tb_by_fy_and_ls_codes for many var_names.
+        
+        All the intervals are checked against the TB in a single pass,
+        then reduced to one column per var_name.
+        
+        varname_to_intervals = pd.Series of var_name -> interval_list,
+                               e.g. mapper_class.varname_to_lscodes
+        errors               = 'raise' or 'ignore'. If 'ignore', var_names 
+                               with an invalid interval_list (e.g. formulas)
+                               are left out of the output.
+        
+        Returns
+        -------
+        membership : pd.DataFrame of bool; TB rows (of the fy) x var_names
+        totals     : pd.Series; sum of Value by var_name
+        '''
+        
+        if errors not in ['raise', 'ignore']:
+            raise ValueError (f"Invalid errors={errors}. "
+                              "Expected either 'raise' or 'ignore'.")
+        
+        df = self.get_data_by_fy(fy)
+        engine = self.get_ls_engine_by_fy(fy)
+        
+        # Flatten the interval lists, tagging each interval to its var_name
+        varnames    = []
+        intervals   = []
+        owners      = []
+        for varname, interval_list in varname_to_intervals.items():
+            
+            try:
+                interval_list = engine.convert_interval_list(interval_list)
+            except Exception as e:
+                if errors == 'raise':
+                    raise Exception (f"Invalid intervals for var_name={varname}."
+                                     f"\n{str(e)}")
+                continue
+            
+            intervals.extend(interval_list)
+            owners.extend([len(varnames)] * len(interval_list))
+            varnames.append(varname)
+        
+        # rows x intervals
+        overlap = engine.get_overlap_matrix(intervals)
+        
+        # Reduce intervals -> var_names
+        owner_matrix = np.zeros((len(intervals), len(varnames)), dtype=np.float32)
+        owner_matrix[np.arange(len(intervals)), owners] = 1
+        is_member = (overlap.astype(np.float32) @ owner_matrix) > 0
+        
+        membership = pd.DataFrame(is_member, index=df.index,
+                                  columns=pd.Index(varnames, name="var_name"))
+        
+        # Total by var_name
+        values = df["Value"].astype(float).fillna(0).to_numpy()
+        totals = pd.Series(is_member.T.astype(float) @ values,
+                           index=membership.columns, name="Value")
+        
+        return membership, totals
 
 if __name__ == "__main__":
     
@@ -539,6 +798,19 @@ if __name__ == "__main__":
                 self.filter_tb_by_fy_and_ls_codes(2022, interval_list)
                 
             assert False, "End of test."
+            
+        # Test batched var_name mapping
+        if False:
+            
+            varname_to_intervals = pd.Series(
+                {"var1": ["7200-7500", "3000.1"],
+                 "var2": [pd.Interval(3000, 4000, 'left')],
+                 "var3": ["=var1+var2"]})
+            
+            membership, totals = self.filter_tb_by_fy_and_varnames(
+                2022, varname_to_intervals, errors = 'ignore')
+            
+            assert False, "End of test."
 
         
         # Looad and delete from lunahub
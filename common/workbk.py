@@ -1,15 +1,32 @@
+import time
+import logging
+import contextlib
 import pandas as pd
 import numpy as np
 import re
+import io
+import datetime
+from zipfile import ZipFile, ZIP_DEFLATED
 
 import openpyxl
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
 from openpyxl.worksheet.datavalidation import DataValidation
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+from openpyxl.writer.excel import ExcelWriter
 from openpyxl.utils import get_column_letter
 from openpyxl.utils import column_index_from_string
+from openpyxl.xml.functions import tostring
 
 from copy import copy
 
+# Configure logger
+logger = logging.getLogger()
+if not(logger.hasHandlers()):
+    logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.DEBUG)
+
 class CreditDropdownList:
     ROW = "J2:J1048576" #TODO: Update this to not hardcode?
     
@@ -82,9 +99,360 @@ class CreditDropdownList:
             self.data = data
             
             return self.data
+
+
+# openpyxl versions on which the write-only sheets (to_write_only_sheet)
+# are known to round-trip. Other versions are checked once at runtime with
+# check_write_only_round_trip, and the sheets are kept in memory if the
+# check fails.
+OPENPYXL_TESTED_VERSIONS = ["3.1"]
+
+_WRITE_ONLY_SUPPORTED = None
+
+
+class StreamedWorksheet(WriteOnlyWorksheet):
+    '''
+    Write-only sheet in a normal workbook, see to_write_only_sheet.
+
+    num_rows = number of rows appended so far.
+    '''
+
+    def __init__(self, parent, title):
+
+        WriteOnlyWorksheet.__init__(self, parent, title)
+
+        self.num_rows = 0
+        self._settings_xml = None
+
+    def _get_settings_xml(self):
+
+        # What openpyxl writes before the first row, i.e. before the rows
+        # are streamed: sheet properties, views, format and columns
+        trees = [self.sheet_properties.to_tree(), self.views.to_tree(),
+                 self.sheet_format.to_tree(), self.column_dimensions.to_tree()]
+
+        return b"".join(tostring(tree) for tree in trees if tree is not None)
+
+    def append(self, row):
+
+        WriteOnlyWorksheet.append(self, row)
+        self.num_rows += 1
+
+        # The settings are written with the first row
+        if self._settings_xml is None:
+            self._settings_xml = self._get_settings_xml()
+
+    def check_settings(self):
+        '''
+        Raises if the sheet settings were changed after the first row was
+        written, as the changes would not be saved.
+        '''
+
+        if (self._settings_xml is not None) and (self._get_settings_xml() != self._settings_xml):
+            raise Exception (
+                f"The views, column widths or properties of sheet {self.title} "
+                "were changed after its rows were streamed, and cannot be "
+                "saved. Set them before to_write_only_sheet.")
+
+
+class _WriteOnlyWorkbookView:
+    '''
+    The workbook as seen by ExcelWriter.write_worksheet for a write-only
+    sheet, i.e. as a write-only workbook.
+    '''
+
+    write_only = True
+
+    def __init__(self, wb):
+        self._wb = wb
+
+    def __getattr__(self, name):
+        return getattr(self._wb, name)
+
+
+class _MixedExcelWriter(ExcelWriter):
+    '''
+    openpyxl ExcelWriter for a normal workbook which also has write-only
+    sheets (see to_write_only_sheet). The write-only sheets are written by
+    openpyxl as in a write-only workbook.
+    '''
+
+    def write_worksheet(self, ws):
+
+        if not isinstance(ws, WriteOnlyWorksheet):
+            return ExcelWriter.write_worksheet(self, ws)
+
+        wb = self.workbook
+        self.workbook = _WriteOnlyWorkbookView(wb)
+        try:
+            ExcelWriter.write_worksheet(self, ws)
+        finally:
+            self.workbook = wb
+
+
+def save_workbook(wb, fp):
+    '''
+    Same as wb.save(fp), but also works if some sheets were replaced by
+    write-only sheets with to_write_only_sheet.
+
+    fp = file path or file-like object.
+    '''
+
+    # Before anything is written
+    for ws in wb.worksheets:
+        if isinstance(ws, StreamedWorksheet):
+            ws.check_settings()
+
+    archive = ZipFile(fp, "w", ZIP_DEFLATED, allowZip64 = True)
+    wb.properties.modified = datetime.datetime.now(tz = datetime.timezone.utc).replace(tzinfo = None)
+    _MixedExcelWriter(wb, archive).save()
+
+    return fp
+
+
+def supports_write_only_sheets():
+    '''
+    True if to_write_only_sheet can be used with the installed openpyxl.
+
+    The versions in OPENPYXL_TESTED_VERSIONS are supported. Other versions
+    are checked once with check_write_only_round_trip.
+    '''
+
+    global _WRITE_ONLY_SUPPORTED
+
+    if _WRITE_ONLY_SUPPORTED is None:
+
+        version = ".".join(openpyxl.__version__.split(".")[:2])
+
+        if version in OPENPYXL_TESTED_VERSIONS:
+            _WRITE_ONLY_SUPPORTED = True
+        else:
+            try:
+                check_write_only_round_trip()
+                _WRITE_ONLY_SUPPORTED = True
+            except Exception as e:
+                logger.warning(f"Write-only sheets are not supported with "
+                               f"openpyxl {openpyxl.__version__}: {str(e)}")
+                _WRITE_ONLY_SUPPORTED = False
+
+    return _WRITE_ONLY_SUPPORTED
+
+
+def _to_write_only_sheet(wb, sheet_name):
+
+    templ_ws = wb[sheet_name]
+    idx = wb.index(templ_ws)
+
+    if templ_ws._images or templ_ws._charts or templ_ws.tables:
+        raise Exception (f"Sheet {sheet_name} has images, charts or tables, "
+                         "which cannot be kept in a write-only sheet.")
+
+    wb.remove(templ_ws)
+    ws = StreamedWorksheet(wb, sheet_name)
+    wb._add_sheet(ws, idx)
+
+    # Sheet settings
+    for attr in ["sheet_properties", "sheet_format", "views", "sheet_state",
+                 "defined_names", "conditional_formatting", "data_validations",
+                 "auto_filter", "print_options", "page_margins"]:
+        setattr(ws, attr, getattr(templ_ws, attr))
+    for key, dim in templ_ws.column_dimensions.items():
+        ws.column_dimensions[key] = copy(dim)
+    for merged in templ_ws.merged_cells.ranges:
+        ws.merged_cells.add(merged.coord)
+
+    # Existing rows
+    num_rows = templ_ws.max_row if templ_ws._cells else 0
+    for row in templ_ws.iter_rows(min_row = 1, max_row = num_rows,
+                                  min_col = 1, max_col = templ_ws.max_column):
+        values = []
+        for cell in row:
+            if (cell.value is None) and (not cell.has_style) and (cell.hyperlink is None):
+                values.append(None)
+                continue
+            new_cell = WriteOnlyCell(ws, cell.value)
+            if cell.has_style:
+                new_cell._style = copy(cell._style)
+            if cell.hyperlink is not None:
+                new_cell.hyperlink = copy(cell.hyperlink)
+            values.append(new_cell)
+        ws.append(values)
+
+    return ws
+
+
+def to_write_only_sheet(wb, sheet_name):
+    '''
+    Replaces a sheet of a normal openpyxl workbook by a write-only sheet
+    at the same position, so that the rows appended to it are streamed to
+    a temp file instead of being kept in memory as cell objects.
+
+    The cells of the sheet (e.g. a styled report header), merged cells and
+    the sheet settings (tab colour, views, column widths, ...) are kept:
+    the existing rows are streamed first, and the data can be appended
+    after them with ws.append().
+
+    The settings are written with the first row, so set the views, column
+    widths etc. before. save_workbook raises if they are changed after.
+    The workbook must be saved with save_workbook.
+
+    Returns a StreamedWorksheet (an openpyxl WriteOnlyWorksheet).
+    '''
+
+    if not supports_write_only_sheets():
+        raise Exception (f"Write-only sheets are not supported with "
+                         f"openpyxl {openpyxl.__version__}.")
+
+    return _to_write_only_sheet(wb, sheet_name)
+
+
+def check_write_only_round_trip():
+    '''
+    Saves a small workbook with a write-only sheet (to_write_only_sheet and
+    save_workbook) and reads it back, to check that the header, merged
+    cells, styles, column widths, views and hyperlinks are kept.
+
+    Raises if anything is different.
+    '''
+
+    wb = Workbook()
+    summary_ws = wb.active
+    summary_ws.title = "Summary"
+    summary_ws["A1"].value = "Summary"
+
+    ws = wb.create_sheet("Data")
+    ws["A1"].value = "Title"
+    ws["A1"].font = Font(bold = True)
+    ws["A1"].fill = PatternFill("solid", fgColor = "FFD9D9D9")
+    ws.merge_cells("A1:C1")
+    ws["A2"].value = "<<<Return>>>"
+    ws["A2"].hyperlink = "#'Summary'!A1"
+    ws.column_dimensions["B"].width = 30
+    ws.column_dimensions["C"].hidden = True
+    wb.active = ws
+    for sheet in wb:
+        sheet.views.sheetView[0].tabSelected = sheet.title == "Data"
+    wb.create_sheet("Last")
+
+    ws = _to_write_only_sheet(wb, "Data")
+    ws.append([])
+    cell = WriteOnlyCell(ws, 1234.5)
+    cell.number_format = "#,##0.00"
+    ws.append(["a", cell, datetime.datetime(2023, 12, 31)])
+
+    fp = io.BytesIO()
+    save_workbook(wb, fp)
+    wb2 = openpyxl.load_workbook(fp)
+    ws2 = wb2["Data"]
+
+    checks = {
+        "sheet order"   : wb2.sheetnames == ["Summary", "Data", "Last"],
+        "header value"  : ws2["A1"].value == "Title",
+        "header font"   : ws2["A1"].font.b is True,
+        "header fill"   : ws2["A1"].fill.fgColor.rgb == "FFD9D9D9",
+        "merged cells"  : [str(r) for r in ws2.merged_cells.ranges] == ["A1:C1"],
+        "hyperlink"     : (ws2["A2"].hyperlink is not None) and ("Summary" in str(ws2["A2"].hyperlink.location or ws2["A2"].hyperlink.target)),
+        "column width"  : ws2.column_dimensions["B"].width == 30,
+        "hidden column" : ws2.column_dimensions["C"].hidden is True,
+        "active sheet"  : wb2.active.title == "Data",
+        "tab selected"  : (ws2.views.sheetView[0].tabSelected is True) and not wb2["Summary"].views.sheetView[0].tabSelected,
+        "values"        : [c.value for c in ws2[4]] == ["a", 1234.5, datetime.datetime(2023, 12, 31)],
+        "number format" : ws2["B4"].number_format == "#,##0.00",
+        "other sheets"  : wb2["Summary"]["A1"].value == "Summary",
+        }
+
+    failed = [name for name, ok in checks.items() if not ok]
+    if len(failed) > 0:
+        raise Exception (f"Write-only sheet round trip failed for: {failed}")
+
+    return True
+
+
+class WorkbookSession:
+
+    def __init__(self, template_fp, output_fp):
+        '''
+        Opens a template workbook once, so that all the writers work on
+        the same in-memory openpyxl Workbook, and saves it once at the end.
+
+        Each writer step can be timed with step(), to get a breakdown of
+        the time taken by sheet.
+
+        Usage:
+            > session = WorkbookSession(template_fp, output_fp)
+            > wb = session.open()
+            > with session.step("Sheet 1"):
+            >     wb["Sheet 1"]["A1"].value = 1
+            > session.save()
+            > session.get_timings()
+        '''
+
+        self.template_fp    = template_fp
+        self.output_fp      = output_fp
+
+        self.wb         = None
+        self.timings    = {}
+
+    def open(self):
+
+        if self.wb is None:
+            with self.step("Open template"):
+                self.wb = openpyxl.load_workbook(self.template_fp)
+
+        return self.wb
+
+    @contextlib.contextmanager
+    def step(self, name):
+        '''
+        Context manager to time a step. Repeated names are added up.
+        '''
+
+        start = time.perf_counter()
+        try:
+            yield self.wb
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - start
+
+    def save(self):
+
+        if self.wb is None:
+            raise Exception ("Workbook is not opened. Call open() first.")
+
+        with self.step("Save"):
+            save_workbook(self.wb, self.output_fp)
+            self.wb.close()
+
+        return self.output_fp
+
+    def get_write_only_sheet(self, sheet_name):
+        '''
+        Replaces a sheet of the workbook by a write-only sheet, to stream a
+        large data tab. See to_write_only_sheet.
+        '''
+
+        return to_write_only_sheet(self.open(), sheet_name)
+
+    def get_timings(self):
+
+        return pd.Series(self.timings, name = "Time (s)", dtype = float)
+
+    def log_timings(self):
+
+        timings = self.get_timings()
+        msg = (
+            f"Wrote {self.output_fp} in {timings.sum():.2f}s:\n"
+            f"{timings.round(2).to_string()}"
+            )
+        logger.debug(msg)
+
             
 if __name__ == "__main__":
 
+      # Tester of the write-only sheets
+      if True:
+
+            check_write_only_round_trip()
+
 
       if False:
             
@@ -1,2 +1,5 @@
-import luna.fsvi.mas as mas
-import luna.fsvi.funds as funds
\ No newline at end of file
+# fsvi.mas and fsvi.funds are only imported on first use, see
+# common/lazyimport.py
+from luna.common.lazyimport import get_lazy_loaders
+
+__getattr__, __dir__ = get_lazy_loaders(__name__, {})
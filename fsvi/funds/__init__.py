@@ -1,2 +1,8 @@
-from .invmt_report_formatter import InvmtOutputFormatter
-from .invmt_report_template_reader import FundsInvmtTemplateReader
\ No newline at end of file
+# The classes are only imported on first use, see common/lazyimport.py
+from luna.common.lazyimport import get_lazy_loaders
+
+__getattr__, __dir__ = get_lazy_loaders(__name__, {
+    "InvmtOutputFormatter"      : "luna.fsvi.funds.invmt_report_formatter",
+    "FundsInvmtTemplateReader"  : "luna.fsvi.funds.invmt_report_template_reader",
+    "FundsInputBundle"          : "luna.fsvi.funds.invmt_input_loader",
+    })
@@ -0,0 +1,187 @@
+# Import standard libraries
+import time
+import logging
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+# Import luna package
+import luna
+import luna.common as common
+from luna.lunahub import tables
+
+# Configure logger
+logger = logging.getLogger()
+if not(logger.hasHandlers()):
+    logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.DEBUG)
+
+
+class FundsInputBundle:
+
+    def __init__(self, client_number, fy,
+                 max_workers = None,
+                 user_response_attempts = 12):
+        '''
+        Loads all the lunahub inputs of the funds investment report
+        concurrently.
+
+        Each table is an independent round trip to lunahub, so the reads
+        are issued from a thread pool (pyodbc releases the GIL while
+        waiting on the server). The wall time is then roughly that of the
+        slowest query, instead of the sum of all the queries.
+
+        Each thread draws its own connector from lunahub.LUNAHUB_POOL.
+
+        max_workers             = number of threads. Default is one per table.
+        user_response_attempts  = number of tries to read the user response,
+                                  as it may not be uploaded yet.
+
+        Output attributes:
+            - classes   : dict of the loader classes, named as per the
+                          parameters of InvmtOutputFormatter
+            - dfs       : dict of the loaded dataframes
+            - timings   : pd.Series of the time taken (seconds) by table
+
+        Usage:
+            > bundle = FundsInputBundle(client_number, fy)
+            > InvmtOutputFormatter(**bundle.classes,
+            >                      user_inputs = bundle.user_inputs, ...)
+        '''
+
+        self.client_number          = int(client_number)
+        self.fy                     = int(fy)
+        self.max_workers            = max_workers
+        self.user_response_attempts = user_response_attempts
+
+        self.main()
+
+    def main(self):
+
+        self.load_data()
+        self.log_timings()
+
+    def _get_loaders(self):
+        '''
+        Returns dict of name -> function that initialises and loads the
+        lunahub class.
+
+        The class must be initialised in the worker thread, so that it
+        draws the connector of that thread.
+        '''
+
+        client_number   = self.client_number
+        fy              = self.fy
+
+        def load(cls, *args):
+            def loader():
+                loader_class = cls(*args)
+                if not hasattr(loader_class, "df_processed"):
+                    loader_class.main()
+                return loader_class
+            return loader
+
+        loaders = {
+            "client_class"      : load(tables.client.ClientInfoLoader_From_LunaHub,
+                                       client_number),
+            "sublead_class"     : load(tables.fs_funds_invmt_output_sublead.FundsSublead_DownloaderFromLunaHub,
+                                       client_number, fy),
+            "portfolio_class"   : load(tables.fs_funds_invmt_output_portfolio.FundsPortfolio_DownloaderFromLunaHub,
+                                       client_number, fy),
+            "recon_class"       : load(tables.fs_funds_invmt_txn_recon_details.FundsInvmtTxnReconDetail_DownloaderFromLunaHub,
+                                       client_number, fy),
+            "broker_class"      : load(tables.fs_funds_broker_statement.FundsBrokerStatement_DownloaderFromLunaHub,
+                                       client_number, fy),
+            "custodian_class"   : load(tables.fs_funds_custodian_confirmation.FundsCustodianConfirmation_DownloaderFromLunaHub,
+                                       client_number, fy),
+            "processedtransaction_class" : load(tables.fs_funds_fundadmin_txn.FundsFundAdminTxn_DownloaderFromLunaHub,
+                                                client_number, fy),
+            "processedportfolio_class"   : load(tables.fs_funds_fundadmin_portfolio.FundsFundAdminPortfolio_DownloaderFromLunaHub,
+                                                client_number, fy),
+            "tb_class"          : lambda: common.TBLoader_From_LunaHub(client_number, fy),
+            "user_response_class" : self._load_user_response,
+            }
+
+        return loaders
+
+    def _load_user_response(self):
+
+        for attempt in range(self.user_response_attempts):
+            user_response_class = tables.fs_funds_userresponse.FundsUserResponse_DownloaderFromLunaHub(
+                self.client_number,
+                self.fy)
+            user_inputs = user_response_class.main()
+            if user_inputs is not None:
+                break
+
+        if user_inputs is None:
+            raise Exception (f"Data not found for specified client {self.client_number} or FY {self.fy}.")
+
+        return user_response_class
+
+    def load_data(self):
+
+        loaders = self._get_loaders()
+
+        def timed(loader):
+            start = time.perf_counter()
+            loader_class = loader()
+            return loader_class, time.perf_counter() - start
+
+        # Issue all the reads at once
+        start = time.perf_counter()
+        max_workers = self.max_workers if self.max_workers is not None else len(loaders)
+        with ThreadPoolExecutor(max_workers = max_workers) as executor:
+            futures = {
+                name: executor.submit(timed, loader)
+                for name, loader in loaders.items()
+                }
+            results = {name: future.result() for name, future in futures.items()}
+        total_time = time.perf_counter() - start
+
+        # Unpack
+        classes = {name: results[name][0] for name in loaders}
+        timings = pd.Series({name: results[name][1] for name in loaders},
+                            name = "Time (s)")
+
+        # Data
+        dfs = {}
+        for name, loader_class in classes.items():
+            if name == "tb_class":
+                dfs[name] = loader_class.df_processed_long
+            elif name == "client_class":
+                dfs[name] = loader_class.df_client_fy_latest
+            else:
+                dfs[name] = loader_class.df_processed
+
+        # Save as attr
+        self.user_response_class = classes.pop("user_response_class")
+        self.user_inputs = dfs.pop("user_response_class")
+        self.classes    = classes
+        self.dfs        = dfs
+        self.timings    = timings
+        self.total_time = total_time
+
+        return self.dfs
+
+    def log_timings(self):
+
+        msg = (
+            f"Loaded funds inputs for client={self.client_number} "
+            f"and fy={self.fy} in {self.total_time:.2f}s "
+            f"(sum of tables = {self.timings.sum():.2f}s):\n"
+            f"{self.timings.sort_values(ascending = False).round(2).to_string()}"
+            )
+        logger.debug(msg)
+
+
+if __name__ == "__main__":
+
+    # Tester
+    if True:
+
+        client_number   = 50060
+        fy              = 2023
+
+        self = FundsInputBundle(client_number, fy)
+
+        print(self.timings)
@@ -13,11 +13,13 @@ import re
 
 import luna
 from luna.fsvi.funds.invmt_report_template_reader import FundsInvmtTemplateReader
+from luna.fsvi.funds.invmt_input_loader import FundsInputBundle
+from luna.common.workbk import WorkbookSession, to_write_only_sheet, supports_write_only_sheets
+from luna.common.cellwriter import StyledCellWriter
 import luna.common as common
 from luna.lunahub import tables
 import os
 
-import pyeasylib.excellib as excellib
 
 class InvmtOutputFormatter:
 
@@ -42,6 +44,10 @@ class InvmtOutputFormatter:
 
     CONFIDENCE_THRESHOLD = 0.45
 
+    # Data tabs with at least this number of rows are streamed to disk
+    # (openpyxl write-only sheets), instead of being kept in memory
+    STREAM_MIN_ROWS = 5000
+
     def __init__(self, sublead_class, portfolio_class, recon_class,
                  broker_class, custodian_class, tb_class, 
                  processedtransaction_class, processedportfolio_class,
@@ -76,23 +82,55 @@ class InvmtOutputFormatter:
     def main(self):
 
         self.get_data()
-        self.write_sublead_output()
-        self.write_recon_output()
-        self.write_portfolio_output()
-        self.write_processed_broker()
-        self.write_processed_custodian_confirmation()
-        #self.write_readme(readme_table)
+
+        # Open the template once; all the writers work on the same
+        # in-memory workbook, which is saved once at the end
+        self.wb_session = WorkbookSession(self.template_fp, self.output_fp)
+        templ_wb = self.wb_session.open()
+        self.cell_writer = StyledCellWriter(templ_wb)
+
+        # The views of the streamed tabs are written with their first row,
+        # so the sheet to show on open is set before any tab is written
+        self.make_sheet_active(templ_wb, "<5100-xx>Investment sub-lead")
+
+        with self.wb_session.step("Investment sub-lead"):
+            self.write_sublead_output(templ_wb)
+        with self.wb_session.step("Investment txn recon"):
+            self.write_recon_output(templ_wb)
+        with self.wb_session.step("Investment Portfolio"):
+            self.write_portfolio_output(templ_wb)
+        with self.wb_session.step("Broker invmt txn listing"):
+            self.write_processed_broker(templ_wb)
+        with self.wb_session.step("Custodian confirmation"):
+            self.write_processed_custodian_confirmation(templ_wb)
+        with self.wb_session.step("Finalise"):
+            self.finalise_output(templ_wb)
+        #with self.wb_session.step("README"):
+        #    self.write_readme(templ_wb, readme_table)
+
+        self.wb_session.save()
+
+        self.timings = self.wb_session.get_timings()
+        self.wb_session.log_timings()
 
 
     def get_data(self):
-        self.sublead_input_df = self.sublead_class.main()
-        self.portfolio_input_df = self.portfolio_class.main()
-        self.recon_input_df_detail = self.recon_class.main()
+        self.sublead_input_df = self._get_df_processed(self.sublead_class)
+        self.portfolio_input_df = self._get_df_processed(self.portfolio_class)
+        self.recon_input_df_detail = self._get_df_processed(self.recon_class)
         self.portfolio_mapper_df = pd.read_excel(self.mapper_fp)
-        self.broker_df = self.broker_class.main()
-        self.custodian_confirmation_df = self.custodian_class.main()
-        self.transaction_df = self.processedtransaction_class.main()
-        self.portfolio_df = self.processedportfolio_class.main()
+        self.broker_df = self._get_df_processed(self.broker_class)
+        self.custodian_confirmation_df = self._get_df_processed(self.custodian_class)
+        self.transaction_df = self._get_df_processed(self.processedtransaction_class)
+        self.portfolio_df = self._get_df_processed(self.processedportfolio_class)
+
+    def _get_df_processed(self, loader_class):
+        
+        # Reuse the data if it is already loaded (e.g. by FundsInputBundle)
+        if hasattr(loader_class, "df_processed"):
+            return loader_class.df_processed
+        
+        return loader_class.main()
             
     def build_varname_to_values(self, df):
         
@@ -116,13 +154,13 @@ class InvmtOutputFormatter:
 
         self.client_name = self.client_class.retrieve_client_info("CLIENTNAME")
     
-    def _standardise_number_format(self, ws, lst_of_excelcols, row):
-        for excelcol in lst_of_excelcols:
-            ws[f"{excelcol}{row}"].number_format = '#,##0.00'
+    def _standardise_number_format(self, ws, lst_of_excelcols, row, end_row = None):
+        end_row = row if end_row is None else end_row
+        self.cell_writer.apply_to_cols(ws, lst_of_excelcols, row, end_row, "luna_number")
 
-    def _standardise_date_format(self, ws, lst_of_excelcols, row):
-        for excelcol in lst_of_excelcols:
-            ws[f"{excelcol}{row}"].number_format = 'DD/MM/YYYY'
+    def _standardise_date_format(self, ws, lst_of_excelcols, row, end_row = None):
+        end_row = row if end_row is None else end_row
+        self.cell_writer.apply_to_cols(ws, lst_of_excelcols, row, end_row, "luna_date")
 
     def _create_header(self, ws, title, del_row_no, add_row_no):
 
@@ -141,13 +179,7 @@ class InvmtOutputFormatter:
 
         # header title
         ws[f"A{row}"].value = title
-        ws[f"A{row}"].font = Font(size = "16", bold = True)
-        ws[f"A{row}"].fill = PatternFill("solid", fgColor="00C0C0C0")
-        ws[f"A{row}"].border = Border(left   = Side(style = "thin"),
-                                 right  = Side(style = "thin"),
-                                 top    = Side(style = "thin"),
-                                 bottom = Side(style = "thin")
-                                 )
+        self.cell_writer.apply(ws[f"A{row}"], "luna_title")
         ws.merge_cells(f"A{row}:F{row}")
 
         date_of_analysis = datetime.now().strftime("%d/%m/%Y")
@@ -167,60 +199,61 @@ class InvmtOutputFormatter:
 
     def _create_header_row_field(self, field_title, field_value, row, ws):
 
-        border_style = Border(left   = Side(style = "thin"),
-                              right  = Side(style = "thin"),
-                              top    = Side(style = "thin"),
-                              bottom = Side(style = "thin")
-                              )
-    
         ws[f"A{row}"].value = field_title
-        ws[f"A{row}"].fill = PatternFill("solid", fgColor="00C0C0C0")
-        ws[f"A{row}"].font = Font(bold = True)
-        ws[f"A{row}"].border = border_style
+        self.cell_writer.apply(ws[f"A{row}"], "luna_field_title")
         ws.merge_cells(f"A{row}:C{row}")
 
         ws[f"D{row}"].value = field_value
-        ws[f"D{row}"].fill = PatternFill("solid", fgColor="00FFFFFF")
-        ws[f"D{row}"].alignment = Alignment(horizontal = 'left')
-        ws[f"D{row}"].border = border_style
+        self.cell_writer.apply(ws[f"D{row}"], "luna_field_value")
         ws.merge_cells(f"D{row}:F{row}")
 
     def _format_header_cell(self, col_lst, row, ws):
 
-        border_style = Border(left   = Side(style = "thin"),
-                              right  = Side(style = "thin"),
-                              top    = Side(style = "thin"),
-                              bottom = Side(style = "thin")
-                              )
-
-        for col in col_lst:
-            ws[f"{col}{row}"].fill = PatternFill("solid", fgColor="1F497D") # 20240424 changed to dark blue
-            ws[f"{col}{row}"].font = Font(bold = True, color = "00FFFFFF")
-            ws[f"{col}{row}"].border = border_style
+        # 20240424 changed to dark blue
+        self.cell_writer.apply_to_cols(ws, col_lst, row, row, "luna_header")
         
     def _standardise_cell_format(self, ws, excelcol, row):
-        font_style = Font(size = "10", name = "Arial")
-        alignment_style =  Alignment(horizontal = 'center')
-        ws[f"{excelcol}{row}"].font = font_style
-        ws[f"{excelcol}{row}"].alignment = alignment_style
+        # Arial 10, centered
+        self.cell_writer.apply(ws[f"{excelcol}{row}"], "luna_data")
     
     def _populate_portfolio_formula(self, ws, colname_to_excelcol, col, row, formula):
         ws[f"{colname_to_excelcol[col]}{row}"].value = formula
-        ws[f"{colname_to_excelcol[col]}{row}"].alignment = Alignment(horizontal = 'left')
         self._standardise_cell_format(ws, colname_to_excelcol[col], row)
 
-    def _adjust_col_width(self, ws):
-        for column in ws.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)  # Get column letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except:
-                    pass
-            adjusted_width = (max_length)  # Add some padding
-            ws.column_dimensions[column_letter].width = adjusted_width
+    def _adjust_col_width(self, ws, df, startcol = 1, colname_to_excelcol = None, **kwargs):
+        # From the df written to the sheet, not the cells of the sheet
+        self.cell_writer.autosize_columns(ws, df, startcol = startcol,
+                                          colname_to_excelcol = colname_to_excelcol,
+                                          **kwargs)
+
+    def _is_streamed(self, df):
+        return (len(df) >= self.STREAM_MIN_ROWS) and supports_write_only_sheets()
+
+    def _write_data_sheet(self, templ_wb, sheet_name, content_df, **kwargs):
+        '''
+        Writes a data tab with the report header. Large tabs are streamed
+        to disk, see STREAM_MIN_ROWS.
+
+        kwargs = passed to StyledCellWriter.write_df / stream_df
+        '''
+
+        templ_ws = templ_wb[sheet_name]
+
+        if self._is_streamed(content_df):
+
+            # Write-only sheets can only be appended to, so the header and
+            # the column widths go first, and the data after them
+            # (6 header rows + 1 empty row, same as below)
+            self._create_header(templ_ws, sheet_name, 0, 1)
+            self._adjust_col_width(templ_ws, content_df)
+            templ_ws = self.wb_session.get_write_only_sheet(sheet_name)
+            self.cell_writer.stream_df(templ_ws, content_df, startrow = 8, **kwargs)
+
+        else:
+
+            self.cell_writer.write_df(templ_ws, content_df, **kwargs)
+            self._adjust_col_width(templ_ws, content_df)
+            self._create_header(templ_ws, sheet_name, 0, 1)
 
     def _copy_column_style(self, ws,
                            src_excelcol, src_excelrow,
@@ -388,7 +421,7 @@ class InvmtOutputFormatter:
     #Created function to remove index column from df_processed and future use
     def filter_position_for_sublead_field(self, field):
         
-        filtered_port = processedportfolio_class.df_processed.copy()
+        filtered_port = self.portfolio_df.copy()
 
         if field in ["cost_at_end", "fv_valuation_report","unreal_port_cost"]:
             filtered_port['Include / Exclude'] = "Included"
@@ -413,7 +446,13 @@ class InvmtOutputFormatter:
         else:
             pass
 
-        field_to_data = {"<<<link>>>" : filtered_tb}
+        # For large data, only the column names are written here, and the
+        # rows are streamed below the header at the end
+        is_streamed = self._is_streamed(filtered_tb)
+        if is_streamed:
+            field_to_data = {"<<<link>>>" : filtered_tb.iloc[:0]}
+        else:
+            field_to_data = {"<<<link>>>" : filtered_tb}
 
         hyperlink_class = common.hyperlinks.DataHyperlink(source_sheetname, "A9", field_to_source_locations, reference_sheetname, header_rows, field_to_data, wb)
         hyperlink_class.write_reference_data()
@@ -423,13 +462,14 @@ class InvmtOutputFormatter:
 
         self._create_header(wb[reference_sheetname], title, 6, 1)
 
-        for c_idx, header_value in enumerate(filtered_tb.reset_index().columns, 1):
-            col = openpyxl.utils.cell.get_column_letter(c_idx)
-            self._format_header_cell([col], 10, ws)
+        header_cols = [openpyxl.utils.cell.get_column_letter(c_idx)
+                       for c_idx in range(1, filtered_tb.reset_index().shape[1] + 1)]
+        self._format_header_cell(header_cols, 10, ws)
 
-        for r_idx, row in enumerate(filtered_tb.reset_index().values, 11):
-            self._standardise_number_format(ws, ['F'], r_idx) #TODO: hardcoded excelcols and rows  
-            self._standardise_date_format(ws, ['E'], r_idx) #TODO: hardcoded excelcols and rows  
+        last_row = 10 + filtered_tb.shape[0]
+        if not is_streamed:
+            self._standardise_number_format(ws, ['F'], 11, last_row) #TODO: hardcoded excelcols and rows  
+            self._standardise_date_format(ws, ['E'], 11, last_row) #TODO: hardcoded excelcols and rows  
 
         field_to_source_locations = {"<<<Return to Sub-lead>>>": "A9"}
 
@@ -442,16 +482,30 @@ class InvmtOutputFormatter:
         hyperlink_class.write_reference_data()
         hyperlink_class.write_source_data()
 
+        data_df = filtered_tb.reset_index()
+        self._adjust_col_width(ws, data_df)
+
+        if is_streamed:
+            ws = to_write_only_sheet(wb, reference_sheetname)
+            column_styles = {data_df.columns[4]: "luna_date",   # E, as above
+                             data_df.columns[5]: "luna_number"} # F, as above
+            self.cell_writer.stream_df(ws, data_df, startrow = 11, header = False,
+                                       column_styles = column_styles)
+
         #self._insert_disclaimer(ws,"A", "8", "Data has been extracted and standardised to all formats, and may not be same as followed in source document. For detailed explaination, view README")
 
     def process_readme(self, ws_readme):
         ws_readme.merge_cells("A2:D3")
 
-    def write_sublead_output(self):
+        # The readme table starts at row 5 of the template
+        rows = list(ws_readme.iter_rows(min_row = 5, values_only = True))
+        readme_df = pd.DataFrame(rows[1:], columns = rows[0])
+        self._adjust_col_width(ws_readme, readme_df, max_width = 100)
+
+    def write_sublead_output(self, templ_wb):
 
         sheet_name = "<5100-xx>Investment sub-lead"
 
-        templ_wb = openpyxl.load_workbook(self.template_fp)
         templ_ws = templ_wb[sheet_name]
 
         self._load_client_info()
@@ -641,19 +695,21 @@ class InvmtOutputFormatter:
         templ_ws.merge_cells("B8:F10") # Auditor Guidance
         templ_ws.merge_cells("B71:F73") # Conclusion
 
+        # column widths from the template table and the values written
+        values_df = varname_to_values[["VALUE", "VALUEPREVFY"]].set_axis(
+            ["Current FY", "Previous FY"], axis = 1)
+        sublead_df = pd.concat([self.template_class.sublead_df_processed, values_df])
+        self._adjust_col_width(templ_ws, sublead_df,
+                               colname_to_excelcol = colname_to_excelcol)
+
         # modifying readme merge
         self.process_readme(templ_wb["Readme"])
 
-        templ_wb.save(self.output_fp)
-        templ_wb.close()
-
-    def write_recon_output(self):
+    def write_recon_output(self, templ_wb):
 
         summary_sheet_name = "Investment txn recon summary"
         detail_sheet_name = "Investment txn recon detail"
 
-        templ_wb = openpyxl.load_workbook(self.output_fp)
-
         # summary tab
         templ_ws = templ_wb[summary_sheet_name]
 
@@ -668,23 +724,13 @@ class InvmtOutputFormatter:
         
         content_df = self.recon_input_df_summary.copy()
 
-        for c_idx, header_value in enumerate(content_df.columns, 1):
-            templ_ws.cell(row=1, column=c_idx, value=header_value)
-            col = openpyxl.utils.cell.get_column_letter(c_idx)
-            self._format_header_cell([col], 1, templ_ws)
-
-        lst_of_number_cols = self._get_column_lst_letters_by_dtype(content_df, ["float64"])
-
-        for r_idx, row in enumerate(self.recon_input_df_summary.values, 2):
-            for c_idx, value in enumerate(row, 1):
-                templ_ws.cell(row=r_idx, column=c_idx, value=value)
-            self._standardise_number_format(templ_ws, lst_of_number_cols, r_idx) 
+        column_styles = self.cell_writer.get_column_styles(content_df, date_style = None)
+        self.cell_writer.write_df(templ_ws, content_df, column_styles = column_styles)
+        self._adjust_col_width(templ_ws, content_df)
             
         self._create_header(templ_ws, summary_sheet_name, 0, 1)
 
         # detail tab
-        templ_ws = templ_wb[detail_sheet_name]
-
         self.recon_input_df_detail["transaction_type_rsm_rank"] = self.recon_input_df_detail['TRANSACTIONTYPERSMBROKER'].apply(lambda x: 2 if x == "others" else 1)
         self.recon_input_df_detail["value_difference_abs"] = abs(self.recon_input_df_detail["VALUEDIFFERENCE"])
         self.recon_input_df_detail = self.recon_input_df_detail.sort_values(by = ['value_difference_abs', 'transaction_type_rsm_rank', 'MATCHINGINDICATORNAME', 'CONFIDENCELEVELNAME'],
@@ -721,89 +767,74 @@ class InvmtOutputFormatter:
                                 'PRICEDIFFERENCE', 'QUANTITYDIFFERENCE', 'VALUEDIFFERENCE', 'EXCEPTIONINDICATOR',
                                 'CONFIDENCELEVELNAME', 'MATCHINGINDICATORNAME']
         content_df = content_df[content_df_col_order]
-        lst_of_number_cols = self._get_column_lst_letters_by_dtype(content_df, ["float64"])
-        lst_of_date_cols = self._get_column_lst_letters_by_dtype(content_df, ["datetime64[ns]"] )
         lst_of_fundadmin_cols = self._get_column_lst_letters_by_substr(content_df, "FUNDADMIN")
         lst_of_broker_cols = self._get_column_lst_letters_by_substr(content_df, "BROKER")
         lst_of_difference_cols = self._get_column_lst_letters_by_substr(content_df, "DIFFERENCE")
 
-        # detail content writing
-        for c_idx, header_value in enumerate(content_df.columns, 1):
-            cell = templ_ws.cell(row=1, column=c_idx, value=header_value)
+        # header colour by source
+        header_styles = {}
+        for c_idx, colname in enumerate(content_df.columns, 1):
             col = openpyxl.utils.cell.get_column_letter(c_idx)
-            self._format_header_cell([col], 1, templ_ws)
             if col in lst_of_fundadmin_cols:
-                cell.fill = PatternFill("solid", fgColor = "C5D9F1")
-                cell.font = Font(bold = True,
-                                 color = "00000000")
+                header_styles[colname] = "luna_header_lightblue"
             elif col in lst_of_difference_cols:
-                cell.fill = PatternFill("solid", fgColor = "00C0C0C0")
-                cell.font = Font(bold = True,
-                                 color = "00000000")
+                header_styles[colname] = "luna_header_grey"
             elif col in lst_of_broker_cols:
-                pass
+                header_styles[colname] = "luna_header"
             else:
-                cell.fill = PatternFill("solid", fgColor = "00C0C0C0")
-                cell.font = Font(bold = True,
-                                 color = "00000000")
-            
+                header_styles[colname] = "luna_header_grey"
+
+        # number / date formats by the dtype of the data
+        column_styles = self.cell_writer.get_column_styles(content_df)
+
+        # # to colour whole column in a specific colour
+        # if excelcol in lst_of_fundadmin_cols:
+        #     cell.fill = PatternFill("solid", fgColor = "D9D9D9")
+        # elif excelcol in lst_of_broker_cols:
+        #     cell.fill = PatternFill("solid", fgColor = "F1F1F1")
+        # elif excelcol in lst_of_difference_cols:
+        #     fa_excelcol = self._get_col_letter_from_ref(excelcol, -2)
+        #     br_excelcol = self._get_col_letter_from_ref(excelcol, -1)
+        #     cell.value = f"= {fa_excelcol}{r_idx+7} - {br_excelcol}{r_idx+7}"
+        #     cell.fill = PatternFill("solid", fgColor = "C5D9F1")
+        # else:
+        #     pass
+
+        # difference columns as formulas of fund admin less broker
+        # (+7 for the header rows inserted below)
+        for excelcol in lst_of_difference_cols:
+            colname = content_df.columns[column_index_from_string(excelcol) - 1]
+            value_test = re.search("(.*?)DIFFERENCE", colname).group(1)
+            match value_test:
+
+                case "PRICE" | "QUANTITY":
+                    fa_colname = f"{value_test}FUNDADMIN"
+                    br_colname = f"{value_test}BROKER"
+
+                case "VALUE":
+                    fa_colname = f"MARKET{value_test}FUNDADMIN"
+                    br_colname = f"MARKET{value_test}BROKER"
+
+                case _:
+                    continue
+
+            fa_dist_from_diff_col = content_df_col_order.index(fa_colname) - content_df_col_order.index(colname)
+            fa_excelcol = self._get_col_letter_from_ref(excelcol, fa_dist_from_diff_col)
+            br_dist_from_diff_col = content_df_col_order.index(br_colname) - content_df_col_order.index(colname)
+            br_excelcol = self._get_col_letter_from_ref(excelcol, br_dist_from_diff_col)
+
+            content_df[colname] = [f"= {fa_excelcol}{r_idx+7} - {br_excelcol}{r_idx+7}"
+                                   for r_idx in range(2, len(content_df) + 2)]
 
-        for r_idx, row in enumerate(content_df.values, 2):
-            for c_idx, value in enumerate(row, 1):
-                # templ_ws.cell(row=r_idx, column=c_idx, value=value)
-                cell = templ_ws.cell(row=r_idx, column=c_idx, value=value)
-                excelcol = openpyxl.utils.cell.get_column_letter(c_idx)
-                # # to colour whole column in a specific colour
-                # if excelcol in lst_of_fundadmin_cols:
-                #     cell.fill = PatternFill("solid", fgColor = "D9D9D9")
-                # elif excelcol in lst_of_broker_cols:
-                #     cell.fill = PatternFill("solid", fgColor = "F1F1F1")
-                # elif excelcol in lst_of_difference_cols:
-                #     fa_excelcol = self._get_col_letter_from_ref(excelcol, -2)
-                #     br_excelcol = self._get_col_letter_from_ref(excelcol, -1)
-                #     cell.value = f"= {fa_excelcol}{r_idx+7} - {br_excelcol}{r_idx+7}"
-                #     cell.fill = PatternFill("solid", fgColor = "C5D9F1")
-                # else:
-                #     pass
-                if excelcol in lst_of_difference_cols:
-                    colname = templ_ws[f"{excelcol}1"].value
-                    value_test = re.search("(.*?)DIFFERENCE", colname).group(1)
-                    match value_test:
-
-                        case "PRICE" | "QUANTITY":
-                            fa_colname = f"{value_test}FUNDADMIN"
-                            br_colname = f"{value_test}BROKER"
-                            fa_dist_from_diff_col = content_df_col_order.index(fa_colname) - content_df_col_order.index(colname)
-                            fa_excelcol = self._get_col_letter_from_ref(excelcol, fa_dist_from_diff_col)
-                            br_dist_from_diff_col = content_df_col_order.index(br_colname) - content_df_col_order.index(colname)
-                            br_excelcol = self._get_col_letter_from_ref(excelcol, br_dist_from_diff_col)
-                            cell.value = f"= {fa_excelcol}{r_idx+7} - {br_excelcol}{r_idx+7}"
-
-                        case "VALUE":
-                            fa_colname = f"MARKET{value_test}FUNDADMIN"
-                            br_colname = f"MARKET{value_test}BROKER"
-                            fa_dist_from_diff_col = content_df_col_order.index(fa_colname) - content_df_col_order.index(colname)
-                            fa_excelcol = self._get_col_letter_from_ref(excelcol, fa_dist_from_diff_col)
-                            br_dist_from_diff_col = content_df_col_order.index(br_colname) - content_df_col_order.index(colname)
-                            br_excelcol = self._get_col_letter_from_ref(excelcol, br_dist_from_diff_col)
-                            cell.value = f"= {fa_excelcol}{r_idx+7} - {br_excelcol}{r_idx+7}"
-
-                        case _:
-
-                            pass
-                    
-            self._standardise_number_format(templ_ws, lst_of_number_cols, r_idx) 
-            self._standardise_date_format(templ_ws, lst_of_date_cols, r_idx)
-        self._create_header(templ_ws, detail_sheet_name, 0, 1)
-
-        templ_wb.save(self.output_fp)
-        templ_wb.close()
+        # detail content writing
+        self._write_data_sheet(templ_wb, detail_sheet_name, content_df,
+                               header_style = header_styles,
+                               column_styles = column_styles)
 
-    def write_portfolio_output(self):
+    def write_portfolio_output(self, templ_wb):
 
         sheet_name = "<5100-xx>Investment Portfolio"
 
-        templ_wb = openpyxl.load_workbook(self.output_fp)
         templ_ws = templ_wb[sheet_name]
 
         self._load_client_info()
@@ -850,16 +881,18 @@ class InvmtOutputFormatter:
                     row += 1
                 except:
                     pass
-                self._standardise_number_format(templ_ws,
-                                                ['J', 'K', 'N', 'P', 'Q', 'R',
-                                                 'S', 'T', 'V', 'W', 'X', 'AB',
-                                                 'AC', 'AD', 'AG', 'AH', 'AI',
-                                                 'AJ'], # TODO: hardcoded
-                                                row
-                                                )
-                self._standardise_date_format(templ_ws, ['H'], row)
-                # self._standardise_number_format(templ_ws, lst_of_number_cols, row)
-                # self._standardise_date_format(templ_ws, lst_of_date_cols, row) # TODO: format not showing
+
+        # Number and date formats, once for all the rows
+        self._standardise_number_format(templ_ws,
+                                        ['J', 'K', 'N', 'P', 'Q', 'R',
+                                         'S', 'T', 'V', 'W', 'X', 'AB',
+                                         'AC', 'AD', 'AG', 'AH', 'AI',
+                                         'AJ'], # TODO: hardcoded
+                                        17 + 5, 17 + 5 + len(transposed_df.columns)
+                                        )
+        self._standardise_date_format(templ_ws, ['H'], 17 + 5, 17 + 5 + len(transposed_df.columns))
+        # self._standardise_number_format(templ_ws, lst_of_number_cols, row)
+        # self._standardise_date_format(templ_ws, lst_of_date_cols, row) # TODO: format not showing
         
         # for r_idx, row in enumerate(content_df.values, 1):
         #     self._standardise_number_format(templ_ws, lst_of_number_cols, r_idx)
@@ -994,53 +1027,24 @@ class InvmtOutputFormatter:
             excelcol = colname_to_excelcol['Max difference']
             templ_ws[f"{excelcol}{38+6+input_length-25}"].value = f"=SUM({excelcol}{14+4}:{excelcol}{36+6+input_length-25})"
 
+        self._adjust_col_width(templ_ws, content_df,
+                               colname_to_excelcol = colname_to_excelcol)
 
-
-        # self._adjust_col_width(templ_ws)
-
-        templ_wb.save(self.output_fp)
-        templ_wb.close()
-
-    def write_processed_broker(self):
+    def write_processed_broker(self, templ_wb):
 
         sheet_name = "Broker invmt txn listing"
 
-        templ_wb = openpyxl.load_workbook(self.output_fp)
-        templ_ws = templ_wb[sheet_name]
-
         cols_to_drop = InvmtOutputFormatter.DATABASE_MISC_COLS.copy()
         content_df = self.broker_df.copy()
 
         content_df = content_df.drop(cols_to_drop, axis = 1)
 
-        for c_idx, header_value in enumerate(content_df.columns, 1):
-            templ_ws.cell(row=1, column=c_idx, value=header_value)
-            col = openpyxl.utils.cell.get_column_letter(c_idx)
-            self._format_header_cell([col], 1, templ_ws)
-
-        lst_of_number_cols = self._get_column_lst_letters_by_dtype(content_df, ["float64"])
-        lst_of_date_cols = self._get_column_lst_letters_by_dtype(content_df, ["datetime64[ns]"])
-
-        for r_idx, row in enumerate(content_df.values, 2):
-            for c_idx, value in enumerate(row, 1):
-                templ_ws.cell(row=r_idx, column=c_idx, value=value)
-            self._standardise_number_format(templ_ws, lst_of_number_cols, r_idx)
-            self._standardise_date_format(templ_ws, lst_of_date_cols, r_idx)
-        
-        self._create_header(templ_ws, sheet_name, 0, 1)
-
-        # self._adjust_col_width(templ_ws)
-
-        templ_wb.save(self.output_fp)
-        templ_wb.close()
+        self._write_data_sheet(templ_wb, sheet_name, content_df)
 
-    def write_processed_custodian_confirmation(self):
+    def write_processed_custodian_confirmation(self, templ_wb):
 
         sheet_name = "Custodian confirmation"
 
-        templ_wb = openpyxl.load_workbook(self.output_fp)
-        templ_ws = templ_wb[sheet_name]
-
         cols_to_drop = InvmtOutputFormatter.DATABASE_MISC_COLS.copy()
         cols_to_drop.append("COMPLETEDFY")
 
@@ -1048,46 +1052,21 @@ class InvmtOutputFormatter:
 
         content_df = content_df.drop(cols_to_drop, axis = 1)
 
-        lst_of_number_cols = self._get_column_lst_letters_by_dtype(content_df, ["float64"])
-
-        for c_idx, header_value in enumerate(content_df.columns, 1):
-            templ_ws.cell(row=1, column=c_idx, value=header_value)
-            col = openpyxl.utils.cell.get_column_letter(c_idx)
-            self._format_header_cell([col], 1, templ_ws)
-
-        for r_idx, row in enumerate(content_df.values, 2):
-            for c_idx, value in enumerate(row, 1):
-                templ_ws.cell(row=r_idx, column=c_idx, value=value)
-            self._standardise_number_format(templ_ws, lst_of_number_cols, r_idx)
-                
-        self._create_header(templ_ws, sheet_name, 0, 1)
-
-        # self._adjust_col_width(templ_ws)
-
-        templ_wb.save(self.output_fp)
-        templ_wb.close()
+        # numbers only
+        column_styles = self.cell_writer.get_column_styles(content_df, date_style = None)
+        self._write_data_sheet(templ_wb, sheet_name, content_df, column_styles = column_styles)
 
-        col_adjust = excellib.width_methods.ColumnsWidthAdjuster(self.output_fp)
-        col_adjust.main(sheetnames = True)
+    def finalise_output(self, templ_wb):
 
-        templ_wb = openpyxl.load_workbook(self.output_fp)
         templ_ws = templ_wb["<5100-xx>Investment sub-lead"]
         templ_ws.column_dimensions["A"].hidden = True
         templ_ws = templ_wb["<5100-xx>Investment Portfolio"]
         templ_ws.column_dimensions["M"].hidden = True
 
-        # Making sublead sheet default on open
-        self.make_sheet_active(templ_wb,"<5100-xx>Investment sub-lead")
-        
-        templ_wb.save(self.output_fp)
-        templ_wb.close()
-
 
-"""     def write_readme(self, readme_table):
+"""     def write_readme(self, templ_wb, readme_table):
 
         sheet_name = "README"
-        #creating temp wbws
-        templ_wb = openpyxl.load_workbook(self.output_fp)
         templ_ws = templ_wb[sheet_name]
 
         #creating content less db specific content 
@@ -1110,12 +1089,6 @@ class InvmtOutputFormatter:
         self._create_header(templ_ws, sheet_name, 0, 1)
 
         # self._adjust_col_width(templ_ws)
-
-        templ_wb.save(self.output_fp)
-        templ_wb.close()
-
-        col_adjust = excellib.width_methods.ColumnsWidthAdjuster(self.output_fp)
-        col_adjust.main(sheetnames = True)
    
  """
 if __name__ == "__main__":
@@ -1127,46 +1100,23 @@ if __name__ == "__main__":
     output_fp = r"D:\andsoncaimc\Desktop\Task6-App2Exceloutput\luna\personal_workspace\db\funds_test.xlsx"
     portfolio_mapper_fp = r"D:\andsoncaimc\Desktop\Task6-App2Exceloutput\luna\parameters\invmt_portfolio_mapper.xlsx"
 
-    client_class    = tables.client.ClientInfoLoader_From_LunaHub(client_no)
-    sublead_class   = tables.fs_funds_invmt_output_sublead.FundsSublead_DownloaderFromLunaHub(client_no, fy)
-    portfolio_class = tables.fs_funds_invmt_output_portfolio.FundsPortfolio_DownloaderFromLunaHub(client_no, fy)
-    recon_class     = tables.fs_funds_invmt_txn_recon_details.FundsInvmtTxnReconDetail_DownloaderFromLunaHub(client_no, fy)
-    broker_class    = tables.fs_funds_broker_statement.FundsBrokerStatement_DownloaderFromLunaHub(client_no, fy)
-    custodian_class = tables.fs_funds_custodian_confirmation.FundsCustodianConfirmation_DownloaderFromLunaHub(client_no, fy)
-    processedtransaction_class = tables.fs_funds_fundadmin_txn.FundsFundAdminTxn_DownloaderFromLunaHub(client_no, fy)
-    processedportfolio_class = tables.fs_funds_fundadmin_portfolio.FundsFundAdminPortfolio_DownloaderFromLunaHub(client_no, fy)
-    tb_class        = common.TBLoader_From_LunaHub(client_no, fy)
-
     aic_name = "DS Team"
 
-    for attempt in range(12):
-        user_response_class = tables.fs_funds_userresponse.FundsUserResponse_DownloaderFromLunaHub(
-            client_no,
-            fy)
-        user_inputs = user_response_class.main()
-        if user_inputs is not None:
-            break
-        elif user_inputs is None and attempt == 11:
-            raise Exception (f"Data not found for specified client {client_no} or FY {fy}.")
-        else:
-            continue
-
-
-    self = InvmtOutputFormatter(sublead_class       = sublead_class,
-                                 portfolio_class    = portfolio_class,
-                                 recon_class        = recon_class,
-                                 broker_class       = broker_class,
-                                 custodian_class    = custodian_class,
-                                 processedtransaction_class = processedtransaction_class,
-                                 processedportfolio_class = processedportfolio_class,
-                                 tb_class           = tb_class,
-                                 output_fp          = output_fp,
-                                 mapper_fp          = portfolio_mapper_fp,
-                                 user_inputs        = user_inputs,
-                                 client_class       = client_class,
-                                 fy                 = fy,
-                                 aic_name           = aic_name
-                                 )
+    # Close the lunahub connections of all the threads at the end
+    with luna.lunahub.LUNAHUB_POOL:
+
+        # Load all the inputs from lunahub concurrently
+        input_bundle    = FundsInputBundle(client_no, fy)
+        print(input_bundle.timings)
+
+        self = InvmtOutputFormatter(**input_bundle.classes,
+                                     output_fp          = output_fp,
+                                     mapper_fp          = portfolio_mapper_fp,
+                                     user_inputs        = input_bundle.user_inputs,
+                                     fy                 = fy,
+                                     aic_name           = aic_name
+                                     )
+        print(self.timings)
 
 
     if False:
@@ -1,6 +1,13 @@
-from luna.fsvi.mas.template_reader import MASTemplateReader_Form1, MASTemplateReader_Form3
-from luna.fsvi.mas.form1 import MASForm1_Generator
-from luna.fsvi.mas.form2 import MASForm2_Generator, MASForm2_Generator_Part2
-from luna.fsvi.mas.form3 import MASForm3_Generator, MASForm3_Generator_Part2
+# The classes are only imported on first use, see common/lazyimport.py
+from luna.common.lazyimport import get_lazy_loaders
 
-del template_reader
+__getattr__, __dir__ = get_lazy_loaders(__name__, {
+    "MASTemplateReader_Form1"   : "luna.fsvi.mas.template_reader",
+    "MASTemplateReader_Form3"   : "luna.fsvi.mas.template_reader",
+    "MASForm1_Generator"        : "luna.fsvi.mas.form1",
+    "MASForm2_Generator"        : "luna.fsvi.mas.form2",
+    "MASForm2_Generator_Part2"  : "luna.fsvi.mas.form2",
+    "MASForm3_Generator"        : "luna.fsvi.mas.form3",
+    "MASForm3_Generator_Part2"  : "luna.fsvi.mas.form3",
+    "process_ocr_outputs"       : "luna.fsvi.mas.ocr_processing",
+    })
@@ -1,3 +1,8 @@
-from .form1 import MASForm1_Generator
-from .mas_f1_output_formatter import OutputFormatter
-from .mas_f1_ocr_output_formatter import OCROutputProcessor
\ No newline at end of file
+# The classes are only imported on first use, see common/lazyimport.py
+from luna.common.lazyimport import get_lazy_loaders
+
+__getattr__, __dir__ = get_lazy_loaders(__name__, {
+    "MASForm1_Generator"    : "luna.fsvi.mas.form1.form1",
+    "OutputFormatter"       : "luna.fsvi.mas.form1.mas_f1_output_formatter",
+    "OCROutputProcessor"    : "luna.fsvi.mas.form1.mas_f1_ocr_output_formatter",
+    })
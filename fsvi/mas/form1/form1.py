@@ -8,7 +8,6 @@ import datetime
 import pandas as pd
 import numpy as np
 import re
-from fuzzywuzzy import fuzz, process
 import sys
 
 
@@ -18,6 +17,7 @@ import luna
 import luna.common as common
 import luna.fsvi as fsvi
 import luna.lunahub as lunahub
+import luna.fsvi.mas.subtotals as subtotals
 
 class MASForm1_Generator:
 
@@ -157,17 +157,13 @@ class MASForm1_Generator:
         tb_df = tb_class.get_data_by_fy(self.fy).copy()
         tb_columns = tb_df.columns
         
-        # screen thru
-        for varname in varname_to_lscodes.index:
-            #varname = "puc_pref_share_noncumulative"
-            lscode_intervals = varname_to_lscodes.at[varname]
-            
-            # Get the true and false matches
-            is_overlap, tb_df_true, tb_df_false = tb_class.filter_tb_by_fy_and_ls_codes(
-                self.fy, lscode_intervals)
-            
-            # Update the main table
-            tb_df[varname] = is_overlap
+        # Map all the varnames to the tb in one pass.
+        # Formulas cannot be converted to intervals and are left out.
+        membership, varname_to_total = tb_class.filter_tb_by_fy_and_varnames(
+            self.fy, mapper_class.varname_to_lscodes, errors = 'ignore')
+        
+        # Update the main table
+        tb_df = pd.concat([tb_df, membership[varname_to_lscodes.index]], axis = 1)
         
         varname_to_lscodes = pd.concat([varname_to_lscodes, varname_to_lscodes_formula], axis = 0)
 
@@ -175,6 +171,7 @@ class MASForm1_Generator:
         self.tb_columns_main = tb_columns
         self.tb_with_varname = tb_df.copy()
         self.tb_main = tb_df[tb_columns]
+        self.varname_to_total = varname_to_total
 
     def filter_tb_by_varname(self, varname):
         
@@ -186,22 +183,16 @@ class MASForm1_Generator:
 
     def _get_total_by_varname(self, varname):
         
-        # Get interval list from varname (template) 
-        interval_list = self.mapper_class.get_ls_codes_by_varname(varname)
-
-        try: # NOTE: Added by SJ on 20240111
-
-            # Get the TB accounts that overlap in the interval list
-            boolean, true_match, false_match = \
-                self.tb_class.filter_tb_by_fy_and_ls_codes(self.fy, interval_list)
-            
-            # Return the total
-            total = true_match["Value"].sum()
-        
-        except:
+        # Totals are computed for all varnames in _map_varname_to_lscodes.
+        # Those that are missing could not be converted to intervals.
+        if varname not in self.varname_to_total.index:
 
             print(f"Could not convert to interval for {varname}.")
             total = 0
+
+        else:
+
+            total = self.varname_to_total.at[varname]
         
         return total
 
@@ -387,6 +378,21 @@ class MASForm1_Generator:
         self.outputdf.loc[others_row, "Balance"] -= rpt_asset
 
 
+    def _get_fuzzy_matcher(self, choices):
+        '''
+        Returns the FuzzyNameMatcher for the choices. Kept on self by 
+        choices, so that the names already matched are not scored again.
+        '''
+        
+        if not hasattr(self, '_fuzzy_matchers'):
+            self._fuzzy_matchers = {}
+        
+        key = tuple(choices)
+        if key not in self._fuzzy_matchers:
+            self._fuzzy_matchers[key] = common.FuzzyNameMatcher(choices)
+        
+        return self._fuzzy_matchers[key]
+    
     def _calculate_field_trade_debtors_fundmgmt(self, fuzzy_match_threshold):
         """
         fuzzy_match_threshold -> int to set threshold for fuzzy matching of client/supplier names to the list provided by auditor
@@ -411,10 +417,12 @@ class MASForm1_Generator:
     
             fundmgmt_list = [i.strip() for i in answer.split(",")]
     
-            ar.loc[:,"Match_score"] = ar["Name"].apply(lambda x: process.extractOne(x, fundmgmt_list, scorer=fuzz.token_sort_ratio))
+            # Score all the names against the list in one batch
+            matcher = self._get_fuzzy_matcher(fundmgmt_list)
+            ar.loc[:,"Match_score"] = matcher.get_best_matches(ar["Name"])["Score"]
     
             # Indicate if there is a match, match if 'Match_score' score is above fuzzy_match_threshold provided
-            ar.loc[:,"Matched?"] = ar["Match_score"].apply(lambda x: x[1]) >= fuzzy_match_threshold
+            ar.loc[:,"Matched?"] = ar["Match_score"] >= fuzzy_match_threshold
     
             # Filter for matches and obtain the sum of Total Due
             fundmgmt_df = ar.query("`Matched?`==True")
@@ -595,31 +603,10 @@ class MASForm1_Generator:
 
     def column_mapper(self):
 
-        # Map the Balance amounts to the correct field in F1; whether in the Amount or Subtotal column
-        for i in self.outputdf.index:
-            if pd.notna(self.outputdf.at[i,"Amount"]) and pd.notna(self.outputdf.at[i+1,"Amount"]):
-                if pd.isna(self.outputdf.at[i,"Balance"]):
-                    subtotal = subtotal
-                else:
-                    subtotal += self.outputdf.at[i,"Balance"]
-            elif pd.notna(self.outputdf.at[i,"Amount"]) and pd.isna(self.outputdf.at[i+1,
-                    "Amount"]):
-                if pd.isna(self.outputdf.at[i,"Balance"]) and subtotal != 0:
-                    self.outputdf.at[i,"Subtotal"] = subtotal
-                    subtotal = 0
-                elif pd.notna(self.outputdf.at[i,"Balance"]):
-                    subtotal += self.outputdf.at[i,"Balance"]
-                    self.outputdf.at[i,"Subtotal"] = subtotal
-                    subtotal = 0
-            else: 
-                subtotal = 0
-
-        for i in self.outputdf.index:
-            if pd.notna(self.outputdf.at[i, "Amount"]):
-                self.outputdf.at[i, "Amount"] = self.outputdf.at[i, "Balance"]
-            elif pd.isna(self.outputdf.at[i, "Amount"]) and pd.notna(self.outputdf.at[i,
-                    "Subtotal"]):
-                self.outputdf.at[i, "Subtotal"] = self.outputdf.at[i, "Balance"]
+        # Map the Balance amounts to the correct field; whether in the Amount or Subtotal column
+        # and append the subtotal of each Amount block in the Subtotal column
+        self.outputdf = subtotals.map_balance_to_columns(
+            self.outputdf, fill_empty_subtotal = False)
 
     def get_row_totals(self):
         
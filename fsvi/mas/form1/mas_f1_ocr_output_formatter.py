@@ -10,6 +10,7 @@ if not(logger.hasHandlers()):
 
 # Import luna package
 import luna
+from luna.fsvi.mas.ocr_processing import read_parameter_sheet
 
 
 class OCROutputProcessor:
@@ -42,6 +43,10 @@ class FormProcessor:
 
     def process(self):
         
+        # Each stage is computed once, and reused by the later stages
+        if hasattr(self, 'variables'):
+            return self.variables
+
         self.remove_irrelevant_rows()
         self.extract_parenthesis_number()
         self.extract_amount()
@@ -131,7 +136,7 @@ class FormProcessor:
         if self.expected_number_of_vars != no_of_amt:
             raise Exception("Number of variables does not match expected number of variables")
         
-        var_map = pd.read_excel(self.var_map_filepath, sheet_name="form1")
+        var_map = read_parameter_sheet(self.var_map_filepath, "form1")
         
         list_of_amt = [val for val in df[['Amt1', 'Amt2']].values.flatten().tolist() if not math.isnan(val)]
         
@@ -1,6 +1,9 @@
-from .form2_part1 import MASForm2_Generator
-from .form2_part2 import MASForm2_Generator_Part2
-from .mas_f2_output_formatter import OutputFormatter
-from .mas_f2_ocr_output_formatter import OCROutputProcessor
+# The classes are only imported on first use, see common/lazyimport.py
+from luna.common.lazyimport import get_lazy_loaders
 
-del (form2_part1, form2_part2)
\ No newline at end of file
+__getattr__, __dir__ = get_lazy_loaders(__name__, {
+    "MASForm2_Generator"        : "luna.fsvi.mas.form2.form2_part1",
+    "MASForm2_Generator_Part2"  : "luna.fsvi.mas.form2.form2_part2",
+    "OutputFormatter"           : "luna.fsvi.mas.form2.mas_f2_output_formatter",
+    "OCROutputProcessor"        : "luna.fsvi.mas.form2.mas_f2_ocr_output_formatter",
+    })
@@ -4,7 +4,6 @@ import datetime
 import pandas as pd
 import numpy as np
 import re
-from fuzzywuzzy import fuzz, process
 import sys
 import logging
 
@@ -20,6 +20,7 @@ import luna
 import luna.common as common
 import luna.fsvi as fsvi
 import luna.lunahub as lunahub
+import luna.fsvi.mas.subtotals as subtotals
 
 from luna.common.gl import GLProcessor
 import calendar
@@ -640,73 +641,46 @@ class MASForm2_Generator_Part2:
                     required_varname_list.append(x)
     
         
-        # Filter for relevant var_name
+        # Filter for relevant var_name, NaN amounts as 0
         data = f3_melt_filtered[f3_melt_filtered['var_name'].isin(required_varname_list)]
-        # Replace NaN values in the 'Amount' column with 0
-        data['Amount'].fillna(0.00, inplace=True)
+        data = data.fillna({"Amount": 0.00})
         # Filter away NaN in 'var_name' column
         awp_template = awp_template[awp_template['var_name'].apply(lambda x: x != ['nan'])]
+        awp_template = awp_template.reset_index(drop=True)
 
+        # Explode the var_name lists to one row per (template row, var_name)
+        # and join to the F3 data, so each year is a single grouped sum
+        template_long = awp_template["var_name"].explode().rename_axis("template_index").reset_index()
+        template_long = template_long.drop_duplicates()
+        template_long = template_long.merge(data[["var_name", "FY", "Amount"]], on="var_name", how="inner")
+
+        year_columns = [str(self.fy-year_index) for year_index in [1, 2, 3]]
+        amounts = template_long.groupby(["template_index", "FY"])["Amount"].sum().unstack("FY")
+        amounts = amounts.reindex(index=awp_template.index, columns=[self.fy-1, self.fy-2, self.fy-3])
+        amounts = amounts.fillna(0.00).astype(float)
+        amounts.columns = year_columns
+
+        # Map to awp_template
+        for col in year_columns:
+            awp_template[col] = amounts[col]
 
-        '''
-        Create a dataframe for each of the 3 years (e.g. 2021,2020,2019).
-        filtered_data frame is a list of dataframes. index 0 is empty. index 1 is fy-1, index 2 is fy-2 and so on
-        '''
-        column_names = data.columns.tolist()
-        filtered_data = ["",pd.DataFrame(columns=column_names),pd.DataFrame(columns=column_names),pd.DataFrame(columns=column_names)]
-
-        for index, row in data.iterrows():
-            if row['FY'] == self.fy-1:
-                filtered_data[1].loc[0] = row
-                filtered_data[1].index = filtered_data[1].index - 1
-            elif row['FY'] == self.fy-2:
-                filtered_data[2].loc[0] = row
-                filtered_data[2].index = filtered_data[2].index - 1
-            elif row['FY'] == self.fy-3:
-                filtered_data[3].loc[-1] = row
-                filtered_data[3].index = filtered_data[3].index - 1
-        
-        for i in range(len(filtered_data)):
-            if(i==0):
-                continue
-            filtered_data[i] = filtered_data[i].sort_index()
-
-
-
-        for year_index in range(len(filtered_data)):
-            if year_index ==0 :
-                continue
-            # Map to awp_template (maybe helper function for each self.fy)
-            awp_template.loc[:,str(self.fy-year_index)] = 0.00
-            for i, row_awp in awp_template.iterrows():
-                varname = row_awp["var_name"]
-                for index, row in filtered_data[year_index].iterrows():
-                    name = row["var_name"]
-                    amt = row["Amount"]
-                    if name in varname:
-                        awp_template.at[i,str(self.fy-year_index)] += amt
-        
-        
         # Create Adjusted annual gross income
-        awp_template = awp_template.reset_index(drop=True)
+        # = total revenue less all the other items
+        is_total_revenue = awp_template["Annual gross income ="] == "- total revenue as per reported in respective year's Form 3 ** (previously Form 6)"
+        if is_total_revenue.sum() > 1:
+            raise Exception (
+                f"Expected one total revenue row in the AWP template, "
+                f"found {is_total_revenue.sum()}:\n\n"
+                f"{awp_template.loc[is_total_revenue].__repr__()}")
+        elif is_total_revenue.any():
+            rev_total_revenue_amt = awp_template.loc[is_total_revenue, year_columns].iloc[0]
+        else:
+            rev_total_revenue_amt = 0.00
+        less_amt = awp_template.loc[~is_total_revenue, year_columns].sum()
+
         index_aagi = len(awp_template["var_name"])
         awp_template.at[index_aagi,"Annual gross income ="] = "Adjusted Annual gross income"
-
-        for year_index in range(len(filtered_data)):
-            if(year_index==0):
-                continue    
-            rev_total_revenue_amt = 0
-            less_amt = 0
-            for i, row_awp in awp_template.iterrows():
-                if(i==index_aagi):
-                    continue
-                row_name = row_awp["Annual gross income ="] 
-                if(row_name == "- total revenue as per reported in respective year's Form 3 ** (previously Form 6)"):
-                    rev_total_revenue_amt = awp_template.loc[i, str(self.fy-year_index)]
-                else:
-                    less_amt += awp_template.loc[i, str(self.fy-year_index)]
-            adjusted_annual_gross_income = rev_total_revenue_amt - less_amt
-            awp_template.loc[index_aagi, str(self.fy-year_index)] = adjusted_annual_gross_income
+        awp_template.loc[index_aagi, year_columns] = rev_total_revenue_amt - less_amt
         
         self.awp = awp_template
 
@@ -1028,34 +1002,10 @@ class MASForm2_Generator_Part2:
 
     def column_mapper(self):
 
-        # Map the Balance amounts to the correct field in F1; whether in the Amount or Subtotal column
-        for i in self.outputdf.index:
-            if pd.notna(self.outputdf.at[i,"Amount"]) and pd.notna(self.outputdf.at[i+1,"Amount"]): #if the 2 rows in Amount column is not empty and row 1's Balance is not empty then compute subtotal
-                if pd.isna(self.outputdf.at[i,"Balance"]):
-                    subtotal = subtotal
-                else:
-                    subtotal += self.outputdf.at[i,"Balance"]
-            elif pd.notna(self.outputdf.at[i,"Amount"]) and pd.isna(self.outputdf.at[i+1, #if the next row in Amount column is empty
-                    "Amount"]):
-                if pd.isna(self.outputdf.at[i,"Balance"]) and subtotal != 0: #if the Balance for a row is empty but the subtotal is not 0
-                    self.outputdf.at[i,"Subtotal"] = subtotal
-                    subtotal = 0
-                elif pd.notna(self.outputdf.at[i,"Balance"]):      #if the Balance for a row is not empty 
-                    subtotal += self.outputdf.at[i,"Balance"]
-                    self.outputdf.at[i,"Subtotal"] = subtotal
-                    subtotal = 0
-            else: 
-                subtotal = 0
-
-        for i in self.outputdf.index:
-            if pd.notna(self.outputdf.at[i, "Amount"]):                # if Amount column is not empty
-                self.outputdf.at[i, "Amount"] = self.outputdf.at[i, "Balance"]
-            elif pd.isna(self.outputdf.at[i, "Amount"]) and pd.notna(self.outputdf.at[i, # if Amount is empty and Subtotal not empty
-                    "Subtotal"]):
-                self.outputdf.at[i, "Subtotal"] = self.outputdf.at[i, "Balance"]
-            elif pd.isna(self.outputdf.at[i, "Amount"]) and pd.isna(self.outputdf.at[i, # if Amount is empty and Subtotal not empty
-                    "Subtotal"]):
-                self.outputdf.at[i, "Subtotal"] = self.outputdf.at[i, "Balance"]  # if both Amount and Subtotal is empty 
+        # Map the Balance amounts to the correct field; whether in the Amount or Subtotal column
+        # and append the subtotal of each Amount block in the Subtotal column
+        self.outputdf = subtotals.map_balance_to_columns(
+            self.outputdf, fill_empty_subtotal = True)
 
 
 
@@ -12,6 +12,7 @@ import re
 
 import luna
 from luna.fsvi.mas.template_reader import MASTemplateReader_Form1
+from luna.common.cellwriter import StyledCellWriter
 from luna.lunahub import tables
 import os
 
@@ -93,8 +94,8 @@ class OutputFormatter:
         for src, dst in zip(ws[f"{src_excelcol}:{src_excelcol}"], ws[f"{dst_excelcol}:{dst_excelcol}"]):
             if src.value == src_col_name:
                 dst.value = src_col_name
-                dst.font = Font(bold = True)
-                src.font = Font(bold = True)
+                self.cell_writer.apply(dst, "luna_bold")
+                self.cell_writer.apply(src, "luna_bold")
             elif src.value is not None and dst_value is None:
                 dst.value = src.value
                 dst.border = copy(src.border)
@@ -132,13 +133,7 @@ class OutputFormatter:
 
         # header title
         ws[f"A{row}"].value = "Form 2 - Statement of financial resources, total risk requirement and aggregate indebtedness"
-        ws[f"A{row}"].font = Font(size = "16", bold = True)
-        ws[f"A{row}"].fill = PatternFill("solid", fgColor="00C0C0C0")
-        ws[f"A{row}"].border = Border(left   = Side(style = "thin"),
-                                 right  = Side(style = "thin"),
-                                 top    = Side(style = "thin"),
-                                 bottom = Side(style = "thin")
-                                 )
+        self.cell_writer.apply(ws[f"A{row}"], "luna_title")
         ws.merge_cells(f"A{row}:F{row}")
 
         date_of_analysis = datetime.now().strftime("%d/%m/%Y")
@@ -158,27 +153,16 @@ class OutputFormatter:
 
     def _create_header_row_field(self, field_title, field_value, row, ws):
 
-        border_style = Border(left   = Side(style = "thin"),
-                              right  = Side(style = "thin"),
-                              top    = Side(style = "thin"),
-                              bottom = Side(style = "thin")
-                              )
-    
         ws[f"A{row}"].value = field_title
-        ws[f"A{row}"].fill = PatternFill("solid", fgColor="00C0C0C0")
-        ws[f"A{row}"].font = Font(bold = True)
-        ws[f"A{row}"].border = border_style
+        self.cell_writer.apply(ws[f"A{row}"], "luna_field_title")
         ws.merge_cells(f"A{row}:C{row}")
 
         ws[f"D{row}"].value = field_value
-        ws[f"D{row}"].fill = PatternFill("solid", fgColor="00FFFFFF")
-        ws[f"D{row}"].alignment = Alignment(horizontal = 'left')
-        ws[f"D{row}"].border = border_style
+        self.cell_writer.apply(ws[f"D{row}"], "luna_field_value")
         ws.merge_cells(f"D{row}:F{row}")
 
     def _standardise_number_format(self, ws, lst_of_excelcols, row):
-        for excelcol in lst_of_excelcols:
-            ws[f"{excelcol}{row}"].number_format = '#,##0.00'
+        self.cell_writer.apply_to_cols(ws, lst_of_excelcols, row, row, "luna_number")
 
     def _replace_ls_null_value(self, ws, excelcol, row):
         cell = ws[f"{excelcol}{row}"]
@@ -219,27 +203,22 @@ class OutputFormatter:
         return target_excelcol
     
     def _section_column_formatting(self, ws, section_name, starting_excelcol):
-        section_color_dict = {'recalculated': '00CCFFFF',
-                              'ocr'         : '00CCCCFF',
-                              'var'         : '00CCFFCC'
-                              }
-        fill_setting = PatternFill("solid", fgColor = section_color_dict.get(section_name))
+        # recalculated / ocr / var
+        style_name = f"luna_fill_{section_name}"
         ending_excelcol = self._get_col_letter_from_ref(starting_excelcol, 1)
-        cols = ws[f"{starting_excelcol}6:{ending_excelcol}132"] #TODO: look into how to dynamically reference rows
-        for cell in cols:
-            cell[0].fill = fill_setting
-            cell[1].fill = fill_setting
+        cell_range = f"{starting_excelcol}6:{ending_excelcol}132" #TODO: look into how to dynamically reference rows
+        self.cell_writer.apply_to_range(ws, cell_range, style_name)
 
     def _create_col_header_1(self, ws, excelcol, row, header_name):
             cell = ws[f"{excelcol}{row}"]
             cell.value = header_name
-            cell.font = Font(bold = True)
-            cell.alignment = Alignment(horizontal = 'center')
+            self.cell_writer.apply(cell, "luna_bold_center")
             end_col = self._get_col_letter_from_ref(excelcol, 1)
             ws.merge_cells(f"{excelcol}{row}:{end_col}{row}")
             
     def write_output(self):
         templ_wb = openpyxl.load_workbook(self.template_fp)
+        self.cell_writer = StyledCellWriter(templ_wb)
         templ_ws = templ_wb[self.template_sheetname]
 
         self._load_client_info()
@@ -363,9 +342,9 @@ class OutputFormatter:
             templ_ws[f"{target_ocr_subtotal_excelcol}{row}"].value = subtotal_ocr
 
         templ_ws[f"{target_var_amt_excelcol}7"].value = "Amount"
-        templ_ws[f"{target_var_amt_excelcol}7"].font = Font(bold = True)
+        self.cell_writer.apply(templ_ws[f"{target_var_amt_excelcol}7"], "luna_bold")
         templ_ws[f"{target_var_subtotal_excelcol}7"].value = "Subtotal"
-        templ_ws[f"{target_var_subtotal_excelcol}7"].font = Font(bold = True)
+        self.cell_writer.apply(templ_ws[f"{target_var_subtotal_excelcol}7"], "luna_bold")
 
         self._copy_column_style(templ_ws, amt_excelcol, target_var_amt_excelcol)
         self._copy_column_style(templ_ws, subtotal_excelcol, target_var_subtotal_excelcol)
@@ -1,6 +1,9 @@
-from .form3_part1 import MASForm3_Generator
-from .form3_part2 import MASForm3_Generator_Part2
-from .mas_f3_output_formatter import OutputFormatter
-from .mas_f3_ocr_output_formatter import OCROutputProcessor
+# The classes are only imported on first use, see common/lazyimport.py
+from luna.common.lazyimport import get_lazy_loaders
 
-del (form3_part1, form3_part2)
\ No newline at end of file
+__getattr__, __dir__ = get_lazy_loaders(__name__, {
+    "MASForm3_Generator"        : "luna.fsvi.mas.form3.form3_part1",
+    "MASForm3_Generator_Part2"  : "luna.fsvi.mas.form3.form3_part2",
+    "OutputFormatter"           : "luna.fsvi.mas.form3.mas_f3_output_formatter",
+    "OCROutputProcessor"        : "luna.fsvi.mas.form3.mas_f3_ocr_output_formatter",
+    })
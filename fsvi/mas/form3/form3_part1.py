@@ -153,22 +153,18 @@ class MASForm3_Generator:
         tb_df = tb_class.get_data_by_fy(self.fy).copy()
         tb_columns = tb_df.columns
         
-        # screen thru
-        for varname in varname_to_lscodes.index:
-            #varname = "puc_pref_share_noncumulative"
-            lscode_intervals = varname_to_lscodes.at[varname]
+        # Map all the varnames to the tb in one pass
+        membership, varname_to_total = tb_class.filter_tb_by_fy_and_varnames(
+            self.fy, varname_to_lscodes)
             
-            # Get the true and false matches
-            is_overlap, tb_df_true, tb_df_false = tb_class.filter_tb_by_fy_and_ls_codes(
-                self.fy, lscode_intervals)
-            
-            # Update the main table
-            tb_df[varname] = is_overlap
+        # Update the main table
+        tb_df = pd.concat([tb_df, membership], axis = 1)
         varname_to_lscodes = pd.concat([varname_to_lscodes, varname_to_lscodes_formula], axis = 0)
 
         #
         self.tb_columns_main = tb_columns
         self.tb_with_varname = tb_df.copy()
+        self.varname_to_total = varname_to_total
 
     def filter_tb_by_varname(self, varname):
         
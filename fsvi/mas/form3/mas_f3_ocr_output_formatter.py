@@ -4,6 +4,8 @@ import math
 import re
 import os
 
+from luna.fsvi.mas.ocr_processing import read_parameter_sheet
+
 class OCROutputProcessor:
     def __init__(self, filepath, sheet_name, form, luna_fp):
         self.filepath = filepath
@@ -49,6 +51,10 @@ class FormProcessor:
 
     def process(self):
         
+        # Each stage is computed once, and reused by the later stages
+        if hasattr(self, 'variables'):
+            return self.variables
+
         self.remove_irrelevant_rows()
         self.extract_parenthesis_number()
         self.extract_amount()
@@ -212,7 +218,7 @@ class FormProcessor:
         df_numbers = df[df['Number'] != '']['Number']
 
         # get expected parenthesis numbers
-        no_of_var = pd.read_excel(self.no_of_vars_filepath, sheet_name=self.form)
+        no_of_var = read_parameter_sheet(self.no_of_vars_filepath, self.form)
 
         expected_numbers = no_of_var['number'].unique().tolist()
 
@@ -499,7 +505,7 @@ class FormProcessor:
             print(f"no_of_amt: {no_of_amt}, expected number of amt: {self.expected_number_of_vars}")
             raise Exception("Number of variables does not match expected number of variables")
         
-        var_map = pd.read_excel(self.var_map_filepath, sheet_name=self.form)
+        var_map = read_parameter_sheet(self.var_map_filepath, self.form)
         var_map["Amt"] = list_of_amt
         var_map["missing_identifier"] = missing_identifier
 
@@ -523,7 +529,6 @@ class FormProcessor:
             self.variables = var_map[['var_name', 'current_fy', 
                                     'previous_fy', 'missing_identifier']].copy()
 
-        self.variables.to_excel("var_map.xlsx")
 
 
 class Form1Processor(FormProcessor):
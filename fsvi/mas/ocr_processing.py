@@ -0,0 +1,86 @@
+'''
+Shared helpers for the OCR output processors of MAS forms 1, 2 and 3:
+    - read_parameter_sheet : parameter workbooks loaded once per process
+    - process_ocr_outputs  : batch of OCR exports in a process pool
+'''
+
+import os
+import functools
+import importlib
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Module of the OCROutputProcessor for each form
+OCR_PROCESSOR_MODULES = {
+    "form1": "luna.fsvi.mas.form1.mas_f1_ocr_output_formatter",
+    "form2": "luna.fsvi.mas.form2.mas_f2_ocr_output_formatter",
+    "form3": "luna.fsvi.mas.form3.mas_f3_ocr_output_formatter",
+    }
+
+
+@functools.lru_cache(maxsize=32)
+def _read_parameter_sheet(fp, sheet_name, mtime):
+
+    return pd.read_excel(fp, sheet_name=sheet_name)
+
+
+def read_parameter_sheet(fp, sheet_name):
+    '''
+    pd.read_excel of a sheet in the parameters folder (e.g. 
+    map_to_variable.xlsx), read once per process and again only if the
+    file is modified.
+
+    A copy is returned, as the processors modify the frame.
+    '''
+
+    df = _read_parameter_sheet(fp, sheet_name, os.path.getmtime(fp))
+
+    return df.copy()
+
+
+def process_ocr_output(filepath, sheet_name, form, luna_fp):
+    '''
+    Same as OCROutputProcessor(...).execute(), with the processor of the
+    form.
+    '''
+
+    if form not in OCR_PROCESSOR_MODULES:
+        raise Exception("Invalid form type")
+
+    module = importlib.import_module(OCR_PROCESSOR_MODULES[form])
+    processor = module.OCROutputProcessor(filepath=filepath,
+                                          sheet_name=sheet_name,
+                                          form=form,
+                                          luna_fp=luna_fp)
+
+    return processor.execute()
+
+
+def process_ocr_outputs(filepaths, form, luna_fp, sheet_name="Sheet1",
+                        max_workers=None):
+    '''
+    Processes many OCR exports of the same form in a process pool.
+
+    Each worker loads the parameter workbooks once, and reuses them for
+    all the files it processes.
+
+    Returns dict of filepath -> output of OCROutputProcessor.execute().
+
+    Note: on windows, the caller must be under if __name__ == "__main__".
+
+    Usage:
+        > outputs = process_ocr_outputs([fp1, fp2], "form2", luna_fp)
+    '''
+
+    if form not in OCR_PROCESSOR_MODULES:
+        raise Exception("Invalid form type")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            fp: executor.submit(process_ocr_output, fp, sheet_name, form, luna_fp)
+            for fp in filepaths
+            }
+        outputs = {fp: future.result() for fp, future in futures.items()}
+
+    return outputs
@@ -0,0 +1,106 @@
+'''
+Shared subtotal engine for the MAS form generators.
+
+In the MAS templates, a field is either an Amount line or a Subtotal line.
+Contiguous Amount lines form a block, and the subtotal of the block goes
+to the Subtotal column of the last line of the block.
+
+Main functions:
+    - get_amount_block_keys
+    - get_amount_block_subtotals
+    - map_balance_to_columns
+'''
+
+# Import standard libraries
+import numpy as np
+import pandas as pd
+
+
+def get_amount_block_keys(outputdf):
+    '''
+    Returns a pd.Series with the same index as outputdf:
+        - a block number for each line in a contiguous Amount block
+        - NaN for the other lines.
+    '''
+
+    is_amount = outputdf["Amount"].notna()
+
+    # A new block starts at every Amount line not preceded by an Amount line
+    is_start = is_amount & ~is_amount.shift(1, fill_value = False)
+    block_keys = is_start.cumsum().where(is_amount)
+
+    return block_keys
+
+
+def get_amount_block_subtotals(outputdf):
+    '''
+    Returns a pd.Series of the subtotal of each Amount block, indexed by the
+    last line of the block.
+
+    Same as the running subtotal of the previous column_mapper loops:
+        - empty Balance lines are skipped
+        - the subtotal is kept if the last line has a Balance, or if the
+          subtotal is not 0.
+    '''
+
+    block_keys = get_amount_block_keys(outputdf)
+    is_amount = block_keys.notna()
+
+    # Last line of each block
+    is_end = is_amount & ~is_amount.shift(-1, fill_value = False)
+
+    # Running subtotal within each block; the value at the last line is the
+    # subtotal of the block
+    balance = outputdf.loc[is_amount, "Balance"].astype(float)
+    running = balance.fillna(0).groupby(block_keys[is_amount]).cumsum()
+
+    end_rows = is_end[is_end].index
+    subtotals = running.loc[end_rows]
+
+    to_keep = outputdf.loc[end_rows, "Balance"].notna() | (subtotals != 0)
+
+    return subtotals[to_keep]
+
+
+def map_balance_to_columns(outputdf, fill_empty_subtotal = False):
+    '''
+    Maps the Balance amounts to the correct column (Amount or Subtotal),
+    and appends the subtotal of each Amount block in the Subtotal column.
+
+    fill_empty_subtotal = True to also map the Balance of the non-Amount
+                          lines with an empty Subtotal (Form 2).
+                          False to only map the lines with a Subtotal (Form 1).
+
+    Returns a new pd.DataFrame.
+    '''
+
+    outputdf = outputdf.copy()
+
+    # Subtotal of the Amount blocks
+    subtotals = get_amount_block_subtotals(outputdf)
+    outputdf.loc[subtotals.index, "Subtotal"] = subtotals
+
+    # Balance to Amount or Subtotal
+    is_amount = outputdf["Amount"].notna()
+    if fill_empty_subtotal:
+        is_subtotal = ~is_amount
+    else:
+        is_subtotal = ~is_amount & outputdf["Subtotal"].notna()
+
+    outputdf.loc[is_amount, "Amount"] = outputdf.loc[is_amount, "Balance"]
+    outputdf.loc[is_subtotal, "Subtotal"] = outputdf.loc[is_subtotal, "Balance"]
+
+    return outputdf
+
+
+if __name__ == "__main__":
+
+    # Tester
+    if True:
+
+        outputdf = pd.DataFrame(
+            {"Amount"   : [None, 0, 0, 0, None, 0, None],
+             "Subtotal" : [None, None, None, None, "=SUM()", None, 0],
+             "Balance"  : [np.nan, 1.0, np.nan, 2.0, 3.0, np.nan, 4.0]})
+
+        print (map_balance_to_columns(outputdf))
@@ -9,30 +9,110 @@ from openpyxl.worksheet.datavalidation import DataValidation
 import sys
 sys.path.append("D:\gohjiawey\Desktop\Form 3\CODES")
 
+import hashlib
 import luna
 import pyeasylib
+from luna import settings
 from luna.common import misc 
 # import luna.commmon.misc as misc 
 
 import luna.common.misc as misc
 
-class MASTemplateReader_Form1:
+class MASTemplateCache:
+    '''
+    Disk cache of the compiled mapping templates.
+
+    Parsing the xlsx and converting the L/S codes to intervals is slow,
+    while the template rarely changes. The processed attributes of the
+    reader (var_name -> intervals / formulas, var_name -> excel row,
+    and the processed frames) are pickled once, under a key of:
+        - reader class and CACHE_VERSION
+        - sheet name
+        - hash of the workbook content
+    so any edit to the workbook gives a new key.
+
+    Used by MASTemplateReader_Form1 and MASTemplateReader_Form3.
+    '''
+
+    # Bump this when the processing of the template is changed
+    CACHE_VERSION = 1
+
+    CACHED_ATTRS = ["df0", "df1", "df_processed", "colname_to_excelcol",
+                    "varname_to_lscodes", "varname_to_index"]
+
+    def _get_cache_fp(self):
+
+        # Hash of the workbook content
+        with open(self.fp, "rb") as f:
+            workbook_hash = hashlib.sha256(f.read()).hexdigest()
+
+        key = f"{type(self).__name__}|{self.CACHE_VERSION}|{self.sheet_name}|{workbook_hash}"
+        key_hash = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+        folderpath = os.path.join(settings.TEMP_FOLDERPATH, "mas_template_cache")
+        if not os.path.exists(folderpath):
+            os.makedirs(folderpath, exist_ok = True)
+
+        return os.path.join(folderpath, f"{type(self).__name__}_{key_hash}.pkl")
+
+    def _load_from_cache(self):
+        '''
+        Returns True if the attributes are loaded from the cache.
+        '''
+
+        self.cache_fp = self._get_cache_fp()
+        if not os.path.exists(self.cache_fp):
+            return False
+
+        try:
+            attrs = pd.read_pickle(self.cache_fp)
+        except Exception:
+            # e.g. corrupted file, or written by another pandas version
+            return False
+
+        for attr in self.CACHED_ATTRS:
+            setattr(self, attr, attrs[attr])
+
+        return True
+
+    def _save_to_cache(self):
+
+        attrs = {attr: getattr(self, attr) for attr in self.CACHED_ATTRS}
+
+        # Write to a temp file first, so that a partial file is never read
+        tmp_fp = f"{self.cache_fp}.{os.getpid()}.tmp"
+        pd.to_pickle(attrs, tmp_fp)
+        os.replace(tmp_fp, self.cache_fp)
+
+    def main(self):
+
+        if self.use_cache and self._load_from_cache():
+            return
+
+        self.read_data_from_file()
+        self.process_template()
+        self.get_varname_to_ls_codes()
+
+        if self.use_cache:
+            self._save_to_cache()
+
+
+class MASTemplateReader_Form1(MASTemplateCache):
     
     REQUIRED_HEADERS = ["Amount", "Subtotal"] 
 
-    def __init__(self, fp, sheet_name):
+    def __init__(self, fp, sheet_name, use_cache = True):
+        '''
+        use_cache = False to always parse the workbook.
+                    See MASTemplateCache.
+        '''
         
         self.fp = fp
         self.sheet_name = sheet_name
+        self.use_cache = use_cache
         
         self.main()
     
-    def main(self):
-        
-        self.read_data_from_file()
-        self.process_template()
-        self.get_varname_to_ls_codes()
-        
     def read_data_from_file(self):
         
         # Read the main df
@@ -191,25 +271,23 @@ class MASTemplateReader_Form1:
         return formula_frame
 
 
-class MASTemplateReader_Form3:
+class MASTemplateReader_Form3(MASTemplateCache):
     
     REQUIRED_HEADERS = ["Previous year\n<<<previous_fy>>>\n$",
                         "Current year\n<<<current_fy>>>\n$"]
 
-    def __init__(self, fp, sheet_name):
+    def __init__(self, fp, sheet_name, use_cache = True):
+        '''
+        use_cache = False to always parse the workbook.
+                    See MASTemplateCache.
+        '''
         
         self.fp = fp
         self.sheet_name = sheet_name
-
-        self.main()
-        
-    def main(self):
-        
-        self.read_data_from_file()
-        self.process_template()
-        self.get_varname_to_ls_codes()
-
+        self.use_cache = use_cache
         
+        self.main()
+    
     def read_data_from_file(self):
         
         # Read the main df
@@ -2,21 +2,44 @@ import importlib.util
 import os
 import luna
 from luna import settings
+from luna.common.lazyimport import get_lazy_loaders
 
-from luna.lunahub.connection import LunaHubConnector
-from luna.lunahub.connection import LunaHubBaseUploader
+# The classes are only imported on first use, see common/lazyimport.py
+_getattr, __dir__ = get_lazy_loaders(__name__, {
+    "LunaHubConnector"      : "luna.lunahub.connection",
+    "LunaHubBaseUploader"   : "luna.lunahub.connection",
+    "LunaHubConnectionPool" : "luna.lunahub.connection",
+    "LUNAHUB_POOL"          : "luna.lunahub.connection",
+    "get_lunahub_obj"       : "luna.lunahub.connection",
+    "LunaHubTableCache"     : "luna.lunahub.cache",
+    "LUNAHUB_CACHE"         : "luna.lunahub.cache",
+    })
+
+
+def load_lunahub_config():
+    '''
+    Returns the CONN_DICT of the secrets.py at
+    settings.LUNAHUB_CONFIG_FILEPATH.
+    '''
 
-if True:
     # Get the config fp from luna\settings.py
     LUNAHUB_CONFIG_FILEPATH = settings.LUNAHUB_CONFIG_FILEPATH
 
     # Load the config via path import
     name = os.path.splitext(os.path.basename(LUNAHUB_CONFIG_FILEPATH))[0]
     spec = importlib.util.spec_from_file_location(name, LUNAHUB_CONFIG_FILEPATH)
-    LUNAHUB_CONFIG = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(LUNAHUB_CONFIG)
-    LUNAHUB_CONFIG = LUNAHUB_CONFIG.CONN_DICT
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+
+    return config.CONN_DICT
+
+
+def __getattr__(name):
 
-    # Clear vars
-    del (LUNAHUB_CONFIG_FILEPATH, name, spec)
+    # The secrets are only loaded on first use, i.e. when connecting
+    if name == "LUNAHUB_CONFIG":
+        global LUNAHUB_CONFIG
+        LUNAHUB_CONFIG = load_lunahub_config()
+        return LUNAHUB_CONFIG
 
+    return _getattr(name)
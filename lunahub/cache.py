@@ -0,0 +1,272 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+import pandas as pd
+
+import luna
+from luna import settings
+
+# Parquet needs pyarrow. Fall back to pickle if it is not installed.
+try:
+    import pyarrow
+    CACHE_FORMAT = "parquet"
+except ImportError:
+    CACHE_FORMAT = "pickle"
+
+# Configure logger
+logger = logging.getLogger()
+if not(logger.hasHandlers()):
+    logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.DEBUG)
+
+
+class LunaHubTableCache:
+
+    def __init__(self, folderpath = None, enabled = None, max_age_days = None):
+        '''
+        Read-through cache of lunahub query results on local disk.
+
+        The cache holds client data, so it is off unless turned on in
+        settings.py:
+            LUNAHUB_CACHE_ENABLED       = True
+            LUNAHUB_CACHE_MAX_AGE_DAYS  = 7     (optional, default 7)
+
+        Before a query is run, a cheap probe is sent:
+            SELECT MAX([UPLOADDATETIME]), COUNT(*) FROM table WHERE ...
+        The result is cached under (table, client, fy, latest upload,
+        row count, query). So a new upload (or deleted rows) gives a new
+        key and the data is downloaded again, while repeated runs for the
+        same engagement are read from disk.
+
+        When a new version is cached, the older versions of the same
+        query are deleted, and files older than max_age_days are deleted.
+
+        Data read from lunahub is returned as read back from the cache
+        file, so a first run and a cached run give the same dtypes.
+
+        folderpath      = where the files are saved.
+                          Default is <TEMP_FOLDERPATH>/lunahub_cache.
+        enabled         = True / False to override settings.
+        max_age_days    = to override settings.
+
+        Main methods:
+            - read_table
+            - clear
+        '''
+
+        self.folderpath     = folderpath
+        self.enabled        = enabled
+        self.max_age_days   = max_age_days
+
+        self._lock = threading.Lock()
+
+    def is_enabled(self):
+
+        if self.enabled is not None:
+            return self.enabled
+
+        return getattr(settings, "LUNAHUB_CACHE_ENABLED", False)
+
+    def get_max_age_days(self):
+
+        if self.max_age_days is not None:
+            return self.max_age_days
+
+        return getattr(settings, "LUNAHUB_CACHE_MAX_AGE_DAYS", 7)
+
+    def _get_folderpath(self):
+
+        folderpath = self.folderpath
+        if folderpath is None:
+            folderpath = os.path.join(settings.TEMP_FOLDERPATH, "lunahub_cache")
+
+        if not os.path.exists(folderpath):
+            os.makedirs(folderpath, exist_ok = True)
+
+        return folderpath
+
+    def _get_version(self, lunahub_obj, tablename, where_clause):
+        '''
+        Returns (latest uploaddatetime, row count) of the filtered table.
+        '''
+
+        query = (
+            "SELECT MAX([UPLOADDATETIME]) AS [MAXUPLOADDATETIME], "
+            "COUNT(*) AS [NUMROWS] "
+            f"FROM {tablename} WHERE {where_clause}"
+            )
+        df = lunahub_obj.read_table(query = query)
+
+        latest_version  = df.at[0, "MAXUPLOADDATETIME"]
+        num_rows        = int(df.at[0, "NUMROWS"])
+
+        return latest_version, num_rows
+
+    def _get_filename_parts(self, tablename, client_number, fy, query):
+        '''
+        Returns (prefix, suffix) of the filename, which are the same for
+        all the versions of a query.
+        '''
+
+        # Different queries on the same table give different data
+        query_hash = hashlib.md5(query.encode("utf-8")).hexdigest()[:10]
+
+        fy_str = "all" if fy is None else str(int(fy))
+
+        prefix = f"{tablename}_{int(client_number)}_{fy_str}_"
+        suffix = f"_{query_hash}.{CACHE_FORMAT}"
+
+        return prefix, suffix
+
+    def _get_filepath(self, tablename, client_number, fy,
+                      latest_version, num_rows, query):
+
+        prefix, suffix = self._get_filename_parts(
+            tablename, client_number, fy, query)
+
+        version_str = pd.to_datetime(latest_version).strftime("%Y%m%dT%H%M%S%f")
+
+        fn = f"{prefix}{version_str}_{num_rows}{suffix}"
+
+        return os.path.join(self._get_folderpath(), fn)
+
+    def _purge(self, fp, prefix, suffix):
+        '''
+        Deletes the other versions of the same query, and the files
+        older than max_age_days.
+        '''
+
+        folderpath = self._get_folderpath()
+        oldest_mtime = time.time() - self.get_max_age_days() * 24 * 60 * 60
+
+        for fn in os.listdir(folderpath):
+
+            other_fp = os.path.join(folderpath, fn)
+            if (other_fp == fp) or fn.endswith(".tmp"):
+                continue
+
+            is_old_version = fn.startswith(prefix) and fn.endswith(suffix)
+
+            try:
+                if is_old_version or (os.path.getmtime(other_fp) < oldest_mtime):
+                    os.remove(other_fp)
+            except OSError as e:
+                # e.g. deleted or opened by another process
+                logger.debug(f"Unable to delete {other_fp}: {str(e)}")
+
+    def _read_file(self, fp):
+
+        if fp.endswith(".parquet"):
+            return pd.read_parquet(fp)
+        else:
+            return pd.read_pickle(fp)
+
+    def _write_file(self, df, fp):
+
+        # Write to a temp file first, so that a partial file is never read
+        tmp_fp = f"{fp}.{threading.get_ident()}.tmp"
+        try:
+            if fp.endswith(".parquet"):
+                try:
+                    df.to_parquet(tmp_fp, index = True)
+                except Exception as e:
+                    # e.g. mixed types in object columns
+                    logger.debug(f"Unable to cache as parquet: {str(e)}")
+                    return
+            else:
+                df.to_pickle(tmp_fp)
+            os.replace(tmp_fp, fp)
+        finally:
+            if os.path.exists(tmp_fp):
+                os.remove(tmp_fp)
+
+    def read_table(self, lunahub_obj, tablename, query, where_clause,
+                   client_number, fy = None, version = None):
+        '''
+        Same as lunahub_obj.read_table(query = query), but read from the
+        local cache when the data on lunahub has not changed.
+
+        where_clause    = the filter used in query (without "WHERE"). Used
+                          to probe for the latest version.
+        client_number   = for the cache key.
+        fy              = for the cache key; None if not filtered by fy.
+        version         = (latest uploaddatetime, row count) of the data
+                          returned by query, if already known. Saves the
+                          probe.
+        '''
+
+        if not self.is_enabled():
+            return lunahub_obj.read_table(query = query)
+
+        if version is None:
+            version = self._get_version(lunahub_obj, tablename, where_clause)
+        latest_version, num_rows = version
+
+        # Nothing to cache
+        if (num_rows == 0) or pd.isnull(latest_version):
+            return lunahub_obj.read_table(query = query)
+
+        fp = self._get_filepath(tablename, client_number, fy,
+                                latest_version, num_rows, query)
+
+        max_age = self.get_max_age_days() * 24 * 60 * 60
+        if os.path.exists(fp) and (time.time() - os.path.getmtime(fp) < max_age):
+            logger.debug(f"Loaded {tablename} from cache: {fp}.")
+            return self._read_file(fp)
+
+        df = lunahub_obj.read_table(query = query)
+
+        with self._lock:
+            self._write_file(df, fp)
+            self._purge(fp, *self._get_filename_parts(
+                tablename, client_number, fy, query))
+
+        # Read back, so that the dtypes are the same as when cached
+        if os.path.exists(fp):
+            df = self._read_file(fp)
+
+        return df
+
+    def clear(self, tablename = None, client_number = None):
+        '''
+        Deletes the cached files, optionally only for a table and/or client.
+        '''
+
+        folderpath = self._get_folderpath()
+
+        for fn in os.listdir(folderpath):
+
+            # Filename starts with <tablename>_<client_number>_
+            rest = fn
+            if tablename is not None:
+                if not fn.startswith(f"{tablename}_"):
+                    continue
+                rest = fn[len(tablename):]
+
+            if (client_number is not None) and (f"_{int(client_number)}_" not in rest):
+                continue
+
+            os.remove(os.path.join(folderpath, fn))
+
+
+# Shared by all the lunahub classes in this process
+LUNAHUB_CACHE = LunaHubTableCache()
+
+
+if __name__ == "__main__":
+
+    # Tester
+    if True:
+
+        import luna.lunahub as lunahub
+
+        client_number   = 71679
+        tablename       = "client"
+        where_clause    = f"([CLIENTNUMBER] = {client_number})"
+        query           = f"SELECT * FROM {tablename} WHERE {where_clause}"
+
+        self = LunaHubTableCache(enabled = True)
+        df = self.read_table(lunahub.get_lunahub_obj(), tablename, query,
+                             where_clause, client_number)
@@ -2,7 +2,19 @@ import luna
 import luna.lunahub as lunahub
 import pyeasylib
 import os
+import atexit
 import datetime
+import threading
+import time
+import logging
+import numpy as np
+import pandas as pd
+
+# Configure logger
+logger = logging.getLogger()
+if not(logger.hasHandlers()):
+    logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.DEBUG)
 
 PyMsSQL = pyeasylib.dblib.PyMsSQL
 
@@ -18,12 +30,332 @@ class LunaHubConnector(PyMsSQL):
                          username=username,
                          password=password)
         
+        # Kept for the pyodbc connection
+        self._connection_params = {"driver"     : driver,
+                                   "server"     : server,
+                                   "database"   : database,
+                                   "username"   : username,
+                                   "password"   : password}
+    
+    @staticmethod
+    def _quote_odbc_value(value):
+        '''
+        Quotes a value of an ODBC connection string, so that ; { } in
+        e.g. the password are kept as is.
+        '''
+        
+        return "{" + str(value).replace("}", "}}") + "}"
+    
+    def _get_pymssql_connections(self):
+        '''
+        Returns [(attribute name, connection)] of the connections opened
+        by PyMsSQL, i.e. the attributes with cursor() and close(), or
+        dispose() for an engine.
+        '''
+        
+        connections = []
+        for name, value in vars(self).items():
+            
+            if name == "_odbc_connection":
+                continue
+            
+            is_connection = (callable(getattr(value, "cursor", None)) 
+                             and callable(getattr(value, "close", None)))
+            is_engine = callable(getattr(value, "dispose", None))
+            
+            if is_connection or is_engine:
+                connections.append((name, value))
+        
+        return connections
+    
+    def _get_odbc_connection(self):
+        '''
+        pyodbc connection for the bulk inserts and the parameterised reads.
+        
+        The pyodbc connection of PyMsSQL is used if there is one. Else a
+        connection (autocommit) is opened once per connector and closed 
+        with close().
+        '''
+        
+        if getattr(self, '_odbc_connection', None) is None:
+            
+            for name, connection in self._get_pymssql_connections():
+                if type(connection).__module__ == "pyodbc":
+                    self._odbc_connection = connection
+                    self._owns_odbc_connection = False
+                    return self._odbc_connection
+            
+            import pyodbc
+            
+            params = self._connection_params
+            quote = self._quote_odbc_value
+            connection_str = (
+                f"DRIVER={quote(params['driver'].strip('{}'))};"
+                f"SERVER={quote(params['server'])};"
+                f"DATABASE={quote(params['database'])};"
+                f"UID={quote(params['username'])};"
+                f"PWD={quote(params['password'])}"
+                )
+            
+            self._odbc_connection = pyodbc.connect(connection_str, autocommit = True)
+            self._owns_odbc_connection = True
+        
+        return self._odbc_connection
+    
+    @staticmethod
+    def _convert_dataframe_to_params(df):
+        '''
+        Converts df to a list of row tuples of python types (NaN -> None,
+        numpy -> python scalars), as needed by pyodbc.
+        '''
+        
+        columns = []
+        for c in df.columns:
+            
+            s = df[c]
+            
+            if pd.api.types.is_datetime64_any_dtype(s):
+                values = np.array(s.dt.to_pydatetime(), dtype=object)
+            else:
+                values = s.astype(object).to_numpy(copy=True)
+            
+            # NaN / NaT -> None
+            values[pd.isnull(values)] = None
+            
+            # numpy scalars -> python scalars
+            values = [v.item() if isinstance(v, np.generic) else v for v in values]
+            
+            columns.append(values)
+        
+        return list(zip(*columns))
+    
+    def bulk_insert_dataframe(self, tablename, df, chunksize = 10000):
+        '''
+        Fast path for insert_dataframe.
+        
+        Rows are sent in chunks with pyodbc fast_executemany (one round 
+        trip per chunk rather than per row), all in one transaction. 
+        Nothing is inserted if any chunk fails.
+        
+        Returns a pd.Series of the number of rows, time taken and
+        throughput.
+        '''
+        
+        start = time.perf_counter()
+        
+        columns = ", ".join(f"[{c}]" for c in df.columns)
+        placeholders = ", ".join("?" * df.shape[1])
+        query = f"INSERT INTO {tablename} ({columns}) VALUES ({placeholders})"
+        
+        params = self._convert_dataframe_to_params(df)
+        
+        # One transaction for all the chunks
+        connection = self._get_odbc_connection()
+        autocommit = connection.autocommit
+        connection.autocommit = False
+        cursor = connection.cursor()
+        cursor.fast_executemany = True
+        try:
+            for i in range(0, len(params), chunksize):
+                cursor.executemany(query, params[i:i+chunksize])
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            connection.autocommit = autocommit
+        
+        time_taken = time.perf_counter() - start
+        stats = pd.Series({"Rows"       : len(params),
+                           "Time (s)"   : time_taken,
+                           "Rows/s"     : len(params) / time_taken if time_taken > 0 else np.nan},
+                          name = tablename)
+        logger.debug(f"Inserted {len(params)} rows to {tablename} in "
+                     f"{time_taken:.2f}s ({stats['Rows/s']:.0f} rows/s).")
+        
+        return stats
+    
+    def read_table_with_params(self, query, params):
+        '''
+        Same as read_table, but the values in the query are passed as ?
+        parameters instead of being formatted into the string.
+        
+        e.g. read_table_with_params(
+                "SELECT * FROM [dbo].[client] WHERE [CLIENTNUMBER] = ?",
+                [client_number])
+        '''
+        
+        cursor = self._get_odbc_connection().cursor()
+        try:
+            cursor.execute(query, list(params))
+            columns = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        
+        df = pd.DataFrame.from_records([tuple(r) for r in rows],
+                                       columns = columns,
+                                       coerce_float = True)
+        
+        return df
+    
+    def close(self):
+        '''
+        Closes the connections to lunahub.
+        '''
+        
+        connection = getattr(self, '_odbc_connection', None)
+        self._odbc_connection = None
+        if (connection is not None) and self._owns_odbc_connection:
+            connection.close()
+        
+        close = getattr(PyMsSQL, "close", None)
+        if callable(close):
+            close(self)
+            return
+        
+        # PyMsSQL has no close(), so close its connection here
+        connections = self._get_pymssql_connections()
+        
+        if len(connections) == 0:
+            logger.warning(
+                "Unable to close the lunahub connection: PyMsSQL has no "
+                "close() and no connection attribute was found.")
+        
+        for name, connection in connections:
+            if callable(getattr(connection, "dispose", None)):
+                connection.dispose()
+            elif not getattr(connection, "closed", False):
+                connection.close()
+        
     def future_methods1(self):
         pass
     
     def future_methods2(self):
         pass
         
+class LunaHubConnectionPool:
+    
+    def __init__(self, lunahub_config = None):
+        '''
+        Process-wide pool of LunaHubConnector.
+        
+        Each thread gets its own connector (connections cannot be shared
+        across threads), which is then reused by every loader and uploader
+        in that thread. So a run only connects once per thread.
+        
+        lunahub_config = dict of the connection details. 
+                         Defaults to lunahub.LUNAHUB_CONFIG.
+        
+        Usage:
+            > with LUNAHUB_POOL:
+            >     ... all lunahub classes will share the connectors ...
+            
+            The connectors are closed when the with block exits. The 
+            pool can still be used after that, and will reconnect.
+            
+            The connectors of threads that have exited (e.g. the workers
+            of FundsInputBundle) are closed when a new one is created, and
+            all are closed at the exit of the process.
+        
+        Main methods:
+            - get_connector
+            - close
+        '''
+        
+        self.lunahub_config = lunahub_config
+        
+        self._lock          = threading.Lock()
+        self._connectors    = {} # thread id -> LunaHubConnector
+    
+    def __enter__(self):
+        
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        
+        self.close()
+        
+    def __len__(self):
+        
+        return len(self._connectors)
+    
+    def get_connector(self):
+        '''
+        Returns the connector for the current thread. Connects if there
+        is none yet.
+        '''
+        
+        thread_id = threading.get_ident()
+        
+        with self._lock:
+            lunahub_obj = self._connectors.get(thread_id)
+        
+        if lunahub_obj is None:
+            
+            lunahub_config = self.lunahub_config \
+                             if self.lunahub_config is not None \
+                             else lunahub.LUNAHUB_CONFIG
+            
+            # Connect outside the lock, so that threads can connect in parallel
+            lunahub_obj = LunaHubConnector(**lunahub_config)
+            
+            with self._lock:
+                lunahub_obj = self._connectors.setdefault(thread_id, lunahub_obj)
+            
+            self._close_dead_threads()
+        
+        return lunahub_obj
+    
+    def _close_dead_threads(self):
+        
+        alive_thread_ids = {t.ident for t in threading.enumerate()}
+        
+        with self._lock:
+            dead_thread_ids = [i for i in self._connectors if i not in alive_thread_ids]
+            connectors = [self._connectors.pop(i) for i in dead_thread_ids]
+        
+        for lunahub_obj in connectors:
+            self._close_connector(lunahub_obj)
+    
+    @staticmethod
+    def _close_connector(lunahub_obj):
+        
+        close = getattr(lunahub_obj, "close", None)
+        if callable(close):
+            close()
+    
+    def close(self):
+        '''
+        Closes and removes all the connectors in the pool.
+        '''
+        
+        with self._lock:
+            connectors = list(self._connectors.values())
+            self._connectors = {}
+        
+        for lunahub_obj in connectors:
+            self._close_connector(lunahub_obj)
+
+
+# Shared by all the lunahub classes in this process
+LUNAHUB_POOL = LunaHubConnectionPool()
+atexit.register(LUNAHUB_POOL.close)
+
+
+def get_lunahub_obj(lunahub_obj = None):
+    '''
+    Returns lunahub_obj if provided, else the shared connector from
+    LUNAHUB_POOL.
+    '''
+    
+    if lunahub_obj is None:
+        lunahub_obj = LUNAHUB_POOL.get_connector()
+    
+    return lunahub_obj
+
+        
 class LunaHubBaseUploader(PyMsSQL):
     
     def __init__(self, 
@@ -33,13 +365,17 @@ class LunaHubBaseUploader(PyMsSQL):
                  lunahub_config = None):
         '''
         Base upload class for LunaHub.
+        
+        lunahub_config = dict of the connection details, to connect with
+                         instead of the shared LUNAHUB_POOL. Not used if
+                         lunahub_obj is provided.
         '''
         
         # Update attr
         self.lunahub_obj    = lunahub_obj
         self.uploader       = uploader
         self.uploaddatetime = uploaddatetime
-        self.lunahub_config = None
+        self.lunahub_config = lunahub_config
         
         # Initialise if not provided        
         if self.uploader is None:
@@ -50,11 +386,10 @@ class LunaHubBaseUploader(PyMsSQL):
                
         if self.lunahub_obj is None:
             
-            if self.lunahub_config is None:
-                
-                self.lunahub_config = lunahub.LUNAHUB_CONFIG
-            
-            self.lunahub_obj = lunahub.LunaHubConnector(**self.lunahub_config)
+            if self.lunahub_config is not None:
+                self.lunahub_obj = LunaHubConnector(**self.lunahub_config)
+            else:
+                self.lunahub_obj = get_lunahub_obj()
             
     
 if __name__ == "__main__":
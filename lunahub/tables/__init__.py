@@ -1,17 +1,5 @@
-from luna.lunahub.tables import client
-from luna.lunahub.tables import fs_masf1_userresponse
-from luna.lunahub.tables import fs_masf2_userresponse
-from luna.lunahub.tables import fs_masf3_userresponse
-from luna.lunahub.tables import fs_masf3_sig_accts
-from luna.lunahub.tables import fs_masf1_output
-from luna.lunahub.tables import fs_masf2_output
-from luna.lunahub.tables import fs_masf3_output
+# The table modules (e.g. tables.client) are only imported on first use,
+# see common/lazyimport.py
+from luna.common.lazyimport import get_lazy_loaders
 
-from luna.lunahub.tables import fs_funds_userresponse
-from luna.lunahub.tables import fs_funds_invmt_output_portfolio
-from luna.lunahub.tables import fs_funds_invmt_output_sublead
-from luna.lunahub.tables import fs_funds_invmt_txn_recon_details
-from luna.lunahub.tables import fs_funds_broker_statement
-from luna.lunahub.tables import fs_funds_custodian_confirmation
-from luna.lunahub.tables import fs_funds_fundadmin_txn
-from luna.lunahub.tables import fs_funds_fundadmin_portfolio
\ No newline at end of file
+__getattr__, __dir__ = get_lazy_loaders(__name__, {})
@@ -161,8 +161,7 @@ class ClientInfoLoader_From_LunaHub:
         
         self.client_number = int(client_number)
 
-        if lunahub_obj is None:
-            self.lunahub_obj = lunahub.LunaHubConnector(**lunahub.LUNAHUB_CONFIG)
+        self.lunahub_obj = lunahub.get_lunahub_obj(lunahub_obj)
         
         # raise NotImplementedError
             
@@ -202,12 +201,11 @@ class ClientInfoLoader_From_LunaHub:
                                    # Take the latest
 
         # Read for this client
-        query = (
-            f"SELECT * FROM {self.TABLENAME} "
-            "WHERE "
-            f"([CLIENTNUMBER] = {self.client_number})"
-            )                
-        df_client = self.lunahub_obj.read_table(query = query)
+        where_clause = f"([CLIENTNUMBER] = {self.client_number})"
+        query = f"SELECT * FROM {self.TABLENAME} WHERE {where_clause}"
+        df_client = lunahub.LUNAHUB_CACHE.read_table(
+            self.lunahub_obj, self.TABLENAME, query, where_clause,
+            self.client_number)
         
         # Check if client data is available
         if df_client.shape[0] == 0:
@@ -27,8 +27,7 @@ class FundsBrokerStatement_DownloaderFromLunaHub:
         self.client_number  = int(client_number)
         self.fy             = int(fy)
         
-        if lunahub_obj is None:
-            self.lunahub_obj = lunahub.LunaHubConnector(**lunahub.LUNAHUB_CONFIG)
+        self.lunahub_obj = lunahub.get_lunahub_obj(lunahub_obj)
 
     def main(self):
 
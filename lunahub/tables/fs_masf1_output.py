@@ -125,7 +125,8 @@ class MASForm1Output_LoaderToLunaHub(LunaHubBaseUploader):
         df_processed = self.df_processed.copy()
         
         # Upload
-        self.lunahub_obj.insert_dataframe(self.tablename, df_processed)
+        self.upload_stats = self.lunahub_obj.bulk_insert_dataframe(
+            self.tablename, df_processed)
         
 
 class MASForm1Output_LoaderFromLunaHub:
@@ -137,8 +138,7 @@ class MASForm1Output_LoaderFromLunaHub:
         self.fy             = int(fy)
         self.tablename      = "fs_masf1_output"
         
-        if lunahub_obj is None:
-            self.lunahub_obj = lunahub.LunaHubConnector(**lunahub.LUNAHUB_CONFIG)
+        self.lunahub_obj = lunahub.get_lunahub_obj(lunahub_obj)
         
     def main(self):
         
@@ -74,7 +74,8 @@ class MASForm1UserResponse_UploaderToLunaHub(LunaHubBaseUploader):
         user_inputs_processed = self._process()
         
         # Upload
-        self.lunahub_obj.insert_dataframe(self.TABLENAME, user_inputs_processed)
+        self.upload_stats = self.lunahub_obj.bulk_insert_dataframe(
+            self.TABLENAME, user_inputs_processed)
 
 
 class MASForm1UserResponse_DownloaderFromLunaHub:
@@ -88,8 +89,7 @@ class MASForm1UserResponse_DownloaderFromLunaHub:
         self.client_number  = int(client_number)
         self.fy             = int(fy)
         
-        if lunahub_obj is None:
-            self.lunahub_obj = lunahub.LunaHubConnector(**lunahub.LUNAHUB_CONFIG)
+        self.lunahub_obj = lunahub.get_lunahub_obj(lunahub_obj)
     
     
     def main(self):
@@ -129,12 +129,11 @@ class MASForm1UserResponse_DownloaderFromLunaHub:
                                    # Take the latest
 
         # Read for this client
-        query = (
-            f"SELECT * FROM {self.TABLENAME} "
-            "WHERE "
-            f"([CLIENTNUMBER] = {self.client_number})"
-            )                
-        df_client = self.lunahub_obj.read_table(query = query)
+        where_clause = f"([CLIENTNUMBER] = {self.client_number})"
+        query = f"SELECT * FROM {self.TABLENAME} WHERE {where_clause}"
+        df_client = lunahub.LUNAHUB_CACHE.read_table(
+            self.lunahub_obj, self.TABLENAME, query, where_clause,
+            self.client_number)
         
         # Check if client data is available
         if df_client.shape[0] == 0:
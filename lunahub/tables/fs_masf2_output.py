@@ -133,7 +133,8 @@ class MASForm2Output_LoaderToLunaHub(MASForm1Output_LoaderToLunaHub):
         df_processed = self.df_processed.copy()
         
         # Upload
-        self.lunahub_obj.insert_dataframe(self.tablename, df_processed)
+        self.upload_stats = self.lunahub_obj.bulk_insert_dataframe(
+            self.tablename, df_processed)
         
 
 class MASForm2Output_LoaderFromLunaHub(MASForm1Output_LoaderFromLunaHub):
@@ -147,8 +148,7 @@ class MASForm2Output_LoaderFromLunaHub(MASForm1Output_LoaderFromLunaHub):
         self.fy             = int(fy)
         self.tablename      = MASForm2Output_LoaderFromLunaHub.TABLENAME
         
-        if lunahub_obj is None:
-            self.lunahub_obj = lunahub.LunaHubConnector(**lunahub.LUNAHUB_CONFIG)
+        self.lunahub_obj = lunahub.get_lunahub_obj(lunahub_obj)
         
     def main(self):
         
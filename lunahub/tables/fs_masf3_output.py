@@ -120,7 +120,8 @@ class MASForm3Output_LoaderToLunaHub(LunaHubBaseUploader):
         df_processed = self.df_processed.copy()
         
         # Upload
-        self.lunahub_obj.insert_dataframe(self.tablename, df_processed)
+        self.upload_stats = self.lunahub_obj.bulk_insert_dataframe(
+            self.tablename, df_processed)
         
 
 class MASForm3Output_LoaderFromLunaHub:
@@ -132,8 +133,7 @@ class MASForm3Output_LoaderFromLunaHub:
         self.fy             = int(fy)
         self.tablename      = "fs_masf3_output"
         
-        if lunahub_obj is None:
-            self.lunahub_obj = lunahub.LunaHubConnector(**lunahub.LUNAHUB_CONFIG)
+        self.lunahub_obj = lunahub.get_lunahub_obj(lunahub_obj)
         
     def main(self):
         
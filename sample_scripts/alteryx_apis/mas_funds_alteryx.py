@@ -92,74 +92,35 @@ if __name__ == "__main__":
     f.write("3\n")
     f.close()
 
-    client_class = lunahub.tables.client.ClientInfoLoader_From_LunaHub(client_number)
-    f = open(logfile,'a')
-    f.write("4\n")
-    f.close()
-    sublead_class = lunahub.tables.fs_funds_invmt_output_sublead.FundsSublead_DownloaderFromLunaHub(client_number, fy)
-    f = open(logfile,'a')
-    f.write("5\n")
-    f.close()
-    portfolio_class = lunahub.tables.fs_funds_invmt_output_portfolio.FundsPortfolio_DownloaderFromLunaHub(client_number, fy)
-    f = open(logfile,'a')
-    f.write("6\n")
-    f.close()
-    recon_class = lunahub.tables.fs_funds_invmt_txn_recon_details.FundsInvmtTxnReconDetail_DownloaderFromLunaHub(client_number, fy)
-    f = open(logfile,'a')
-    f.write("7\n")
-    f.close()
-    broker_class    = lunahub.tables.fs_funds_broker_statement.FundsBrokerStatement_DownloaderFromLunaHub(client_number, fy)
-    f = open(logfile,'a')
-    f.write("8\n")
-    f.close()
-    custodian_class = lunahub.tables.fs_funds_custodian_confirmation.FundsCustodianConfirmation_DownloaderFromLunaHub(client_number, fy)
-    f = open(logfile,'a')
-    f.write("9\n")
-    f.close()
-    tb_class = common.TBLoader_From_LunaHub(client_number, fy)
+    # Close the lunahub connections of all the threads at the end
+    with lunahub.LUNAHUB_POOL:
 
-    f = open(logfile,'a')
-    f.write("10\n")
-    f.close()
-
-    for attempt in range(12):
-        user_response_class = lunahub.tables.fs_funds_userresponse.FundsUserResponse_DownloaderFromLunaHub(
-            client_number,
-            fy)
-        user_inputs = user_response_class.main()
-        if user_inputs is not None:
-            break
-        elif user_inputs is None and attempt == 11:
-            raise Exception (f"Data not found for specified client {client_number} or FY {fy}.")
-        else:
-            continue
+        # Load all the inputs from lunahub concurrently
+        input_bundle = fsvi.funds.FundsInputBundle(client_number, fy)
+        f = open(logfile,'a')
+        f.write(f"{input_bundle.timings.round(2).to_string()}\n")
+        f.close()
 
-    f = open(logfile,'a')
-    f.write("11\n")
-    f.close()
+        f = open(logfile,'a')
+        f.write("11\n")
+        f.close()
 
-    output_fn = f"mas_funds_investment_{client_number}_{fy}.xlsx"
-    output_fp = os.path.join(settings.TEMP_FOLDERPATH, output_fn)
-    #output_fp = pyeasylib.check_filepath(output_fp)
-    pyeasylib.create_folder_for_filepath(output_fp) 
+        output_fn = f"mas_funds_investment_{client_number}_{fy}.xlsx"
+        output_fp = os.path.join(settings.TEMP_FOLDERPATH, output_fn)
+        #output_fp = pyeasylib.check_filepath(output_fp)
+        pyeasylib.create_folder_for_filepath(output_fp) 
 
-    f = open(logfile,'a')
-    f.write("12\n")
-    f.close()   
-
-    self = InvmtOutputFormatter(sublead_class   = sublead_class,
-                                 portfolio_class= portfolio_class,
-                                 recon_class    = recon_class,
-                                 broker_class   = broker_class,
-                                 custodian_class= custodian_class,
-                                 tb_class       = tb_class,
-                                 output_fp      = output_fp,
-                                 mapper_fp      = portfolio_mapper_fp,
-                                 user_inputs    = user_inputs,
-                                 client_class   = client_class,
-                                 fy             = fy,
-                                 aic_name       = aic_name
-                                 )
+        f = open(logfile,'a')
+        f.write("12\n")
+        f.close()   
+
+        self = InvmtOutputFormatter(**input_bundle.classes,
+                                     output_fp      = output_fp,
+                                     mapper_fp      = portfolio_mapper_fp,
+                                     user_inputs    = input_bundle.user_inputs,
+                                     fy             = fy,
+                                     aic_name       = aic_name
+                                     )
     
     # f = open(logfile,'a')
     # f.write("13\n")
@@ -0,0 +1,185 @@
+'''
+Benchmark of common.gl.GLProcessor against the previous row-loop version,
+on a synthetic GL export.
+
+Checks that the output is identical and prints the time taken by each.
+'''
+
+# Import standard libs
+import re
+import time
+import numpy as np
+import pandas as pd
+
+# Import luna package
+import luna
+from luna.common.gl import GLProcessor
+
+
+def make_synthetic_gl(num_accounts = 2000, num_txns = 100, seed = 0):
+    '''
+    Returns a frame in the same layout as pd.read_excel of a GL export:
+    a preamble, the header row, then for each account:
+        1-1000  | <account name> |
+        Beginning Balance: | $1,234.56 (or 1,234.56c for credit)
+        <txns>
+        (blank) | Total
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    header = ["ID#", "Src", "Date", "Memo", "Debit", "Credit", "Net Activity", None]
+    num_cols = len(header)
+
+    rows = [
+        ["Company ABC", None, None, None, None, None, None, None],
+        ["General Ledger [Detail]", None, None, None, None, None, None, None],
+        [None] * num_cols,
+        header,
+        ]
+
+    dates = pd.date_range("2022-01-01", "2022-12-31").to_pydatetime()
+    srcs  = np.array(["GJ", "CD", "CR", "SJ", "PJ"], dtype = object)
+
+    for a in range(num_accounts):
+
+        account_no = f"{1 + a % 9}-{1000 + a:04d}"
+        balance    = rng.integers(0, 10**7) / 100
+        suffix     = "c" if rng.random() < 0.4 else ""
+
+        rows.append([account_no, f"Account {a}", None, None, None, None, None, None])
+        rows.append(["Beginning Balance:", f"${balance:,.2f}{suffix}",
+                     None, None, None, None, None, None])
+
+        debit  = np.round(rng.random(num_txns) * 1000, 2)
+        credit = np.round(rng.random(num_txns) * 1000, 2)
+        is_debit = rng.random(num_txns) < 0.5
+        debit[~is_debit] = np.nan
+        credit[is_debit] = np.nan
+
+        for t in range(num_txns):
+            rows.append([
+                f"JE{a:05d}{t:04d}",
+                srcs[t % len(srcs)],
+                dates[(a + t) % len(dates)],
+                f"Txn {t} of account {a}",
+                debit[t], credit[t], None, None])
+
+        rows.append([None, None, None, "Total:", None, None, None, None])
+
+    df = pd.DataFrame(rows[1:], columns = rows[0], dtype = object)
+
+    return df
+
+
+class GLProcessor_FromFrame(GLProcessor):
+
+    def read_raw_data(self):
+
+        return self.file_path.copy()
+
+
+class GLProcessor_Legacy(GLProcessor_FromFrame):
+    '''
+    The row-loop version, for comparison.
+    '''
+
+    def promote_row_to_headers(self):
+        gl = self.read_raw_data()
+        digit = gl[gl.iloc[:,2].notna()].index[0]
+        gl    = gl.iloc[digit:,:]
+        gl = gl.reset_index(drop = True)
+        gl.columns = gl.iloc[0]
+        gl = gl[1:]
+        nan_columns = gl.columns[gl.columns.isna()]
+        gl = gl.drop(columns=nan_columns)
+
+        self.gl = gl.copy()
+
+    def extract_gl_account_info(self):
+        gl = self.gl.copy()
+        gl['GL Account No'] = gl.iloc[:,0].replace('', np.nan).ffill()
+        self.gl = gl
+
+    def regex_gl_account_no(self):
+        gl = self.gl.copy()
+        regex = r'\d{1}-\d{4}'
+        mask = gl['GL Account No'].str.contains(regex, na=False)
+        gl['GL Account No'] = gl['GL Account No'].where(mask).ffill()
+        self.gl = gl
+
+    def forward_fill_gl_account_name(self):
+        gl = self.gl.copy()
+        for i in gl.index:
+            if gl.at[i,"ID#"] == gl.at[i,"GL Account No"]:
+                gl.at[i,"GL Account Name"] = gl.at[i,"Src"]
+        gl["GL Account Name"] = gl["GL Account Name"].ffill()
+        self.gl = gl
+
+    def create_opening_balance_column(self):
+        gl = self.gl.copy()
+        regex = r'(?i)(\d{0,3},?\d{0,3},?\d+\.?\d{0,2}[c]?)'
+        gl['Opening Balance'] = gl['Src'].str.extract(regex)
+        for i in gl.index:
+            if re.search("(?i)[c]", str(gl.at[i,'Opening Balance'])):
+                gl.at[i,'Opening Balance'] = "-" \
+                    + gl.at[i,'Opening Balance'][:-1]
+        mask = gl['Opening Balance'].notna()
+        gl['Opening Balance'] = gl['Opening Balance'].where(mask).ffill()
+        gl['Opening Balance'] = pd.to_numeric(
+            gl['Opening Balance'].str.replace(',',''), errors='coerce')
+        self.gl = gl
+
+    def filter_rows(self):
+        gl = self.gl.copy()
+        gl = gl[gl['ID#'] != 'Beginning Balance:']
+        self.gl = gl
+
+    def clean_and_rename_columns(self):
+        gl = self.gl.copy()
+        gl = gl.drop(gl[gl['Date'].isnull()].index)
+        gl = gl.rename(columns={'Date': 'Posting Date', 'ID#': 'Document No', 'Memo': 'Description'})
+        gl = gl.drop('Net Activity', axis=1)
+        self.gl = gl
+
+    def calculate_amount_column(self):
+        gl = self.gl.copy()
+        gl['Debit'] = pd.to_numeric(gl['Debit'].replace('', np.nan).fillna(0), errors='coerce')
+        gl['Credit'] = pd.to_numeric(gl['Credit'].replace('', np.nan).fillna(0), errors='coerce')
+        gl['Amount'] = gl['Debit'] - gl['Credit']
+        self.gl = gl
+
+
+def run_benchmark(num_accounts = 2000, num_txns = 100, repeat = 3):
+
+    raw_df = make_synthetic_gl(num_accounts, num_txns)
+    print (f"Synthetic GL: {raw_df.shape[0]:,} rows.")
+
+    timings = {}
+    outputs = {}
+    for name, cls in [("legacy", GLProcessor_Legacy),
+                      ("vectorised", GLProcessor_FromFrame)]:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs[name] = cls(raw_df).gl
+            times.append(time.perf_counter() - start)
+        timings[name] = min(times)
+
+    # Same values. The dtype of the columns created by the .at writes in the
+    # legacy version depends on the pandas version, so it is not compared.
+    pd.testing.assert_frame_equal(outputs["legacy"], outputs["vectorised"],
+                                  check_dtype = False)
+
+    timings = pd.Series(timings, name = "Time (s)")
+    print (timings.round(3).to_string())
+    print (f"Speedup: {timings['legacy'] / timings['vectorised']:.1f}x")
+
+    return timings
+
+
+if __name__ == "__main__":
+
+    # 200k lines
+    if True:
+        timings = run_benchmark(num_accounts = 2000, num_txns = 100)
@@ -0,0 +1,110 @@
+'''
+Import-time benchmark of the luna packages and of the imports at the top of
+the sample_scripts/alteryx_apis entry points.
+
+Each import is run in a new python process with -X importtime, so that
+nothing is cached. Prints the time taken, whether pandas / openpyxl /
+fuzzywuzzy were imported, and checks the time against a budget.
+'''
+
+# Import standard libs
+import os
+import sys
+import subprocess
+import pandas as pd
+
+# Header of all the alteryx_apis scripts
+ALTERYX_HEADER = ("import luna; import luna.common as common; "
+                  "import luna.fsvi as fsvi; import luna.lunahub as lunahub; ")
+
+# Name -> (import statement, budget in seconds)
+IMPORT_STATEMENTS = {
+    "luna"              : ("import luna", 0.2),
+    "luna.common"       : ("import luna.common", 0.2),
+    "luna.fsvi.mas"     : ("import luna.fsvi.mas", 0.2),
+    "luna.lunahub"      : ("import luna.lunahub", 0.2),
+    "lunahub.tables"    : ("import luna.lunahub.tables", 0.2),
+    "ar_processing"     : ("import luna; import luna.common as common", 0.2),
+    "mas_f2_pt1"        : (ALTERYX_HEADER, 0.2),
+    "mas_f1"            : (ALTERYX_HEADER +
+                           "from luna.fsvi.mas.form1.mas_f1_output_formatter import OutputFormatter",
+                           3.0),
+    "mas_f2_pt2"        : (ALTERYX_HEADER +
+                           "from luna.fsvi.mas.form2.form2_part2 import MASForm2_Generator_Part2; "
+                           "from luna.fsvi.mas.form2.mas_f2_output_formatter import OutputFormatter",
+                           3.0),
+    "mas_f3_pt2"        : (ALTERYX_HEADER +
+                           "from luna.fsvi.mas.form3.mas_f3_output_formatter import OutputFormatter",
+                           3.0),
+    "mas_funds"         : (ALTERYX_HEADER +
+                           "from luna.fsvi.funds.invmt_report_formatter import InvmtOutputFormatter",
+                           3.0),
+    }
+
+HEAVY_MODULES = ["pandas", "openpyxl", "fuzzywuzzy", "rapidfuzz"]
+
+
+def get_import_time(statement):
+    '''
+    Runs the statement with python -X importtime in a new process.
+
+    Returns (time in seconds, set of the modules imported).
+    '''
+
+    # Same sys.path as this process, so that luna can be imported
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            capture_output = True, text = True, env = env)
+    if result.returncode != 0:
+        raise Exception (f"Unable to run {statement}:\n{result.stderr[-2000:]}")
+
+    # import time: self [us] | cumulative | imported package
+    total_us = 0
+    modules  = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+
+        # Only the top level imports, the nested ones are in the cumulative
+        if not name.startswith("  "):
+            total_us += int(cumulative)
+
+    return total_us / 10**6, modules
+
+
+def run_benchmark(repeat = 3):
+
+    results = {}
+    for name, (statement, budget) in IMPORT_STATEMENTS.items():
+
+        times = []
+        for _ in range(repeat):
+            import_time, modules = get_import_time(statement)
+            times.append(import_time)
+
+        results[name] = {"Time (s)" : min(times),
+                         "Budget (s)" : budget,
+                         "Num modules" : len(modules)}
+        for module in HEAVY_MODULES:
+            results[name][module] = module in modules
+
+    results = pd.DataFrame(results).T
+    results["Within budget"] = results["Time (s)"] <= results["Budget (s)"]
+    print (results.to_string())
+
+    over_budget = results.index[~results["Within budget"].astype(bool)].tolist()
+    if len(over_budget) > 0:
+        raise Exception (f"Import time over budget: {over_budget}")
+
+    return results
+
+
+if __name__ == "__main__":
+
+    # Run where luna can be imported (i.e. after settings.py)
+    if True:
+        results = run_benchmark()
@@ -0,0 +1,130 @@
+'''
+Benchmark of fsvi.mas.subtotals.map_balance_to_columns against the
+previous row-loop column_mapper of Form 1 and Form 2, on a synthetic
+output template.
+
+Checks that the output is identical and prints the time taken by each.
+'''
+
+# Import standard libs
+import time
+import numpy as np
+import pandas as pd
+
+# Import luna package
+import luna
+from luna.fsvi.mas.subtotals import map_balance_to_columns
+
+
+def make_synthetic_outputdf(num_rows = 20000, seed = 0):
+    '''
+    Returns a frame in the same layout as the outputdf of the MAS forms:
+    Amount blocks of 1 to 8 lines, separated by header / Subtotal lines.
+    Some Balances are empty, and some blocks sum to 0.
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    amount   = []
+    subtotal = []
+    balance  = []
+
+    # The loops require a non-Amount first and last line
+    while len(amount) < num_rows - 1:
+
+        # Header or Subtotal line
+        amount.append(None)
+        subtotal.append(None if rng.random() < 0.5 else 0)
+        balance.append(np.nan if rng.random() < 0.5 else rng.integers(-10**6, 10**6) / 100)
+
+        # Amount block
+        block_size = rng.integers(1, 9)
+        is_zero_block = rng.random() < 0.1
+        for _ in range(block_size):
+            amount.append(0)
+            subtotal.append(None)
+            if is_zero_block or (rng.random() < 0.2):
+                balance.append(np.nan if rng.random() < 0.5 else 0.0)
+            else:
+                balance.append(rng.integers(-10**6, 10**6) / 100)
+
+    amount.append(None)
+    subtotal.append(None)
+    balance.append(np.nan)
+
+    return pd.DataFrame({"Amount"   : pd.Series(amount, dtype = object),
+                         "Subtotal" : pd.Series(subtotal, dtype = object),
+                         "Balance"  : balance})
+
+
+def column_mapper_legacy(outputdf, fill_empty_subtotal = False):
+    '''
+    The previous column_mapper loop (Form 1; Form 2 if fill_empty_subtotal).
+    '''
+
+    outputdf = outputdf.copy()
+
+    for i in outputdf.index:
+        if pd.notna(outputdf.at[i,"Amount"]) and pd.notna(outputdf.at[i+1,"Amount"]):
+            if pd.isna(outputdf.at[i,"Balance"]):
+                subtotal = subtotal
+            else:
+                subtotal += outputdf.at[i,"Balance"]
+        elif pd.notna(outputdf.at[i,"Amount"]) and pd.isna(outputdf.at[i+1,
+                "Amount"]):
+            if pd.isna(outputdf.at[i,"Balance"]) and subtotal != 0:
+                outputdf.at[i,"Subtotal"] = subtotal
+                subtotal = 0
+            elif pd.notna(outputdf.at[i,"Balance"]):
+                subtotal += outputdf.at[i,"Balance"]
+                outputdf.at[i,"Subtotal"] = subtotal
+                subtotal = 0
+        else:
+            subtotal = 0
+
+    for i in outputdf.index:
+        if pd.notna(outputdf.at[i, "Amount"]):
+            outputdf.at[i, "Amount"] = outputdf.at[i, "Balance"]
+        elif pd.isna(outputdf.at[i, "Amount"]) and pd.notna(outputdf.at[i,
+                "Subtotal"]):
+            outputdf.at[i, "Subtotal"] = outputdf.at[i, "Balance"]
+        elif fill_empty_subtotal:
+            outputdf.at[i, "Subtotal"] = outputdf.at[i, "Balance"]
+
+    return outputdf
+
+
+def run_benchmark(num_rows = 20000, repeat = 3):
+
+    outputdf = make_synthetic_outputdf(num_rows)
+    print (f"Synthetic output template: {outputdf.shape[0]:,} rows.")
+
+    timings = {}
+    for form, fill_empty_subtotal in [("Form 1", False), ("Form 2", True)]:
+
+        outputs = {}
+        for name, func in [("legacy", column_mapper_legacy),
+                           ("vectorised", map_balance_to_columns)]:
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                outputs[name] = func(outputdf, fill_empty_subtotal)
+                times.append(time.perf_counter() - start)
+            timings[(form, name)] = min(times)
+
+        # Same values; the legacy .at writes may upcast differently
+        pd.testing.assert_frame_equal(outputs["legacy"], outputs["vectorised"],
+                                      check_dtype = False)
+
+    timings = pd.Series(timings, name = "Time (s)").unstack()
+    timings["Speedup"] = timings["legacy"] / timings["vectorised"]
+    print (timings.round(3).to_string())
+
+    return timings
+
+
+if __name__ == "__main__":
+
+    # 20k lines; the actual forms are a few hundred
+    if True:
+        timings = run_benchmark(num_rows = 20000)
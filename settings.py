@@ -4,6 +4,13 @@ Contains settings for the lunaapp.
 Includes:
     - LUNAHUB_CONFIG_FILEPATH -> secrets.py that contains login credentials.
     - PYEASYLIB_FOLDERPATH    -> folderpath of the pyeasylib
+
+Optional (set per developer below):
+    - LUNAHUB_CACHE_ENABLED      -> True to keep a local copy of the lunahub
+                                    query results, see luna.lunahub.cache.
+                                    Default is False.
+    - LUNAHUB_CACHE_MAX_AGE_DAYS -> cached files older than this are deleted.
+                                    Default is 7.
 '''
 
 